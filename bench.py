@@ -0,0 +1,1360 @@
+"""
+Benchmarks for MMO Deck hot paths.
+
+Every suite runs against the in-memory fakes in main.py, so no Win32 modules,
+keyboard hook or audio device are needed.
+
+Usage:
+  python bench.py                       # run every suite
+  python bench.py scheduler keymap      # run selected suites
+  python bench.py trace --trace keys.csv [--realtime]
+
+Traces are "seconds,event_type,name" lines, as written by
+main.py --record-trace. Without --trace a synthetic trace is generated.
+"""
+
+import gc
+import io
+import os
+import sys
+import json
+import time
+import random
+import re
+import argparse
+import threading
+import contextlib
+import subprocess
+import tempfile
+import tracemalloc
+
+import main
+
+
+def _percentile(values, pct: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _fmt_us(seconds: float) -> str:
+    return f"{seconds * 1e6:8.1f}us"
+
+
+# ---------------- SCHEDULER ----------------
+STORM_SIZES = [100, 1000, 3000]
+STORM_HELD_KEYS = 4            # keys held at the same time during a storm
+STORM_INITIAL_SEC = 0.010
+STORM_REPEAT_SEC = 0.004
+STORM_HOLD_SEC = (0.005, 0.030)
+
+
+def _press_storm_scheduler(presses: int, rng: random.Random):
+    sched = main._Scheduler()
+    sched.start()
+    lateness = []
+    peak_threads = threading.active_count()
+    held = []
+
+    for _ in range(presses):
+        holder = []
+
+        def _fire(holder=holder):
+            lateness.append(time.perf_counter() - holder[0].deadline)
+
+        holder.append(sched.call_repeating(STORM_INITIAL_SEC, STORM_REPEAT_SEC, _fire))
+        held.append((time.perf_counter() + rng.uniform(*STORM_HOLD_SEC), holder[0]))
+        while len(held) >= STORM_HELD_KEYS:
+            release_at, call = held.pop(0)
+            delay = release_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            call.cancel()
+        peak_threads = max(peak_threads, threading.active_count())
+
+    for _, call in held:
+        call.cancel()
+    return peak_threads, lateness
+
+
+def _press_storm_threads(presses: int, rng: random.Random):
+    # Thread-per-press model used before the shared scheduler
+    lateness = []
+    peak_threads = threading.active_count()
+    held = []
+
+    for _ in range(presses):
+        stop_evt = threading.Event()
+
+        def _runner(stop_evt=stop_evt):
+            deadline = time.perf_counter() + STORM_INITIAL_SEC
+            delay = STORM_INITIAL_SEC
+            while not stop_evt.wait(delay):
+                lateness.append(time.perf_counter() - deadline)
+                deadline = time.perf_counter() + STORM_REPEAT_SEC
+                delay = STORM_REPEAT_SEC
+
+        threading.Thread(target=_runner, daemon=True).start()
+        held.append((time.perf_counter() + rng.uniform(*STORM_HOLD_SEC), stop_evt))
+        while len(held) >= STORM_HELD_KEYS:
+            release_at, evt = held.pop(0)
+            delay = release_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            evt.set()
+        peak_threads = max(peak_threads, threading.active_count())
+
+    for _, evt in held:
+        evt.set()
+    return peak_threads, lateness
+
+
+def bench_scheduler():
+    print("scheduler: synthetic press storms (peak threads, repeat lateness)")
+    print(f"  {'model':<10} {'presses':>7} {'threads':>7} {'fires':>7} {'p50':>10} {'p99':>10} {'max':>10}")
+    for presses in STORM_SIZES:
+        for model, storm in (("scheduler", _press_storm_scheduler), ("threads", _press_storm_threads)):
+            base = threading.active_count()
+            peak, lateness = storm(presses, random.Random(presses))
+            time.sleep(STORM_HOLD_SEC[1])
+            print(
+                f"  {model:<10} {presses:>7} {peak - base:>7} {len(lateness):>7} "
+                f"{_fmt_us(_percentile(lateness, 50))} {_fmt_us(_percentile(lateness, 99))} "
+                f"{_fmt_us(max(lateness) if lateness else 0.0)}"
+            )
+
+
+# ---------------- KEYMAP DISPATCH ----------------
+DISPATCH_EVENTS = 200000
+
+
+class _Event:
+    __slots__ = ("name", "event_type", "scan_code")
+
+    def __init__(self, name, event_type, scan_code=0):
+        self.name = name
+        self.event_type = event_type
+        self.scan_code = scan_code
+
+
+def _synthetic_key_stream(count: int, rng: random.Random):
+    keys = [f"f{n}" for n in range(13, 25)] + ["a", "w", "s", "d", "space"]
+    events = []
+    while len(events) < count:
+        mod = rng.choice([None, None, None, "left shift", "left ctrl"])
+        key = rng.choice(keys)
+        if mod:
+            events.append(_Event(mod, "down"))
+        events.append(_Event(key, "down"))
+        events.append(_Event(key, "up"))
+        if mod:
+            events.append(_Event(mod, "up"))
+    return events[:count]
+
+
+class _LegacyHookModel:
+    """Emulates one keyboard.on_press_key/on_release_key lambda per binding.
+
+    keyboard keeps a per-key handler list and is_pressed() takes the pressed
+    state lock and copies the pressed set, which is what the lambdas paid for
+    every shift/ctrl check.
+    """
+
+    def __init__(self, noop):
+        self._pressed = set()
+        self._lock = threading.Lock()
+        self.handlers = {}
+        is_pressed = self.is_pressed
+        for key in ("f13", "f15"):
+            self._on(key, "down", lambda e: noop() if is_pressed("shift") else noop())
+        for key in ("f14", "f16", "f17", "f18", "f21", "f22"):
+            self._on(key, "down", lambda e: noop())
+            self._on(key, "up", lambda e: noop())
+        self._on("f19", "down", lambda e: noop())
+        for key in ("f23", "f24"):
+            self._on(key, "down", lambda e: noop() if is_pressed("ctrl") else noop())
+            self._on(key, "up", lambda e: None if is_pressed("ctrl") else noop())
+
+    def _on(self, key, event_type, fn):
+        self.handlers.setdefault((key, event_type), []).append(fn)
+
+    def is_pressed(self, name):
+        with self._lock:
+            pressed = set(self._pressed)
+        return any(p.endswith(name) for p in pressed)
+
+    def on_event(self, event):
+        with self._lock:
+            if event.event_type == "down":
+                self._pressed.add(event.name)
+            else:
+                self._pressed.discard(event.name)
+        for handler in self.handlers.get((event.name, event.event_type), ()):
+            handler(event)
+
+
+def _noop_actions(noop):
+    return {
+        name: main._Action(name, noop, repeat_timing=action.repeat_timing)
+        for name, action in main.ACTIONS.items()
+    }
+
+
+def _typing_stream(count: int, rng: random.Random):
+    # Ordinary typing: unbound letters with the odd shifted one, no deck hotkeys
+    events = []
+    while len(events) < count:
+        key = rng.choice("etaoinshrdlu ")
+        key = "space" if key == " " else key
+        shifted = rng.random() < 0.05
+        if shifted:
+            events.append(_Event("left shift", "down"))
+        events.append(_Event(key, "down"))
+        events.append(_Event(key, "up"))
+        if shifted:
+            events.append(_Event("left shift", "up"))
+    return events[:count]
+
+
+def bench_keymap():
+    print(f"keymap: per-event dispatch cost over {DISPATCH_EVENTS} synthetic events")
+    streams = (
+        # Hotkey-heavy: the keymap also arms hold/repeat timers the lambdas never had
+        ("hotkeys", _synthetic_key_stream(DISPATCH_EVENTS, random.Random(6))),
+        ("typing", _typing_stream(DISPATCH_EVENTS, random.Random(6))),
+    )
+
+    def noop():
+        return None
+
+    actions = _noop_actions(noop)
+    for stream, events in streams:
+        models = (
+            ("keymap", main._Keymap(main.KEYMAP, actions).on_event),
+            ("lambdas", _LegacyHookModel(noop).on_event),
+        )
+        for label, dispatch in models:
+            start = time.perf_counter()
+            for event in events:
+                dispatch(event)
+            elapsed = time.perf_counter() - start
+            print(f"  {stream:<8} {label:<10} {_fmt_us(elapsed / len(events))} per event")
+
+
+# ---------------- METRICS OVERHEAD ----------------
+METRICS_EVENTS = 200000
+
+
+def bench_metrics():
+    print(f"metrics: instrumentation overhead over {METRICS_EVENTS} dispatched events")
+    events = _synthetic_key_stream(METRICS_EVENTS, random.Random(8))
+
+    def noop():
+        return None
+
+    actions = _noop_actions(noop)
+    timings = {}
+    for label, metrics in (("bare", None), ("metrics", main._ActionMetrics())):
+        dispatch = main._Keymap(main.KEYMAP, actions, metrics).on_event
+        start = time.perf_counter()
+        for event in events:
+            dispatch(event)
+        timings[label] = (time.perf_counter() - start) / len(events)
+        print(f"  {label:<10} {_fmt_us(timings[label])} per event")
+
+    metrics = main._ActionMetrics()
+    slot = metrics.slot("bench")
+    rng = random.Random(8)
+    samples = [rng.uniform(1e-5, 1e-2) for _ in range(METRICS_EVENTS)]
+    start = time.perf_counter()
+    for value in samples:
+        metrics.record(slot, value)
+    record_cost = (time.perf_counter() - start) / len(samples)
+    print(f"  {'record()':<10} {_fmt_us(record_cost)} per call")
+    print(f"  {'overhead':<10} {_fmt_us(timings['metrics'] - timings['bare'])} per event")
+
+
+# ---------------- TRACE REPLAY ----------------
+HEADLESS_MONITORS = [
+    (1, (0, 0, 2560, 1440), (0, 0, 2560, 1400), 96),
+    (2, (2560, 0, 4480, 1080), (2560, 0, 4480, 1040), 144),
+]
+HEADLESS_PROCESSES = {100: "chrome.exe", 200: "game.exe", 300: "discord.exe", 400: "code.exe"}
+HEADLESS_WINDOWS = 40
+SYNTHETIC_TRACE_EVENTS = 4000
+FOCUS_CHANGE_EVERY = 25  # events between simulated foreground changes
+# Actions that launch Explorer or talk to the shell are counted, not run
+UNFAKED_ACTIONS = ("open_this_pc", "toggle_desktop")
+
+
+class _HeadlessDeck:
+    """Swaps main.py's backends for the in-memory fakes; restores them on exit."""
+
+    GLOBALS = ("_windows", "_foreground", "_injector", "_topology", "_volume_engine",
+               "_scheduler", "_keymap", "_geometry", "_window_worker", "_profiles", "_state_hub",
+               "_app_volume_engine", "_window_index", "_workspaces", "_window_animator",
+               "_animate_snaps")
+
+    def __init__(self, rng: random.Random, windows: int = HEADLESS_WINDOWS):
+        self.rng = rng
+        work_areas = [m[2] for m in HEADLESS_MONITORS]
+        self.windows = main._FakeWindowBackend(work_areas)
+        self.fg_source = main._FakeForegroundSource(processes=HEADLESS_PROCESSES)
+        pids = list(HEADLESS_PROCESSES)
+        for i in range(windows):
+            hwnd = 0x1000 + i
+            l, t, r, b = rng.choice(work_areas)
+            x = rng.randint(l, r - 400)
+            y = rng.randint(t, b - 300)
+            pid = pids[i % len(pids)]
+            self.windows.add_window(hwnd, (x, y, x + 800, y + 600), title=f"window {i}", pid=pid)
+            self.fg_source.windows[hwnd] = pid
+        self.monitors = main._FakeMonitorProvider(HEADLESS_MONITORS)
+        self.injector = main._RecordingInjector()
+        self.audio = main._FakeVolumeBackend()
+        self.sessions = main._FakeSessionManager()
+        for pid in HEADLESS_PROCESSES:
+            self.sessions.add_session(pid)
+        self.skipped = {name: 0 for name in UNFAKED_ACTIONS}
+        self._saved = {}
+
+    def focus(self, hwnd: int):
+        self.windows.foreground = hwnd
+        self.fg_source.activate(hwnd)
+
+    def __enter__(self):
+        self._saved = {name: getattr(main, name) for name in self.GLOBALS}
+        scheduler = main._Scheduler()
+        scheduler.start()
+        tracker = main._ForegroundTracker(self.fg_source)
+        tracker.start()
+        topology = main._MonitorTopology(self.monitors)
+        topology.start()
+        main._windows = self.windows
+        self.worker = main._WindowWorker(self.windows)
+        self.worker.start()
+        main._window_worker = self.worker
+        main._foreground = tracker
+        main._injector = self.injector
+        main._topology = topology
+        main._scheduler = scheduler
+        main._volume_engine = main._VolumeEngine(self.audio, scheduler)
+        main._app_volume_engine = main._AppVolumeEngine(main._AudioSessionCache(self.sessions), scheduler)
+        main._geometry = main._GeometryMemory()
+        self.windows.watch_destroyed(main._geometry.forget, main._geometry.hwnds)
+        main._profiles = main._ProfileSet(main.PROFILE_RULES)
+        self.windows.watch_destroyed(main._profiles.forget, main._profiles.hwnds)
+        self.windows.on_activate = self.fg_source.activate
+        main._window_index = main._WindowIndex(self.windows, tracker)
+        main._window_index.start()
+        main._workspaces = main._WorkspaceStore()
+        main._window_animator = None
+        self.metrics = main._ActionMetrics()
+        actions = dict(main.ACTIONS)
+        for name in UNFAKED_ACTIONS:
+            actions[name] = main._Action(name, lambda name=name: self._skip(name))
+        self.keymap = main._Keymap(main.KEYMAP, actions, self.metrics, scheduler, main._resolve_action)
+        main._keymap = self.keymap
+        self.focus(next(iter(self.windows.windows)))
+        return self
+
+    def _skip(self, name: str):
+        self.skipped[name] += 1
+
+    def __exit__(self, *exc):
+        for name, value in self._saved.items():
+            setattr(main, name, value)
+        return False
+
+
+def _load_trace(path: str):
+    trace = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            t, event_type, name = line.split(",", 2)
+            trace.append((float(t), event_type, name))
+    return trace
+
+
+def _synthetic_trace(count: int, rng: random.Random):
+    keys = ["f13", "f14", "f15", "f16", "f17", "f18", "f19", "f21", "f22", "f23", "f24"]
+    repeating = {"f17", "f18", "f23", "f24"}
+    trace = []
+    t = 0.0
+    while len(trace) < count:
+        key = rng.choice(keys)
+        mod = rng.choice([None] * 6 + ["left shift", "left ctrl"])
+        t += rng.uniform(0.05, 0.4)
+        if mod:
+            trace.append((t, "down", mod))
+            t += 0.01
+        trace.append((t, "down", key))
+        hold = rng.uniform(0.03, 0.15)
+        if key in repeating and rng.random() < 0.1:
+            hold = rng.uniform(0.6, 1.5)
+            # OS auto-repeat downs after the initial delay
+            repeat_t = t + 0.5
+            while repeat_t < t + hold:
+                trace.append((repeat_t, "down", key))
+                repeat_t += 0.033
+        t += hold
+        trace.append((t, "up", key))
+        if mod:
+            t += 0.01
+            trace.append((t, "up", mod))
+    return trace[:count]
+
+
+def _replay(deck: _HeadlessDeck, trace, realtime: bool):
+    events = [(t, _Event(name, event_type)) for t, event_type, name in trace]
+    hwnds = list(deck.windows.windows)
+    dispatch = deck.keymap.on_event
+
+    created = [0]
+    original_start = threading.Thread.start
+
+    def _counting_start(thread, *args, **kwargs):
+        created[0] += 1
+        return original_start(thread, *args, **kwargs)
+
+    threading.Thread.start = _counting_start
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for i, (t, event) in enumerate(events):
+                if realtime:
+                    delay = start + t - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                if i % FOCUS_CHANGE_EVERY == 0:
+                    deck.focus(deck.rng.choice(hwnds))
+                dispatch(event)
+            elapsed = time.perf_counter() - start
+            time.sleep(0.05)  # let scheduled flushes/repeats drain
+            deck.worker.wait_idle()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        threading.Thread.start = original_start
+    return elapsed, created[0], peak
+
+
+def bench_trace(trace_path: str = None, realtime: bool = False):
+    rng = random.Random(9)
+    if trace_path:
+        trace = _load_trace(trace_path)
+        source = trace_path
+    else:
+        trace = _synthetic_trace(SYNTHETIC_TRACE_EVENTS, rng)
+        source = "synthetic"
+    mode = "realtime" if realtime else "as fast as possible"
+    print(f"trace: replaying {len(trace)} events ({source}, {mode})")
+
+    with _HeadlessDeck(rng) as deck:
+        elapsed, threads, peak = _replay(deck, trace, realtime)
+        window_ops = sum(deck.windows.calls.values())
+        print(f"  throughput       {len(trace) / elapsed:10.0f} events/s ({elapsed * 1000:.1f} ms)")
+        print(f"  threads created  {threads:10d}")
+        print(f"  peak memory      {peak / 1024:10.1f} KiB")
+        print(f"  SendInput calls  {deck.injector.syscalls:10d}")
+        print(f"  window ops       {window_ops:10d} (worker {deck.worker.stats()})")
+        print(f"  volume COM calls {deck.audio.com_calls():10d}")
+        print(f"  foreground cache {deck.fg_source.name_lookups:10d} lookups ({main._foreground.stats()})")
+        print(f"  skipped actions  {deck.skipped}")
+        print(f"  profiles         {main._profiles.stats()}")
+        print(f"  {'action':<26} {'count':>6} {'p50':>10} {'p95':>10} {'p99':>10}")
+        for name, stats in deck.metrics.snapshot().items():
+            print(
+                f"  {name:<26} {stats['count']:>6} {stats['p50_us']:>8.1f}us "
+                f"{stats['p95_us']:>8.1f}us {stats['p99_us']:>8.1f}us"
+            )
+
+
+# ---------------- WINDOW WORKER ----------------
+MASH_PRESSES = 200
+MASH_MOVE_LATENCY_SEC = (0.0, 0.002, 0.020)  # responsive, busy, nearly hung target window
+
+
+def _mash_cycle(deck, presses: int):
+    hook_times = []
+    for _ in range(presses):
+        start = time.perf_counter()
+        main._cycle_left()
+        hook_times.append(time.perf_counter() - start)
+    deck.worker.wait_idle(timeout=presses * max(deck.windows.move_latency, 0.001) + 1.0)
+    return hook_times
+
+
+def bench_window_worker():
+    print(f"windows: {MASH_PRESSES} back-to-back F13 presses on one window")
+    print(f"  {'latency':>8} {'hook p50':>10} {'hook p99':>10} {'moves':>6} {'coalesced':>9} {'peak':>5} {'sync total':>11}")
+    for latency in MASH_MOVE_LATENCY_SEC:
+        with _HeadlessDeck(random.Random(14), windows=1) as deck:
+            deck.windows.move_latency = latency
+            with contextlib.redirect_stdout(io.StringIO()):
+                hook_times = _mash_cycle(deck, MASH_PRESSES)
+            stats = deck.worker.stats()
+            # Before the worker every press moved the window on the hook thread
+            sync_total = MASH_PRESSES * latency
+            print(
+                f"  {latency * 1000:6.1f}ms {_fmt_us(_percentile(hook_times, 50))} {_fmt_us(_percentile(hook_times, 99))}"
+                f" {deck.windows.calls.get('set_window_rect', 0):>6} {stats['coalesced']:>9} {stats['peak_depth']:>5}"
+                f" {sync_total * 1000:9.1f}ms"
+            )
+
+
+# ---------------- COM APARTMENT ----------------
+COM_CALLS = 20000
+
+
+def bench_com():
+    print(f"com: per-call overhead over {COM_CALLS} calls (apartment without COM init)")
+    print(f"  {'executor':<10} {'call p50':>10} {'call p99':>10} {'submit':>10} {'proxy p50':>10}")
+    for label, apartment in (("inline", main._InlineApartment()), ("sta", main._ComApartment("bench-sta", com_init=False))):
+        apartment.start()
+        apartment.call(lambda: None)  # warm the thread up
+
+        def noop():
+            return None
+
+        call_times = []
+        for _ in range(COM_CALLS):
+            start = time.perf_counter()
+            apartment.call(noop)
+            call_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        futures = [apartment.submit(noop) for _ in range(COM_CALLS)]
+        submit_cost = (time.perf_counter() - start) / COM_CALLS
+        for future in futures:
+            future.result()
+
+        audio = main._FakeVolumeBackend()
+        endpoint = main._ApartmentProxy(apartment, audio.connect(None, None))
+        proxy_times = []
+        for i in range(COM_CALLS):
+            start = time.perf_counter()
+            endpoint.set_level((i % 100) / 100)
+            proxy_times.append(time.perf_counter() - start)
+        print(
+            f"  {label:<10} {_fmt_us(_percentile(call_times, 50))} {_fmt_us(_percentile(call_times, 99))}"
+            f" {_fmt_us(submit_cost)} {_fmt_us(_percentile(proxy_times, 50))}"
+        )
+
+
+# ---------------- PROFILES ----------------
+PROFILE_RULE_COUNTS = [5, 50, 500]
+PROFILE_LOOKUPS = 20000
+
+
+def _synthetic_profile_rules(count: int):
+    # A third each: exact exe, exe glob, title regex; the real rules go last
+    rules = []
+    for i in range(count - len(main.PROFILE_RULES)):
+        kind = i % 3
+        if kind == 0:
+            rules.append({"exe": f"app{i}.exe", "actions": {"refresh": "browser_refresh"}})
+        elif kind == 1:
+            rules.append({"exe": f"glob:tool{i}-*.exe", "actions": {"prev_tab": "browser_prev_tab"}})
+        else:
+            rules.append({"title": f"re:.*Project {i}\\b", "actions": {"next_tab": "browser_next_tab"}})
+    return rules + main.PROFILE_RULES
+
+
+def bench_profiles():
+    print(f"profiles: resolving the foreground profile ({PROFILE_LOOKUPS} lookups, 4 foreground windows)")
+    print(f"  {'rules':>6} {'cold match':>11} {'keypress':>10} {'hit rate':>9}")
+    for count in PROFILE_RULE_COUNTS:
+        with _HeadlessDeck(random.Random(16), windows=4) as deck:
+            profiles = main._ProfileSet(_synthetic_profile_rules(count))
+            main._profiles = profiles
+            hwnds = list(deck.windows.windows)
+
+            # Worst case for a miss: an exe no exact rule has, so every pattern runs
+            start = time.perf_counter()
+            for _ in range(PROFILE_LOOKUPS // 10):
+                profiles.match("game.exe", "ApplicationFrameWindow", "window 0")
+            cold = (time.perf_counter() - start) / (PROFILE_LOOKUPS // 10)
+
+            action = main.ACTIONS["refresh"]
+            start = time.perf_counter()
+            for i in range(PROFILE_LOOKUPS):
+                if i % 1000 == 0:
+                    deck.focus(hwnds[(i // 1000) % len(hwnds)])
+                main._resolve_action(action)
+            hot = (time.perf_counter() - start) / PROFILE_LOOKUPS
+            stats = profiles.stats()
+            rate = stats["hits"] / max(1, stats["hits"] + stats["misses"])
+            print(f"  {count:>6} {_fmt_us(cold)}   {_fmt_us(hot)} {rate:>8.1%}")
+
+
+# ---------------- FOOTPRINT ----------------
+FOOTPRINT_MODES = ("import", "headless", "gui", "gui-closed")
+FOOTPRINT_SETTLE_SEC = 2.0
+_FOOTPRINT_CHILD = "import json, sys, bench; print(json.dumps(bench._footprint_probe(sys.argv[1])))"
+
+
+def _wait_for(predicate, timeout: float = FOOTPRINT_SETTLE_SEC) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _footprint_probe(mode: str) -> dict:
+    # Runs in a fresh interpreter so each mode starts from the same baseline
+    if mode == "import":
+        return main._process_footprint()
+    # What main() prewarms before either UI mode starts
+    for name in main.PREWARM_SUBSYSTEMS:
+        main._ensure_subsystem(name)
+    if mode == "gui":
+        main._build_gui().update()
+        return main._process_footprint()
+    # The real --headless loop (tray plus the quit wait) on a side thread
+    main._headless = True
+    runner = threading.Thread(target=main._run_headless, args=(False, None), daemon=True)
+    runner.start()
+    _wait_for(lambda: main._tray_icon is not None or not main._tray_available())
+    if mode == "gui-closed":
+        # Open the settings window from the tray and close it again
+        main._show_window()
+        if not _wait_for(lambda: main._root is not None):
+            raise RuntimeError("settings window did not open")
+        main._root.after(0, main._root.quit)
+        main._ui_thread.join(FOOTPRINT_SETTLE_SEC)
+        gc.collect()
+    footprint = main._process_footprint()
+    main._quit_event.set()
+    runner.join(FOOTPRINT_SETTLE_SEC)
+    return footprint
+
+
+def bench_footprint():
+    print("footprint: resident memory and handles per UI mode (fresh process each)")
+    print(f"  {'mode':<11} {'rss':>10} {'handles':>8} {'gdi':>5} {'user':>5}")
+    here = os.path.dirname(os.path.abspath(__file__))
+    for mode in FOOTPRINT_MODES:
+        proc = subprocess.run(
+            [sys.executable, "-c", _FOOTPRINT_CHILD, mode], cwd=here, capture_output=True, text=True
+        )
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            reason = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"  {mode:<11} unavailable ({reason})")
+            continue
+        fp = json.loads(lines[-1])
+        print(
+            f"  {mode:<11} {fp['rss_kib'] / 1024:7.1f}MiB {fp['handles']:>8} "
+            f"{fp['gdi'] if fp['gdi'] is not None else '-':>5} {fp['user'] if fp['user'] is not None else '-':>5}"
+        )
+    print("  gui-closed is --headless after opening and closing the settings window;")
+    print("  the Tcl/Tk libraries stay loaded, so its memory doesn't fall back to headless")
+
+
+# ---------------- IPC ----------------
+IPC_REQUESTS = 2000
+IPC_CONNECTS = 200
+IPC_SPAWNS = 5
+
+
+def _ipc_address(tmp: str) -> str:
+    if sys.platform == "win32":
+        return rf"\\.\pipe\MMO Deck bench {os.getpid()}"
+    return os.path.join(tmp, "bench.sock")
+
+
+def bench_ipc():
+    print(f"ipc: command round trip to a running instance ({IPC_REQUESTS} requests)")
+    print(f"  {'mode':<26} {'p50':>10} {'p99':>10} {'max':>10}")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, _HeadlessDeck(random.Random(18)):
+        server = main._IpcServer(main._handle_ipc_request, _ipc_address(tmp))
+        server.start()
+        try:
+            time.sleep(0.05)  # accept thread is listening
+            for label, message in (("ping", {"cmd": "ping"}),
+                                   ("run volume_up", {"cmd": "run", "action": "volume_up"})):
+                client = main._IpcClient(server.address)
+                samples = []
+                for _ in range(IPC_REQUESTS):
+                    start = time.perf_counter()
+                    reply = client.request(message)
+                    samples.append(time.perf_counter() - start)
+                    assert reply["ok"], reply
+                client.close()
+                rows.append((f"{label} (persistent)", samples))
+            samples = []
+            for _ in range(IPC_CONNECTS):
+                start = time.perf_counter()
+                main._ipc_request({"cmd": "ping"}, server.address)
+                samples.append(time.perf_counter() - start)
+            rows.append(("ping (connect each)", samples))
+        finally:
+            server.close()
+    # What the CLI pays on top: starting an interpreter that imports main.py
+    samples = []
+    for _ in range(IPC_SPAWNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=os.path.dirname(os.path.abspath(main.__file__)),
+                       check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    rows.append(("process start", samples))
+    for label, values in rows:
+        print(
+            f"  {label:<26} {_fmt_us(_percentile(values, 50))} {_fmt_us(_percentile(values, 99))} "
+            f"{_fmt_us(max(values))}"
+        )
+
+
+# ---------------- WEBSOCKET ----------------
+WS_CLIENT_COUNTS = [1, 10, 100]
+WS_COMMANDS_PER_CLIENT = 40
+WS_BATCH = 16
+WS_PUBLISHES = 5000
+WS_TOKEN = "bench"
+
+
+async def _ws_recv_reply(socket):
+    # State pushes interleave with replies on the same socket
+    while True:
+        message = json.loads(await socket.recv())
+        if message["type"] == "reply":
+            return message
+
+
+async def _ws_load(port: int, count: int, hub):
+    websockets = main.websockets
+    asyncio = main.asyncio
+    url = f"ws://{main.WS_HOST}:{port}"
+    sockets = [await websockets.connect(url) for _ in range(count)]
+    for socket in sockets:
+        await socket.send(json.dumps({"token": WS_TOKEN}))
+        await socket.recv()  # hello
+    stalled = await websockets.connect(url)  # never reads after connecting
+    await stalled.send(json.dumps({"token": WS_TOKEN}))
+
+    async def commands(i, socket):
+        action = "volume_up" if i % 2 else "volume_down"
+        samples = []
+        for _ in range(WS_COMMANDS_PER_CLIENT):
+            start = time.perf_counter()
+            await socket.send(json.dumps({"cmd": "run", "action": action}))
+            reply = await _ws_recv_reply(socket)
+            samples.append(time.perf_counter() - start)
+            assert reply["ok"], reply
+        start = time.perf_counter()
+        await socket.send(json.dumps({"batch": [{"cmd": "run", "action": action}] * WS_BATCH}))
+        reply = await _ws_recv_reply(socket)
+        assert reply["ok"] and len(reply["results"]) == WS_BATCH, reply
+        return samples, time.perf_counter() - start
+
+    results = await asyncio.gather(*(commands(i, s) for i, s in enumerate(sockets)))
+    latencies = [value for samples, _ in results for value in samples]
+    batches = [elapsed for _, elapsed in results]
+
+    # Drain pushes caused by the commands so the fan-out count starts clean
+    await asyncio.sleep(0.05)
+    for socket in sockets:
+        while True:
+            try:
+                await asyncio.wait_for(socket.recv(), 0.001)
+            except asyncio.TimeoutError:
+                break
+
+    final = -1.0
+
+    async def watch(socket):
+        pushes = 0
+        while True:
+            message = json.loads(await socket.recv())
+            if message["type"] == "state" and "volume" in message["state"]:
+                pushes += 1
+                if message["state"]["volume"] == final:
+                    return pushes, time.perf_counter()
+
+    watchers = [asyncio.ensure_future(watch(s)) for s in sockets]
+    publish_costs = []
+
+    def publisher():
+        # Stands in for the scheduler/COM threads that see volume changes
+        for i in range(WS_PUBLISHES):
+            start = time.perf_counter()
+            hub.publish("volume", i / WS_PUBLISHES)
+            publish_costs.append(time.perf_counter() - start)
+        hub.publish("volume", final)
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    seen = await asyncio.gather(*watchers)
+    thread.join()
+    fan_out = max(t for _, t in seen) - start
+    pushes = sum(p for p, _ in seen) / len(seen)
+    for socket in sockets + [stalled]:
+        await socket.close()
+    return latencies, batches, publish_costs, fan_out, pushes
+
+
+def bench_websocket():
+    if not main._ensure_subsystem("websocket"):
+        print("websocket: skipped (pip install websockets)")
+        return
+    print(
+        f"websocket: {WS_COMMANDS_PER_CLIENT} commands + 1 batch of {WS_BATCH} per client, "
+        f"then {WS_PUBLISHES} volume changes fanned out (plus 1 stalled client)"
+    )
+    print(
+        f"  {'clients':>7} {'cmd p50':>10} {'cmd p99':>10} {'batch p50':>10} "
+        f"{'publish':>10} {'fan-out':>10} {'pushes/client':>14}"
+    )
+    with _HeadlessDeck(random.Random(19)):
+        hub = main._StateHub()
+        main._state_hub = hub
+        server = main._WebSocketServer(hub, main._handle_ipc_request, port=0, token=WS_TOKEN)
+        server.start()
+        try:
+            for count in WS_CLIENT_COUNTS:
+                latencies, batches, publish_costs, fan_out, pushes = main.asyncio.run(
+                    _ws_load(server.port, count, hub)
+                )
+                print(
+                    f"  {count:>7} {_fmt_us(_percentile(latencies, 50))} {_fmt_us(_percentile(latencies, 99))} "
+                    f"{_fmt_us(_percentile(batches, 50))} {_fmt_us(sum(publish_costs) / len(publish_costs))} "
+                    f"{fan_out * 1e3:8.1f}ms {pushes:>14.1f}"
+                )
+        finally:
+            server.close()
+        print(f"  server: {server.stats()}")
+
+
+# ---------------- LOGGING ----------------
+LOG_CALLS = 20000
+LOG_SLOW_CONSOLE_SEC = 0.0005  # a console/pipe that takes 0.5 ms per write
+
+
+class _SlowConsole(io.StringIO):
+    def write(self, text):
+        time.sleep(LOG_SLOW_CONSOLE_SEC)
+        return super().write(text)
+
+
+def _time_calls(fn, calls: int):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_logging():
+    print(f"logging: per-call cost on the calling (hook) thread ({LOG_CALLS} calls)")
+    print(f"  {'mode':<26} {'p50':>10} {'p99':>10} {'max':>10}")
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows.append(("print -> devnull", _time_calls(lambda i: print(f"Refresh: non-browser {i}"), LOG_CALLS)))
+    with contextlib.redirect_stdout(_SlowConsole()):
+        rows.append(("print -> slow console", _time_calls(lambda i: print(f"Refresh: non-browser {i}"), 200)))
+    saved = main._logger
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(_SlowConsole()):
+        logger = main._logger = main._RingLog(level=main.LOG_INFO)
+        logger.start(os.path.join(tmp, "bench.log"))
+        try:
+            rows.append(("_log below level", _time_calls(
+                lambda i: main._log(main.LOG_DEBUG, "Keymap", "fire", action="refresh", tick=i), LOG_CALLS)))
+            rows.append(("_log message", _time_calls(
+                lambda i: main._log(main.LOG_INFO, "Refresh", "non-browser (Ctrl+/)"), LOG_CALLS)))
+            rows.append(("_log with fields", _time_calls(
+                lambda i: main._log(main.LOG_INFO, "Keymap", "fire", action="refresh", tick=i), LOG_CALLS)))
+        finally:
+            main._logger = saved
+            logger.close()
+    for label, values in rows:
+        print(
+            f"  {label:<26} {_fmt_us(_percentile(values, 50))} {_fmt_us(_percentile(values, 99))} "
+            f"{_fmt_us(max(values))}"
+        )
+    print(f"  writer: {logger.stats()}")
+
+
+# ---------------- AUDIO SESSIONS ----------------
+SESSION_COUNTS = [8, 64, 256]
+SESSION_ENUM_COST_SEC = 20e-6  # per session per enumeration, roughly one COM round trip
+SESSION_TICKS = 200
+
+
+def _naive_app_volume(manager, pid: int, steps: int):
+    # What per-app volume costs without the cache: enumerate on every tick
+    for session_pid, _, session in manager.sessions():
+        if session_pid == pid:
+            session.set_level(min(1.0, max(0.0, session.level() + steps * main.VOLUME_STEP_SCALAR)))
+
+
+def bench_sessions():
+    print(f"sessions: per-app volume over {SESSION_TICKS} repeat ticks "
+          f"(fake enumeration {SESSION_ENUM_COST_SEC * 1e6:.0f}us per session)")
+    print(f"  {'sessions':>8} {'mode':<14} {'per tick':>10} {'enums':>6} {'sets':>6}")
+    for count in SESSION_COUNTS:
+        for mode in ("enumerate", "cached", "no notify"):
+            manager = main._FakeSessionManager(SESSION_ENUM_COST_SEC, notifications=(mode != "no notify"))
+            for i in range(count):
+                manager.add_session(1000 + i % (count // 2 or 1), level=0.5)
+            target = 1000
+            engine = main._AppVolumeEngine(main._AudioSessionCache(manager))
+            start = time.perf_counter()
+            for tick in range(SESSION_TICKS):
+                steps = -1 if tick % 2 else 1
+                if tick == SESSION_TICKS // 2:
+                    # Mid-hold: the game opens a second stream and the first one ends
+                    first = next(k for k, (pid, _) in manager.by_key.items() if pid == target)
+                    manager.add_session(target, level=0.5)
+                    manager.expire_session(first)
+                if mode == "enumerate":
+                    _naive_app_volume(manager, target, steps)
+                else:
+                    engine.request(target, steps)
+                    engine.flush()
+            per_tick = (time.perf_counter() - start) / SESSION_TICKS
+            print(f"  {count:>8} {mode:<14} {_fmt_us(per_tick)} {manager.enumerations:>6} {manager.set_calls():>6}")
+
+
+# ---------------- WINDOW INDEX ----------------
+INDEX_WINDOW_COUNTS = [100, 1000, 5000]
+INDEX_APPS = 40
+INDEX_EVENTS = 20000
+INDEX_QUERIES = 2000
+
+
+def _index_fixture(count: int, rng: random.Random):
+    processes = {1000 + i: f"app{i}.exe" for i in range(INDEX_APPS)}
+    backend = main._FakeWindowBackend()
+    source = main._FakeForegroundSource(processes=processes)
+    tracker = main._ForegroundTracker(source)
+    tracker.start()
+    backend.on_activate = source.activate
+    for i in range(count):
+        hwnd = 0x10000 + i
+        source.windows[hwnd] = rng.choice(list(processes))
+        backend.add_window(hwnd, (0, 0, 800, 600), pid=source.windows[hwnd])
+    index = main._WindowIndex(backend, tracker)
+    index.start()
+    return backend, source, tracker, index
+
+
+def _scan_least_recent(backend, tracker, exe: str, exclude):
+    # Without the index: enumerate every top-level window, resolve its exe, take the bottom match
+    match = None
+    for hwnd in backend.top_level_windows():
+        if hwnd != exclude and tracker.process_name_for(hwnd) == exe:
+            match = hwnd
+    return match
+
+
+def bench_window_index():
+    print(f"window index: {INDEX_EVENTS} window events ({INDEX_APPS} apps), then {INDEX_QUERIES} next-window lookups")
+    print(f"  {'windows':>7} {'per event':>10} {'indexed':>10} {'scan':>10}")
+    for count in INDEX_WINDOW_COUNTS:
+        rng = random.Random(22)
+        backend, source, tracker, index = _index_fixture(count, rng)
+        next_hwnd = 0x10000 + count
+        pids = list(source.processes)
+        live = list(backend.windows)
+        events = []
+        for _ in range(INDEX_EVENTS):
+            roll = rng.random()
+            if roll < 0.15:
+                events.append(("create", next_hwnd, rng.choice(pids)))
+                live.append(next_hwnd)
+                next_hwnd += 1
+            elif roll < 0.30 and len(live) > 1:
+                events.append(("destroy", live.pop(rng.randrange(len(live))), None))
+            else:
+                events.append(("focus", rng.choice(live), None))
+        start = time.perf_counter()
+        for kind, hwnd, pid in events:
+            if kind == "create":
+                source.windows[hwnd] = pid
+                backend.add_window(hwnd, (0, 0, 800, 600), pid=pid)
+            elif kind == "destroy":
+                backend.destroy_window(hwnd)
+            else:
+                backend.activate(hwnd)
+        per_event = (time.perf_counter() - start) / INDEX_EVENTS
+        assert set(index._order) == set(backend.windows), "index drifted from the window set"
+        queries = [rng.choice(live) for _ in range(INDEX_QUERIES)]
+        start = time.perf_counter()
+        found = [index.least_recent(tracker.process_name_for(h), exclude=h) for h in queries]
+        indexed = (time.perf_counter() - start) / INDEX_QUERIES
+        scan_queries = queries[: max(20, INDEX_QUERIES * 100 // count)]
+        start = time.perf_counter()
+        expected = [_scan_least_recent(backend, tracker, tracker.process_name_for(h), h) for h in scan_queries]
+        scanned = (time.perf_counter() - start) / len(scan_queries)
+        print(f"  {count:>7} {_fmt_us(per_event)} {_fmt_us(indexed)} {_fmt_us(scanned)}")
+        # The fake's z-order is creation order, not activation order, so only compare apps
+        for got, want in zip(found, expected):
+            assert (got is None) == (want is None), "index and scan disagree on whether a window exists"
+
+
+# ---------------- TILING ----------------
+TILE_WINDOW_COUNTS = [4, 12, 40]
+TILE_MOVE_LATENCY_SEC = 0.002  # one repaint/WM_WINDOWPOSCHANGED round trip
+
+
+def bench_tiling():
+    print(f"tiling: layout actions, fake move latency {TILE_MOVE_LATENCY_SEC * 1e3:.0f}ms per move/transaction")
+    print(f"  {'windows':>7} {'layout':<11} {'mode':<12} {'tiled':>5} {'txns':>5} {'moves':>5} "
+          f"{'hook':>10} {'to apply':>10}")
+    for count in TILE_WINDOW_COUNTS:
+        for layout in main.TILE_LAYOUTS:
+            for mode in ("transaction", "refused"):
+                with _HeadlessDeck(random.Random(23), windows=count) as deck:
+                    deck.windows.move_latency = TILE_MOVE_LATENCY_SEC
+                    if mode == "refused":
+                        deck.windows.refusing.add(next(iter(deck.windows.windows)))
+                    hwnd = next(iter(deck.windows.windows))
+                    deck.focus(hwnd)
+                    deck.windows.calls.clear()
+                    start = time.perf_counter()
+                    main._tile(layout)
+                    hook = time.perf_counter() - start  # the rest runs on the worker
+                    deck.worker.wait_idle(5.0)
+                    elapsed = time.perf_counter() - start
+                    tiled = len(deck.windows.transactions[-1]) if deck.windows.transactions else 0
+                    txns = deck.windows.calls.get("set_window_rects", 0)
+                    moves = deck.windows.calls.get("set_window_rect", 0)
+                    assert txns == 1, f"{layout}: expected one transaction, got {txns}"
+                    rects = [deck.windows.windows[h].rect for h in deck.windows.transactions[-1]]
+                    if mode == "transaction":
+                        assert len(set(rects)) == len(rects), f"{layout}: overlapping tiles"
+                print(
+                    f"  {count:>7} {layout:<11} {mode:<12} {tiled:>5} {txns:>5} {moves:>5} "
+                    f"{_fmt_us(hook)} {elapsed * 1e3:8.1f}ms"
+                )
+
+
+# ---------------- WORKSPACES ----------------
+WORKSPACE_WINDOW_COUNTS = [200, 500]
+WORKSPACE_RETITLED = 0.3  # share of windows whose title changed across the "reboot"
+WORKSPACE_CLASSES = ("Chrome_WidgetWin_1", "ApplicationFrameWindow", "Notepad")
+WORKSPACE_WORDS = ("inbox", "draft", "report", "raid", "guild", "notes", "build", "review",
+                   "budget", "map", "patch", "log", "chat", "music", "wiki", "quest")
+
+
+def _workspace_title(rng: random.Random, i: int, exe: str):
+    a, b = rng.sample(WORKSPACE_WORDS, 2)
+    return f"{a} {b} {i} ({rng.randint(1, 9)}) - {exe}"
+
+
+def _naive_match(entries, windows):
+    # Every entry against every window, best title similarity within the same exe/class
+    matches = []
+    free = list(windows)
+    for entry in entries:
+        best = None
+        for k, (hwnd, exe, cls, title) in enumerate(free):
+            if (exe, cls) != (entry.exe, entry.cls):
+                continue
+            score = main._title_similarity(entry.tokens, main._title_tokens(title))
+            if best is None or score > best[0]:
+                best = (score, k)
+        if best is not None:
+            matches.append((free.pop(best[1])[0], entry))
+    return matches
+
+
+def bench_workspaces():
+    print(f"workspaces: capture/save/load, then restore after a reboot "
+          f"(new hwnds, {WORKSPACE_RETITLED:.0%} retitled, shuffled)")
+    print(f"  {'windows':>7} {'capture':>9} {'bytes':>7} {'dump':>8} {'load':>8} "
+          f"{'match':>8} {'naive':>9} {'restore':>9} {'txns':>4} {'correct':>8}")
+    for count in WORKSPACE_WINDOW_COUNTS:
+        rng = random.Random(24)
+        with _HeadlessDeck(rng, windows=count) as deck:
+            for i, (hwnd, win) in enumerate(list(deck.windows.windows.items())):
+                win.cls = WORKSPACE_CLASSES[i % len(WORKSPACE_CLASSES)]
+                win.title = _workspace_title(rng, i, HEADLESS_PROCESSES[win.pid])
+                roll = rng.random()
+                if roll < 0.1:
+                    deck.windows.show_window(hwnd, main.SW_MAXIMIZE)
+                elif roll < 0.15:
+                    deck.windows.show_window(hwnd, main.SW_SHOWMINNOACTIVE)
+            saved = {hwnd: (win.cls, win.title, win.pid, win.show, deck.windows.normal_rect(hwnd))
+                     for hwnd, win in deck.windows.windows.items()}
+
+            start = time.perf_counter()
+            main._capture_workspace("bench", save=False).result(10.0)
+            capture = time.perf_counter() - start
+            store = main._get_workspaces()
+            workspace = store.get("bench")
+            start = time.perf_counter()
+            blob = store.dumps()
+            dump = time.perf_counter() - start
+            start = time.perf_counter()
+            main._WorkspaceStore().loads(blob)
+            load = time.perf_counter() - start
+            assert len(workspace.entries) == count
+
+            # Reboot: every window comes back with a new hwnd, somewhere else, in another order
+            origin = {}
+            old = list(saved.items())
+            rng.shuffle(old)
+            for hwnd in list(deck.windows.windows):
+                deck.windows.destroy_window(hwnd)
+                deck.fg_source.windows.pop(hwnd, None)
+            for i, (old_hwnd, (cls, title, pid, _, _)) in enumerate(old):
+                hwnd = 0x90000 + i
+                if rng.random() < WORKSPACE_RETITLED:
+                    title = re.sub(r"\((\d)\)", lambda m: f"({int(m.group(1)) + 1})", title)
+                deck.fg_source.windows[hwnd] = pid
+                deck.windows.add_window(hwnd, (0, 0, 640, 480), cls=cls, title=title, pid=pid)
+                origin[hwnd] = old_hwnd
+
+            live = main._live_windows()
+            start = time.perf_counter()
+            main._match_workspace(workspace.entries, live)
+            match = time.perf_counter() - start
+            start = time.perf_counter()
+            _naive_match(workspace.entries, live)
+            naive = time.perf_counter() - start
+
+            deck.windows.calls.clear()
+            start = time.perf_counter()
+            moved = len(main._restore_workspace("bench").result(10.0))
+            deck.worker.wait_idle(10.0)
+            restore = time.perf_counter() - start
+            txns = deck.windows.calls.get("set_window_rects", 0)
+            assert moved == count and txns == 1, (moved, txns)
+            correct = 0
+            for hwnd, win in deck.windows.windows.items():
+                _, _, _, show, normal = saved[origin[hwnd]]
+                if win.show == show and deck.windows.normal_rect(hwnd) == normal:
+                    correct += 1
+        print(
+            f"  {count:>7} {capture * 1e3:7.2f}ms {len(blob):>7} {dump * 1e3:6.2f}ms {load * 1e3:6.2f}ms "
+            f"{match * 1e3:6.2f}ms {naive * 1e3:7.2f}ms {restore * 1e3:7.2f}ms {txns:>4} "
+            f"{correct / count:7.1%}"
+        )
+
+
+# ---------------- ANIMATION ----------------
+ANIMATION_RATES = [60, 144]
+ANIMATION_FRAME_COSTS = [("light", 0.001), ("heavy", 0.009)]  # per submitted frame
+ANIMATION_STALL_SEC = 0.05  # one hitch mid-animation, e.g. a window busy repainting
+ANIMATION_SNAP = ((0, 0, 1290, 1400), (0, 0, 1920, 1400))
+
+
+class _FrameSink:
+    """Records animator frames; each one costs virtual time, like a real move would."""
+
+    def __init__(self, clock, cost: float, stall_at: int = None):
+        self.clock = clock
+        self.cost = cost
+        self.stall_at = stall_at
+        self.frames = []
+
+    def submit_frame(self, hwnd, rect):
+        self.frames.append((self.clock(), hwnd, rect))
+        self.clock.advance(self.cost)
+        if len(self.frames) == self.stall_at:
+            self.clock.advance(ANIMATION_STALL_SEC)
+
+
+def _drive_animator(animator, clock):
+    while animator.active():
+        deadline = animator.next_deadline()
+        if deadline > clock.now:
+            clock.now = deadline  # sleeping until the deadline, on the virtual clock
+        animator.tick()
+
+
+def _naive_animation_end(hz: int, cost: float, stall: float) -> float:
+    # for frame in range(n): move(); time.sleep(1 / hz)
+    frames = int(main.ANIMATION_DURATION_SEC * hz)
+    return frames * (cost + 1.0 / hz) + stall
+
+
+def bench_animation():
+    duration = main.ANIMATION_DURATION_SEC
+    print(f"animation: one {duration * 1e3:.0f}ms snap on a virtual clock, "
+          f"optional {ANIMATION_STALL_SEC * 1e3:.0f}ms stall")
+    print(f"  {'hz':>4} {'frames':<6} {'stall':<5} {'rendered':>8} {'dropped':>7} {'off grid':>9} "
+          f"{'ends at':>9} {'naive ends':>10}")
+    start_rect, end_rect = ANIMATION_SNAP
+    for hz in ANIMATION_RATES:
+        for label, cost in ANIMATION_FRAME_COSTS:
+            for stall in (False, True):
+                clock = main._VirtualClock(100.0)
+                sink = _FrameSink(clock, cost, stall_at=3 if stall else None)
+                animator = main._WindowAnimator(sink, hz, clock=clock)
+                animator.animate(0x1000, start_rect, end_rect)
+                _drive_animator(animator, clock)
+                assert sink.frames[-1][2] == end_rect
+                period = 1.0 / hz
+                off_grid = [abs((t - 100.0) - round((t - 100.0) / period) * period) for t, _, _ in sink.frames]
+                ends = sink.frames[-1][0] - 100.0
+                naive = _naive_animation_end(hz, cost, ANIMATION_STALL_SEC if stall else 0.0)
+                print(
+                    f"  {hz:>4} {label:<6} {'yes' if stall else 'no':<5} {animator.frames:>8} "
+                    f"{animator.dropped:>7} {_percentile(off_grid, 99) * 1e3:7.2f}ms "
+                    f"{ends * 1e3:7.1f}ms {naive * 1e3:8.1f}ms"
+                )
+
+    # A second snap mid-animation takes over from wherever the window is
+    clock = main._VirtualClock(100.0)
+    sink = _FrameSink(clock, 0.001)
+    animator = main._WindowAnimator(sink, 60, clock=clock)
+    animator.animate(0x1000, start_rect, end_rect)
+    while clock.now < 100.0 + duration / 2:
+        clock.now = animator.next_deadline()
+        animator.tick()
+    midway = sink.frames[-1][2]
+    retarget = (0, 0, 2560, 1400)
+    animator.animate(0x1000, midway, retarget)
+    _drive_animator(animator, clock)
+    jumps = [abs(b[2][2] - a[2][2]) for a, b in zip(sink.frames, sink.frames[1:])]
+    assert sink.frames[-1][2] == retarget and animator.cancelled == 1
+    print(f"  retarget at {duration / 2 * 1e3:.0f}ms: {animator.frames} frames, largest step "
+          f"{max(jumps)}px, ends at {(sink.frames[-1][0] - 100.0) * 1e3:.1f}ms")
+
+    # Real threads and clock: F13 with animation on, through the window worker
+    with _HeadlessDeck(random.Random(25)) as deck:
+        main._animate_snaps = True
+        hwnd = next(iter(deck.windows.windows))
+        deck.focus(hwnd)
+        animator = main._get_window_animator()
+        deck.windows.calls.clear()
+        start = time.perf_counter()
+        main._cycle_widths("left")
+        target = animator.target(hwnd)
+        while animator.active():
+            time.sleep(0.001)
+        deck.worker.wait_idle(1.0)
+        elapsed = time.perf_counter() - start
+        assert deck.windows.windows[hwnd].rect == target
+        stats = animator.stats()
+        print(f"  threaded {stats['hz']}Hz: {stats['frames']} frames, {stats['dropped']} dropped, "
+              f"{deck.windows.calls.get('set_window_rect', 0)} moves, done in {elapsed * 1e3:.1f}ms")
+
+
+# ---------------- ZONES ----------------
+ZONE_GRIDS = [(3, 2), (8, 6), (16, 12), (32, 24)]
+ZONE_QUERIES = 20000
+
+
+def bench_zones():
+    print(f"zones: nearest-zone lookup over {len(HEADLESS_MONITORS)} monitors ({ZONE_QUERIES} queries)")
+    print(f"  {'grid':<8} {'zones':>6} {'index':>10} {'scan':>10} {'rebuild':>10}")
+    rng = random.Random(12)
+    left = min(m[1][0] for m in HEADLESS_MONITORS)
+    right = max(m[1][2] for m in HEADLESS_MONITORS)
+    bottom = max(m[1][3] for m in HEADLESS_MONITORS)
+    points = [(rng.randint(left - 200, right + 200), rng.randint(-200, bottom + 200)) for _ in range(ZONE_QUERIES)]
+    for cols, rows in ZONE_GRIDS:
+        topology = main._MonitorTopology(
+            main._FakeMonitorProvider(HEADLESS_MONITORS), {"default": main._grid_zones(cols, rows)}
+        )
+        start = time.perf_counter()
+        topology.start()
+        rebuild = time.perf_counter() - start
+        index = topology.zones
+        centers = [((l + r) // 2, (t + b) // 2) for l, t, r, b in index.rects]
+
+        def scan(x, y):
+            return min(range(len(centers)), key=lambda i: (centers[i][0] - x) ** 2 + (centers[i][1] - y) ** 2)
+
+        start = time.perf_counter()
+        found = [index.nearest(x, y) for x, y in points]
+        indexed = (time.perf_counter() - start) / len(points)
+        start = time.perf_counter()
+        expected = [scan(x, y) for x, y in points]
+        scanned = (time.perf_counter() - start) / len(points)
+        for (x, y), a, b in zip(points, found, expected):
+            da = (centers[a][0] - x) ** 2 + (centers[a][1] - y) ** 2
+            db = (centers[b][0] - x) ** 2 + (centers[b][1] - y) ** 2
+            assert da == db, f"index disagrees with scan at {(x, y)}"
+        print(
+            f"  {cols}x{rows:<6} {len(index):>6} {_fmt_us(indexed)} {_fmt_us(scanned)} {_fmt_us(rebuild)}"
+        )
+
+
+# ---------------- MACRO PLAYBACK ----------------
+MACRO_EVENTS = 200
+
+
+def bench_macro():
+    print(f"macro: playback lateness over {MACRO_EVENTS} events (recording injector)")
+    rng = random.Random(10)
+    t = 0.0
+    events = []
+    for i in range(MACRO_EVENTS // 2):
+        scan = rng.randint(0x10, 0x32)
+        events.append((t, scan, False, False))
+        t += rng.uniform(0.002, 0.015)
+        events.append((t, scan, True, False))
+        t += rng.uniform(0.002, 0.015)
+    macro = main._Macro.from_events(events)
+    print(f"  packed size  {len(macro.data)} bytes ({main._Macro.RECORD.size} per event)")
+    for label, spin in (("sleep+spin", main.MACRO_SPIN_SEC), ("sleep only", 0.0)):
+        injector = main._RecordingInjector()
+        player = main._MacroPlayer(lambda: injector, spin=spin)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = player.play_blocking(macro)
+        print(
+            f"  {label:<12} sent={report['sent']:<4} p50={report['p50_us']:>8.1f}us "
+            f"p99={report['p99_us']:>8.1f}us max={report['max_us']:>8.1f}us"
+        )
+
+
+SUITES = {
+    "scheduler": bench_scheduler,
+    "keymap": bench_keymap,
+    "metrics": bench_metrics,
+    "trace": bench_trace,
+    "macro": bench_macro,
+    "zones": bench_zones,
+    "windows": bench_window_worker,
+    "com": bench_com,
+    "profiles": bench_profiles,
+    "footprint": bench_footprint,
+    "ipc": bench_ipc,
+    "websocket": bench_websocket,
+    "logging": bench_logging,
+    "sessions": bench_sessions,
+    "windowindex": bench_window_index,
+    "tiling": bench_tiling,
+    "workspaces": bench_workspaces,
+    "animation": bench_animation,
+}
+
+
+def main_cli(argv):
+    parser = argparse.ArgumentParser(description="MMO Deck benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"suites to run ({', '.join(SUITES)})")
+    parser.add_argument("--trace", metavar="PATH", help="key trace to replay in the trace suite")
+    parser.add_argument("--realtime", action="store_true", help="replay the trace at recorded timing")
+    args = parser.parse_args(argv)
+
+    names = args.suites or list(SUITES)
+    unknown = [n for n in names if n not in SUITES]
+    if unknown:
+        print(f"Unknown suite(s): {', '.join(unknown)}. Available: {', '.join(SUITES)}")
+        return 2
+    for name in names:
+        if name == "trace":
+            bench_trace(args.trace, args.realtime)
+        else:
+            SUITES[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli(sys.argv[1:]))
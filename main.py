@@ -5,50 +5,108 @@ Hotkeys:
   F13               -> cycle LEFT widths
   F14               -> Maximize/Restore active window (ShowWindow)
   F15               -> cycle RIGHT widths
+  Shift+F14         -> Restore the geometry the window had before it was snapped
   Shift+F13         -> Cycle BOTTOM heights (Y axis)
   Shift+F15         -> Cycle TOP heights (Y axis)
+  Alt+F13/F14/F15   -> Tile the monitor's windows: columns / main+stack (again: cycle
+                       main width) / grid, moved together in one transaction
   F16               -> Tap: Refresh (Ctrl+R / Ctrl+/), Hold: Hard Refresh (Ctrl+F5 or Ctrl+/)
   F17               -> Prev tab  (Ctrl+Shift+Tab)
   F18               -> Next tab  (Ctrl+Tab)
+  Ctrl+F17          -> Back to the previously active window
+  Ctrl+F18          -> Next window of the foreground app (cycles through all of them)
   F19               -> Print Screen
+  F20               -> Tap: restore the saved workspace, Hold: save every window's
+                       position/state as the workspace (named ones via "workspace")
+  Ctrl+F13/Ctrl+F15 -> Previous/next zone (zones.json grids, crosses monitors)
+  Ctrl+F14          -> Snap active window to nearest zone
+  Ctrl+Shift+F14    -> Move active window to next monitor's nearest zone
+  Ctrl+F19          -> Start/stop macro recording
+  Shift+F19         -> Play macro (press again to cancel)
   Ctrl+F23          -> Switch desktop left (Win+Ctrl+Left)
   Ctrl+F24          -> Switch desktop right (Win+Ctrl+Right)
   F21               -> Open This PC
   F22               -> Toggle Desktop (Win+D)
   F23               -> Volume Down (direct)
   F24               -> Volume Up (direct)
+  Alt+F23/Alt+F24   -> Volume Down/Up for the foreground app only (its audio session)
+
+Options:
+  --startup-report  -> print per-phase startup timings once the GUI and tray are up
+  --record-trace P  -> record hotkey and modifier events to P, other keys only as
+                       "other" (replay with: python bench.py trace --trace P)
+  --headless        -> no Tk at startup; the tray is the UI and "Show" opens the
+                       settings window on demand (closed again on hide)
+  --animate         -> width/height cycles, halves and zone snaps slide into place, one
+                       frame per display refresh (tray: Animate snaps)
+  --log-level L     -> debug | info | warning | error (tray: Log level); written by a
+                       background thread to %APPDATA%/MMO Deck/mmo-deck.log (rotated)
+
+Only one instance runs; a second launch asks the first to show its window.
+Commands for the running instance (named pipe / Unix socket):
+  run <action> [--steps N]   e.g. "MMO Deck.exe run cycle_left", "run volume_up --steps 5"
+  focus <exe>                most recent window of an app, e.g. "focus discord.exe"
+  workspace save|restore [name] | workspace list
+  show | ping | actions
+
+  --websocket [PORT] -> also serve those commands over ws://127.0.0.1:PORT (8765):
+                       first send {"token": ...} with the contents of
+                       %APPDATA%/MMO Deck/websocket.token, then
+                       {"cmd": "run", "action": "volume_up"} or {"batch": [...]};
+                       volume / foreground app / profile changes are pushed as
+                       {"type": "state", ...}
 
 Install:
   pip install keyboard pywin32 pycaw comtypes
+  pip install websockets   (optional, for --websocket)
 """
 
+import time
+
+_STARTUP_T0 = time.perf_counter()
+
 import os
 import sys
-import time
+import json
 import ctypes
+import struct
+import argparse
 import threading
-import tkinter as tk
-from tkinter import ttk
 import subprocess
-
-import keyboard
-import win32gui
-import win32con
-import win32api
-import win32com.client
-import pythoncom
-import win32process
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-
+import heapq
+import queue
+import itertools
+import re
+import fnmatch
+import hmac
+import secrets
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from ctypes import cast, POINTER, wintypes
+
+# Win32 and hook modules are only importable on Windows; guarding them lets the
+# fake providers below be exercised on other platforms.
 try:
-    import pystray
-    from PIL import Image, ImageDraw
-except Exception:
-    pystray = None
-    Image = None
-    ImageDraw = None
+    import keyboard
+    import win32gui
+    import win32con
+    import win32api
+    import win32process
+    import win32event
+except ImportError:
+    keyboard = None
+    win32gui = win32con = win32api = win32process = win32event = None
+
+# Heavy subsystems are imported on first use (see _ensure_subsystem) so hotkeys
+# are live before they finish loading.
+tk = ttk = None
+pythoncom = win32com = None
+_com_import_thread = None
+CLSCTX_ALL = AudioUtilities = IAudioEndpointVolume = None
+pystray = Image = ImageDraw = None
+asyncio = websockets = None
 
 # ---------------- HOTKEYS ----------------
 LEFT_HOTKEY  = "f13"
@@ -59,19 +117,76 @@ REFRESH_HOTKEY   = "f16"
 PREV_TAB_HOTKEY  = "f17"
 NEXT_TAB_HOTKEY  = "f18"
 PRINT_SCREEN_HOTKEY = "f19"
+WORKSPACE_HOTKEY = "f20"
 
 BROWSER_BACK_HOTKEY = "shift+f23"
 BROWSER_FORWARD_HOTKEY = "shift+f24"
 VOLUME_DOWN_HOTKEY = "f23"
 VOLUME_UP_HOTKEY   = "f24"
+APP_VOLUME_DOWN_HOTKEY = "alt+f23"
+APP_VOLUME_UP_HOTKEY   = "alt+f24"
 TOGGLE_DESKTOP_HOTKEY = "f22"
 OPEN_THIS_PC_HOTKEY = "f21"
+DESKTOP_LEFT_HOTKEY = "ctrl+f23"
+DESKTOP_RIGHT_HOTKEY = "ctrl+f24"
+MACRO_RECORD_HOTKEY = "ctrl+f19"
+MACRO_PLAY_HOTKEY = "shift+f19"
+PREV_ZONE_HOTKEY = "ctrl+f13"
+SNAP_ZONE_HOTKEY = "ctrl+f14"
+NEXT_ZONE_HOTKEY = "ctrl+f15"
+NEXT_MONITOR_HOTKEY = "ctrl+shift+f14"
+RESTORE_GEOMETRY_HOTKEY = "shift+f14"
+LAST_WINDOW_HOTKEY = "ctrl+f17"
+TILE_COLUMNS_HOTKEY = "alt+f13"
+TILE_MAIN_STACK_HOTKEY = "alt+f14"
+TILE_GRID_HOTKEY = "alt+f15"
+NEXT_APP_WINDOW_HOTKEY = "ctrl+f18"
+
+# (hotkey, gesture, action name[, options]); see ACTIONS and _GestureEngine.
+# Modifiers match as a subset: the hotkey with the most modifiers that are all
+# currently held wins. Gestures: press, tap, hold, double_tap, repeat. A press
+# fires once per physical press unless its options set "repeat_press", which
+# fires it again on every OS auto-repeat while the key is held.
+REPEAT_PRESS = {"repeat_press": True}
+KEYMAP = [
+    (LEFT_HOTKEY, "press", "cycle_left", REPEAT_PRESS),
+    ("shift+" + LEFT_HOTKEY, "press", "cycle_bottom_heights", REPEAT_PRESS),
+    (MAX_HOTKEY, "press", "maximize"),
+    (RESTORE_GEOMETRY_HOTKEY, "press", "restore_geometry"),
+    (RIGHT_HOTKEY, "press", "cycle_right", REPEAT_PRESS),
+    ("shift+" + RIGHT_HOTKEY, "press", "cycle_top_heights", REPEAT_PRESS),
+    (REFRESH_HOTKEY, "tap", "refresh"),
+    (REFRESH_HOTKEY, "hold", "hard_refresh"),
+    (PREV_TAB_HOTKEY, "repeat", "prev_tab"),
+    (NEXT_TAB_HOTKEY, "repeat", "next_tab"),
+    (TILE_COLUMNS_HOTKEY, "press", "tile_columns"),
+    (TILE_MAIN_STACK_HOTKEY, "press", "tile_main_stack"),
+    (TILE_GRID_HOTKEY, "press", "tile_grid"),
+    (LAST_WINDOW_HOTKEY, "press", "last_window"),
+    (NEXT_APP_WINDOW_HOTKEY, "press", "next_app_window"),
+    (PRINT_SCREEN_HOTKEY, "press", "print_screen"),
+    (WORKSPACE_HOTKEY, "tap", "restore_workspace"),
+    (WORKSPACE_HOTKEY, "hold", "save_workspace"),
+    (OPEN_THIS_PC_HOTKEY, "press", "open_this_pc"),
+    (TOGGLE_DESKTOP_HOTKEY, "press", "toggle_desktop"),
+    (VOLUME_DOWN_HOTKEY, "repeat", "volume_down"),
+    (VOLUME_UP_HOTKEY, "repeat", "volume_up"),
+    (APP_VOLUME_DOWN_HOTKEY, "repeat", "app_volume_down"),
+    (APP_VOLUME_UP_HOTKEY, "repeat", "app_volume_up"),
+    (DESKTOP_LEFT_HOTKEY, "press", "desktop_left", REPEAT_PRESS),
+    (DESKTOP_RIGHT_HOTKEY, "press", "desktop_right", REPEAT_PRESS),
+    (MACRO_RECORD_HOTKEY, "press", "macro_record"),
+    (MACRO_PLAY_HOTKEY, "press", "macro_play"),
+    (PREV_ZONE_HOTKEY, "press", "prev_zone"),
+    (SNAP_ZONE_HOTKEY, "press", "snap_to_zone"),
+    (NEXT_ZONE_HOTKEY, "press", "next_zone"),
+    (NEXT_MONITOR_HOTKEY, "press", "next_monitor"),
+]
 
 # ---------------- TUNING KNOBS ----------------
 # Window sizing
 WINDOW_WIDTHS = [0.5040, 0.3372, 0.6707]
 WINDOW_POS_TOL_PX = 2
-WINDOW_CYCLE_DEBOUNCE_SEC = 0.10
 
 # Tab navigation
 TAB_REPEAT_INITIAL_SEC = 0.35
@@ -80,17 +195,23 @@ TAB_REPEAT_SEC = 0.12
 # Volume
 VOLUME_REPEAT_INITIAL_SEC = 0.35
 VOLUME_REPEAT_SEC = 0.03
-
-# Browser detection
-BROWSER_PROCESSES = {"chrome.exe"}
-
-REFRESH_HOLD_THRESHOLD_SEC = 0.40
+VOLUME_STEP_SCALAR = 0.02  # one step when the endpoint doesn't report its step count
+# (repeat ticks held, steps per tick): speeds up long holds
+VOLUME_ACCEL_CURVE = ((0, 1), (15, 2), (40, 3))
+AUDIO_SESSION_RESCAN_SEC = 1.0  # per-app volume: re-enumerate sessions at most this often on a miss
+
+# Foreground detection (per-app behavior lives in PROFILE_RULES)
+FOREGROUND_CACHE_SIZE = 64  # (pid, start time) -> exe name entries kept by the foreground tracker
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+# Gestures (perf_counter based)
+GESTURE_HOLD_SEC = 0.40  # F16 hold -> hard refresh
+GESTURE_DOUBLE_TAP_SEC = 0.25  # only delays taps on keys that also bind double_tap
 APP_NAME = "MMO Deck"
 STARTUP_LINK_NAME = "MMO Deck.lnk"
 ES_CONTINUOUS = 0x80000000
 ES_SYSTEM_REQUIRED = 0x00000001
 ES_DISPLAY_REQUIRED = 0x00000002
-_last_trigger = 0.0
 
 KEYEVENTF_KEYUP = 0x0002
 KEYEVENTF_EXTENDEDKEY = 0x0001
@@ -105,60 +226,1863 @@ VK_LEFT = 0x25
 VK_RIGHT = 0x27
 VK_OEM_2 = 0xBF  # '/' key
 VK_LWIN = 0x5B
+VK_RWIN = 0x5C
 VK_D = 0x44
 VK_VOLUME_UP = 0xAF
 VK_VOLUME_DOWN = 0xAE
 VK_SNAPSHOT = 0x2C  # Print Screen
-
-_volume_endpoint = None
-_tab_state = {}
-_volume_state = {}
-_toggle_state = set()
-_this_pc_state = set()
-_maximize_state = set()
+VK_R = 0x52
+VK_Y = 0x59
+VK_Z = 0x5A
+
+INPUT_KEYBOARD = 1
+
+# Modifier bitmask used by chords (and anything else tracking held modifiers)
+MOD_SHIFT = 0x1
+MOD_CTRL = 0x2
+MOD_ALT = 0x4
+MOD_WIN = 0x8  # left Windows key in release masks; either side in hotkeys
+MOD_RWIN = 0x10  # release masks only: Windows has no generic Win vk to release
+MODIFIER_VKS = {MOD_SHIFT: VK_SHIFT, MOD_CTRL: VK_CONTROL, MOD_ALT: VK_MENU, MOD_WIN: VK_LWIN, MOD_RWIN: VK_RWIN}
+MODIFIER_NAMES = {MOD_SHIFT: "shift", MOD_CTRL: "ctrl", MOD_ALT: "alt", MOD_WIN: "left windows",
+                  MOD_RWIN: "right windows"}
+EXTENDED_VKS = {VK_PRIOR, VK_NEXT, VK_LEFT, VK_RIGHT, VK_LWIN, VK_RWIN}
+
+_volume_engine = None
+_app_volume_engine = None
 _shell_app = None
-_refresh_state = {}
+_com = None
 _tray_icon = None
 _root = None
+_metrics_window = None
+_headless = False
+_quit_event = threading.Event()
+_ui_thread = None
+_foreground = None
+_injector = None
+_topology = None
+_keymap = None
+_scheduler = None
+# Guards the first call of every _get_X() getter: the hook, scheduler and
+# worker threads can all race to create the same singleton. Reentrant because
+# getters call each other while building (the window index needs the tracker).
+_singletons_lock = threading.RLock()
 
 
-def _debounced() -> bool:
-    global _last_trigger
-    now = time.time()
-    if now - _last_trigger < WINDOW_CYCLE_DEBOUNCE_SEC:
-        return False
-    _last_trigger = now
-    return True
+# ---------------- STARTUP / LAZY SUBSYSTEMS ----------------
+# (phase, seconds, thread name) in completion order
+_startup_phases = [("imports", time.perf_counter() - _STARTUP_T0, "MainThread")]
+_subsystems = {}  # name -> loaded ok
 
 
-def _get_foreground_window():
-    hwnd = win32gui.GetForegroundWindow()
-    return hwnd if hwnd else None
+def _record_phase(name: str, seconds: float):
+    _startup_phases.append((name, seconds, threading.current_thread().name))
 
 
-def _get_foreground_process_name():
-    hwnd = _get_foreground_window()
-    if not hwnd:
-        return None
+def _load_audio():
+    global CLSCTX_ALL, AudioUtilities, IAudioEndpointVolume
+    from comtypes import CLSCTX_ALL
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+
+def _load_com():
+    global pythoncom, win32com, _com_import_thread
+    # Importing pythoncom CoInitializes the importing thread (and only that one)
+    import pythoncom
+    import win32com.client
+    _com_import_thread = threading.get_ident()
+
+
+def _load_tk():
+    global tk, ttk
+    import tkinter as tk
+    from tkinter import ttk
+
+
+def _load_tray():
+    global pystray, Image, ImageDraw
     try:
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        handle = win32api.OpenProcess(
-            win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ,
-            False,
-            pid,
-        )
+        import pystray
+        from PIL import Image, ImageDraw
+    except Exception:
+        pystray = Image = ImageDraw = None
+
+
+def _load_websocket():
+    global asyncio, websockets
+    import asyncio
+    import websockets
+
+
+SUBSYSTEM_LOADERS = {
+    "audio": _load_audio,
+    "com": _load_com,
+    "tk": _load_tk,
+    "tray": _load_tray,
+    "websocket": _load_websocket,
+}
+PREWARM_SUBSYSTEMS = ("audio", "com", "tray")
+# One lock per subsystem so a slow background import doesn't block another
+_subsystem_locks = {name: threading.Lock() for name in SUBSYSTEM_LOADERS}
+
+
+def _ensure_subsystem(name: str) -> bool:
+    loaded = _subsystems.get(name)
+    if loaded is not None:
+        return loaded
+    with _subsystem_locks[name]:
+        if name in _subsystems:
+            return _subsystems[name]
+        start = time.perf_counter()
+        try:
+            SUBSYSTEM_LOADERS[name]()
+            ok = True
+        except Exception as exc:
+            _log(LOG_ERROR, "Startup", f"failed to load {name} ({exc})")
+            ok = False
+        _record_phase(f"import {name}", time.perf_counter() - start)
+        _subsystems[name] = ok
+        return ok
+
+
+def _prewarm_subsystems():
+    # Load heavy modules in the background once hooks are live
+    def _run():
+        for name in PREWARM_SUBSYSTEMS:
+            _ensure_subsystem(name)
+        if _com_import_thread == threading.get_ident():
+            # COM is only used on the apartment thread; balance the import's CoInitialize before exiting
+            pythoncom.CoUninitialize()
+
+    thread = threading.Thread(target=_run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def _tray_available() -> bool:
+    return _ensure_subsystem("tray") and pystray is not None and Image is not None
+
+
+class _PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [
+        ("cb", wintypes.DWORD),
+        ("PageFaultCount", wintypes.DWORD),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def _process_footprint() -> dict:
+    # Resident memory and kernel/GDI/USER handle counts for this process
+    if sys.platform == "win32":
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        process = kernel32.GetCurrentProcess()
+        counters = _PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32.K32GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb)
+        handles = wintypes.DWORD()
+        kernel32.GetProcessHandleCount(process, ctypes.byref(handles))
+        return {
+            "rss_kib": counters.WorkingSetSize // 1024,
+            "handles": handles.value,
+            "gdi": ctypes.windll.user32.GetGuiResources(process, 0),
+            "user": ctypes.windll.user32.GetGuiResources(process, 1),
+        }
+    rss_kib = 0
+    with open("/proc/self/status", "r", encoding="ascii") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                rss_kib = int(line.split()[1])
+    return {"rss_kib": rss_kib, "handles": len(os.listdir("/proc/self/fd")), "gdi": None, "user": None}
+
+
+# ---------------- LOGGING ----------------
+LOG_FILE_NAME = "mmo-deck.log"
+LOG_RING_SIZE = 4096  # records buffered between writer passes; oldest dropped past this
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 3
+LOG_FLUSH_SEC = 0.25
+LOG_DEBUG, LOG_INFO, LOG_WARNING, LOG_ERROR = 10, 20, 30, 40
+LOG_LEVELS = {"debug": LOG_DEBUG, "info": LOG_INFO, "warning": LOG_WARNING, "error": LOG_ERROR}
+LOG_LEVEL_NAMES = {value: name.upper() for name, value in LOG_LEVELS.items()}
+
+
+class _RingLog:
+    """Structured log records in a bounded ring, written out by a background thread.
+
+    log() is safe on the hook thread: a level check, one string join and a
+    deque append (atomic, no lock). It never touches the console or disk, so
+    a windowed build without stdout or a slow disk cannot stall a keypress.
+    If the writer falls behind, the oldest records are overwritten. Each
+    record carries a sequence number, and the writer counts the gaps in
+    ``dropped``; only the writer thread updates it, so the count is exact.
+    The writer echoes to stdout when there is one and appends to a
+    size-rotated file.
+    """
+
+    def __init__(self, capacity: int = LOG_RING_SIZE, level: int = LOG_INFO):
+        self._ring = deque(maxlen=max(1, capacity))
+        self._seq = itertools.count()  # next() is atomic, so any thread may take one
+        self._next_seq = 0  # writer side: the sequence number expected next
+        self.level = level
+        self.dropped = 0
+        self.written = 0
+        self._path = None
+        self._file = None
+        self._size = 0
+        self._max_bytes = LOG_MAX_BYTES
+        self._backups = LOG_BACKUPS
+        self._stop = threading.Event()
+        self._thread = None
+
+    def log(self, level: int, area: str, message: str, fields=None):
+        if level < self.level:
+            return
+        if fields:
+            message = message + " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        self._ring.append((next(self._seq), time.time(), level, area, message))
+
+    def start(self, path=None, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {"level": LOG_LEVEL_NAMES.get(self.level), "buffered": len(self._ring),
+                "written": self.written, "dropped": self.dropped}
+
+    def _run(self):
+        while not self._stop.wait(LOG_FLUSH_SEC):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        lines = []
+        ring = self._ring
+        while True:
+            try:
+                seq, t, level, area, message = ring.popleft()
+            except IndexError:
+                break
+            if seq > self._next_seq:
+                self.dropped += seq - self._next_seq  # overwritten before we got to them
+            self._next_seq = seq + 1
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+            lines.append(f"{stamp}.{int(t % 1 * 1000):03d} {LOG_LEVEL_NAMES[level]:<7} {area}: {message}\n")
+        if not lines:
+            return
+        text = "".join(lines)
+        self.written += len(lines)
+        if sys.stdout is not None:  # None in the --windowed build
+            try:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            except Exception:
+                pass
+        if self._path is not None:
+            try:
+                self._write_file(text)
+            except OSError as exc:
+                self._path = None
+                if sys.stdout is not None:
+                    sys.stdout.write(f"Log: file disabled ({exc})\n")
+
+    def _write_file(self, text: str):
+        data = text.encode("utf-8")
+        if self._file is not None and self._size + len(data) > self._max_bytes:
+            self._file.close()
+            self._file = None
+            for i in range(self._backups - 1, 0, -1):
+                if os.path.exists(f"{self._path}.{i}"):
+                    os.replace(f"{self._path}.{i}", f"{self._path}.{i + 1}")
+            if self._backups > 0:
+                os.replace(self._path, f"{self._path}.1")
+            else:
+                os.remove(self._path)
+        if self._file is None:
+            self._file = open(self._path, "ab")
+            self._size = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+
+# Created at import so records from startup are kept until main() starts the writer
+_logger = _RingLog()
+
+
+def _log(level: int, area: str, message: str, **fields):
+    _logger.log(level, area, message, fields)
+
+
+def _set_log_level(name: str):
+    _logger.level = LOG_LEVELS[name]
+
+
+def _print_startup_report():
+    print("Startup report:")
+    for name, seconds, thread in _startup_phases:
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms  [{thread}]")
+    print(f"  {'total to ready':<24} {(time.perf_counter() - _STARTUP_T0) * 1000:8.1f} ms")
+    try:
+        fp = _process_footprint()
+        print(f"  {'resident memory':<24} {fp['rss_kib'] / 1024:8.1f} MiB")
+        print(f"  {'handles':<24} {fp['handles']:8d}   gdi={fp['gdi']} user={fp['user']}")
+    except Exception as exc:
+        print(f"  footprint unavailable ({exc})")
+
+
+class _ScheduledCall:
+    """Handle for a deadline owned by _Scheduler; ``cancel()`` is idempotent."""
+
+    __slots__ = ("deadline", "interval", "fn", "cancelled")
+
+    def __init__(self, deadline: float, interval, fn):
+        self.deadline = deadline
+        self.interval = interval
+        self.fn = fn
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _Scheduler:
+    """One long-lived thread that owns every repeat and hold deadline.
+
+    Deadlines live in a heap keyed on ``time.perf_counter``. Cancelled calls are
+    dropped lazily when they reach the top. Repeating calls are rescheduled from
+    their previous deadline so they don't drift, unless they fell behind by more
+    than one interval.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def call_later(self, delay: float, fn) -> _ScheduledCall:
+        return self._push(_ScheduledCall(self._clock() + delay, None, fn))
+
+    def call_repeating(self, initial: float, interval: float, fn) -> _ScheduledCall:
+        return self._push(_ScheduledCall(self._clock() + initial, interval, fn))
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for _, _, call in self._heap if not call.cancelled)
+
+    def _push(self, call: _ScheduledCall) -> _ScheduledCall:
+        self.start()
+        with self._cond:
+            heapq.heappush(self._heap, (call.deadline, next(self._seq), call))
+            if self._heap[0][2] is call:
+                self._cond.notify()
+        return call
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, _, call = self._heap[0]
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(remaining)
+            try:
+                call.fn()
+            except Exception as exc:
+                _log(LOG_ERROR, "Scheduler", f"callback failed ({exc})")
+            if call.interval is not None and not call.cancelled:
+                now = self._clock()
+                call.deadline += call.interval
+                if call.deadline < now - call.interval:
+                    call.deadline = now + call.interval
+                self._push(call)
+
+
+def _get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _singletons_lock:
+            if _scheduler is None:
+                scheduler = _Scheduler()
+                scheduler.start()
+                _scheduler = scheduler  # published last: the unlocked check must see it ready
+    return _scheduler
+
+
+# ---------------- COM APARTMENT ----------------
+COM_CALL_TIMEOUT_SEC = 2.0  # blocking calls give up (and callers fall back) after this
+
+
+class _ComApartment:
+    """One long-lived single-threaded apartment that owns every COM object.
+
+    The thread initializes COM once and runs submitted calls in order, pumping
+    window messages between them as an STA must. When idle it sleeps in
+    MsgWaitForMultipleObjects on a wake event, so it wakes for a submit or a
+    message and never polls. ``submit`` returns a Future;
+    ``call`` waits for it. Objects created here (Shell.Application, the audio
+    endpoint) are only touched from this thread, so no call pays for apartment
+    setup and no object crosses apartments. ``com_init=False`` skips pythoncom
+    for headless runs.
+    """
+
+    def __init__(self, name: str = "com-sta", com_init: bool = True):
+        self._name = name
+        self._com_init = com_init
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._wake = None  # auto-reset event, set by submit while COM is up
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        self._queue.put((future, fn, args))
+        if self._wake is not None:
+            win32event.SetEvent(self._wake)
+        if self._thread is None:
+            self.start()
+        return future
+
+    def call(self, fn, *args, timeout: float = COM_CALL_TIMEOUT_SEC):
+        if threading.current_thread() is self._thread:
+            return fn(*args)  # already on the apartment (e.g. nested call)
+        return self.submit(fn, *args).result(timeout)
+
+    def _run(self):
+        if not (self._com_init and _ensure_subsystem("com")):
+            while True:
+                self._execute(*self._queue.get())
+        pythoncom.CoInitialize()
+        # Created before the first drain: a submit that saw no event is drained below
+        self._wake = win32event.CreateEvent(None, False, False, None)
+        while True:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._execute(*item)
+                pythoncom.PumpWaitingMessages()
+            win32event.MsgWaitForMultipleObjects(
+                (self._wake,), False, win32event.INFINITE, win32event.QS_ALLINPUT
+            )
+            pythoncom.PumpWaitingMessages()
+
+    def _execute(self, future, fn, args):
+        if not future.set_running_or_notify_cancel():
+            return
+        self.calls += 1
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+
+class _InlineApartment:
+    """Stand-in for _ComApartment that runs calls on the caller's thread."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def start(self):
+        pass
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        self.calls += 1
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def call(self, fn, *args, timeout: float = COM_CALL_TIMEOUT_SEC):
+        self.calls += 1
+        return fn(*args)
+
+
+class _ApartmentProxy:
+    """Forwards method calls on a COM object to the apartment that owns it."""
+
+    def __init__(self, apartment, obj):
+        self._apartment = apartment
+        self._obj = obj
+
+    def __getattr__(self, name):
+        method = getattr(self._obj, name)
+
+        def _call(*args):
+            return self._apartment.call(method, *args)
+
+        return _call
+
+    def post(self, name: str, *args) -> Future:
+        # Queues the call without waiting for it
+        return self._apartment.submit(getattr(self._obj, name), *args)
+
+
+def _get_com_apartment():
+    global _com
+    if _com is None:
+        with _singletons_lock:
+            if _com is None:
+                com = _ComApartment()
+                com.start()
+                _com = com
+    return _com
+
+
+# ---------------- WINDOWS ----------------
+SW_SHOWNORMAL = 1
+SW_SHOWMAXIMIZED = 3
+SW_MAXIMIZE = 3
+SW_RESTORE = 9
+SWP_NOZORDER = 0x0004
+SWP_NOACTIVATE = 0x0010
+SWP_ASYNCWINDOWPOS = 0x4000
+SW_SHOWMINIMIZED = 2
+SW_SHOWMINNOACTIVE = 7
+SW_SHOWNOACTIVATE = 4
+WPF_ASYNCWINDOWPLACEMENT = 0x0004
+# Layout show state -> SetWindowPlacement showCmd; none but maximize activates
+PLACEMENT_SHOW = {
+    SW_SHOWNORMAL: SW_SHOWNOACTIVATE,
+    SW_SHOWMAXIMIZED: SW_SHOWMAXIMIZED,
+    SW_SHOWMINIMIZED: SW_SHOWMINNOACTIVE,
+}
+WS_EX_TOOLWINDOW = 0x00000080
+GA_ROOT = 2
+GW_OWNER = 4
+DWMWA_CLOAKED = 14
+IGNORABLE_WINDOW_CLASSES = ("Progman", "WorkerW", "Shell_TrayWnd")
+DESTROY_SWEEP_SEC = 5.0  # how often hwnds held by caches are checked with IsWindow
+APPLIED_TARGET_TTL_SEC = 0.5  # how long an applied async move counts as the window's state
+WINDOW_MOVE_METRIC = "window_move"  # queue-to-applied latency, recorded by the worker
+
+
+# A private user32 handle whose DeferWindowPos prototypes are declared once;
+# without restype=HANDLE ctypes truncates the HDWP to a C int on 64-bit.
+if sys.platform == "win32":
+    _defer_user32 = ctypes.WinDLL("user32")
+    _defer_user32.BeginDeferWindowPos.argtypes = (ctypes.c_int,)
+    _defer_user32.BeginDeferWindowPos.restype = wintypes.HANDLE
+    _defer_user32.DeferWindowPos.argtypes = (
+        wintypes.HANDLE, wintypes.HWND, wintypes.HWND,
+        ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, wintypes.UINT,
+    )
+    _defer_user32.DeferWindowPos.restype = wintypes.HANDLE
+    _defer_user32.EndDeferWindowPos.argtypes = (wintypes.HANDLE,)
+    _defer_user32.EndDeferWindowPos.restype = wintypes.BOOL
+else:
+    _defer_user32 = None
+
+
+class _Win32WindowBackend:
+    """Top-level window queries and moves through win32gui."""
+
+    def __init__(self):
+        self._watchers = []  # (callback, known) from watch_destroyed
+        self._sweep_call = None
+
+    def foreground_window(self):
+        hwnd = win32gui.GetForegroundWindow()
+        return hwnd if hwnd else None
+
+    def class_name(self, hwnd: int) -> str:
+        return win32gui.GetClassName(hwnd)
+
+    def window_title(self, hwnd: int) -> str:
+        return win32gui.GetWindowText(hwnd)
+
+    def window_rect(self, hwnd: int):
+        return win32gui.GetWindowRect(hwnd)
+
+    def show_state(self, hwnd: int) -> int:
+        return win32gui.GetWindowPlacement(hwnd)[1]
+
+    def normal_rect(self, hwnd: int):
+        # rcNormalPosition is in workspace coordinates, which are offset from
+        # screen coordinates by the primary monitor's work area origin.
+        l, t, r, b = win32gui.GetWindowPlacement(hwnd)[4]
+        work = win32api.GetMonitorInfo(win32api.MonitorFromPoint((0, 0)))["Work"]
+        return (l + work[0], t + work[1], r + work[0], b + work[1])
+
+    def show_window(self, hwnd: int, cmd: int, asynchronous: bool = False):
+        if asynchronous:
+            # Posted to the window's thread; a hung window can't block the caller
+            ctypes.windll.user32.ShowWindowAsync(hwnd, cmd)
+        else:
+            win32gui.ShowWindow(hwnd, cmd)
+
+    def set_window_rect(self, hwnd: int, rect, flags: int = 0):
+        l, t, r, b = rect
+        win32gui.SetWindowPos(hwnd, None, l, t, r - l, b - t, SWP_NOZORDER | SWP_NOACTIVATE | flags)
+
+    def set_placement(self, hwnd: int, rect, cmd: int):
+        # Restored rect and show state in one step, posted so a hung window can't block us.
+        # rcNormalPosition is in workspace coordinates (see normal_rect).
+        work = win32api.GetMonitorInfo(win32api.MonitorFromPoint((0, 0)))["Work"]
+        l, t, r, b = rect
+        _, _, pt_min, pt_max, _ = win32gui.GetWindowPlacement(hwnd)
+        win32gui.SetWindowPlacement(hwnd, (
+            WPF_ASYNCWINDOWPLACEMENT, cmd, pt_min, pt_max,
+            (l - work[0], t - work[1], r - work[0], b - work[1]),
+        ))
+
+    def set_window_rects(self, moves, flags: int = 0):
+        # One DeferWindowPos transaction, so every window moves in one repaint.
+        # -> None, or the hwnd that refused (the whole transaction is dropped then)
+        user32 = _defer_user32
+        for hwnd, _ in moves:
+            if user32.IsHungAppWindow(hwnd):
+                return hwnd  # EndDeferWindowPos would wait on it
+        hdwp = user32.BeginDeferWindowPos(len(moves))
+        if not hdwp:
+            return moves[0][0]
+        for hwnd, (l, t, r, b) in moves:
+            hdwp = user32.DeferWindowPos(hdwp, hwnd, None, l, t, r - l, b - t,
+                                         SWP_NOZORDER | SWP_NOACTIVATE | flags)
+            if not hdwp:
+                return hwnd  # a failed DeferWindowPos frees the transaction
+        if not user32.EndDeferWindowPos(hdwp):
+            return moves[0][0]
+        return None
+
+    def is_hung(self, hwnd: int) -> bool:
+        return bool(ctypes.windll.user32.IsHungAppWindow(hwnd))
+
+    def is_window(self, hwnd: int) -> bool:
+        return bool(ctypes.windll.user32.IsWindow(hwnd))
+
+    def watch_destroyed(self, callback, known) -> bool:
+        # No EVENT_OBJECT_DESTROY hook: it is system-wide and would marshal every
+        # destroyed object in the session into this process. Instead the hwnds
+        # known() returns are checked with IsWindow every DESTROY_SWEEP_SEC.
+        self._watchers.append((callback, known))
+        if self._sweep_call is None:
+            self._sweep_call = _get_scheduler().call_repeating(DESTROY_SWEEP_SEC, DESTROY_SWEEP_SEC, self._sweep)
+        return True
+
+    def _sweep(self):
+        for callback, known in list(self._watchers):
+            for hwnd in known():
+                if not self.is_window(hwnd):
+                    callback(hwnd)
+
+    def top_level_windows(self):
+        # EnumWindows walks top-level windows in z-order, topmost first
+        found = []
+        win32gui.EnumWindows(lambda hwnd, _: found.append(hwnd), None)
+        return [hwnd for hwnd in found if self.is_switchable(hwnd)]
+
+    def _is_unowned_top_level(self, hwnd: int) -> bool:
+        # Two cheap calls that rule out child controls, menus and tooltips
+        user32 = ctypes.windll.user32
+        return user32.GetAncestor(hwnd, GA_ROOT) == hwnd and not user32.GetWindow(hwnd, GW_OWNER)
+
+    def is_switchable(self, hwnd: int) -> bool:
+        # Roughly what Alt+Tab lists: visible, top-level, unowned, not a tool window or cloaked.
+        # Cheapest checks first; the DWM query is the most expensive
+        try:
+            if not self._is_unowned_top_level(hwnd) or not win32gui.IsWindowVisible(hwnd):
+                return False
+            if win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE) & WS_EX_TOOLWINDOW:
+                return False
+            cloaked = wintypes.DWORD()
+            ctypes.windll.dwmapi.DwmGetWindowAttribute(
+                wintypes.HWND(hwnd), DWMWA_CLOAKED, ctypes.byref(cloaked), ctypes.sizeof(cloaked)
+            )
+            return not cloaked.value and win32gui.GetClassName(hwnd) not in IGNORABLE_WINDOW_CLASSES
+        except Exception:
+            return False
+
+    def watch_visibility(self, on_shown, on_hidden) -> bool:
+        # Most SHOW events are child controls and popups; drop them before the full is_switchable
+        def _on_event(hook, event, hwnd, id_object, id_child, thread_id, time_ms):
+            if not hwnd or id_object != OBJID_WINDOW or id_child != 0:
+                return
+            if event != EVENT_OBJECT_SHOW:
+                on_hidden(hwnd)
+            elif self._is_unowned_top_level(hwnd):
+                on_shown(hwnd)
+
+        shown = _install_win_event_hook(EVENT_OBJECT_SHOW, _on_event)
+        return _install_win_event_hook(EVENT_OBJECT_HIDE, _on_event) and shown
+
+    def activate(self, hwnd: int):
+        user32 = ctypes.windll.user32
+        if user32.IsIconic(hwnd):
+            user32.ShowWindowAsync(hwnd, SW_RESTORE)
+        if user32.SetForegroundWindow(hwnd):
+            return
+        # Foreground lock: share input state with the foreground window's thread
+        # for the call. (A synthetic Alt tap would also work, but with a
+        # modifier held or an app that has a menu bar it opens the menu.)
+        foreground_thread = user32.GetWindowThreadProcessId(user32.GetForegroundWindow(), None)
+        own_thread = ctypes.windll.kernel32.GetCurrentThreadId()
+        attached = (foreground_thread and foreground_thread != own_thread
+                    and user32.AttachThreadInput(own_thread, foreground_thread, True))
         try:
-            exe = win32process.GetModuleFileNameEx(handle, 0)
-            return os.path.basename(exe).lower()
+            user32.BringWindowToTop(hwnd)
+            user32.SetForegroundWindow(hwnd)
         finally:
-            win32api.CloseHandle(handle)
-    except Exception:
+            if attached:
+                user32.AttachThreadInput(own_thread, foreground_thread, False)
+
+
+class _FakeWindow:
+    __slots__ = ("hwnd", "rect", "show", "cls", "title", "pid", "normal_rect")
+
+    def __init__(self, hwnd, rect, cls, title, pid, show):
+        self.hwnd = hwnd
+        self.rect = tuple(rect)
+        self.show = show
+        self.cls = cls
+        self.title = title
+        self.pid = pid
+        self.normal_rect = tuple(rect)
+
+
+class _FakeWindowBackend:
+    """In-memory windows for headless runs; ``calls`` counts operations by name.
+
+    ``work_areas`` is a list of (l, t, r, b) used when a window is maximized.
+    ``move_latency`` makes each move sleep, to stand in for a slow or hung window.
+    ``transactions`` records each set_window_rects call; hwnds in ``refusing``
+    make it fail the way a DeferWindowPos failure does.
+    """
+
+    def __init__(self, work_areas=((0, 0, 1920, 1040),), move_latency: float = 0.0):
+        self.work_areas = list(work_areas)
+        self.move_latency = move_latency
+        self.windows = {}
+        self.foreground = None
+        self.calls = {}
+        self.transactions = []  # hwnds of each set_window_rects call
+        self.refusing = set()  # hwnds that make a transaction fail
+        self.hung = set()
+        self.on_activate = None  # stands in for the foreground event the OS would send
+        self._destroyed_callbacks = []
+        self._visibility_callbacks = []
+
+    def add_window(self, hwnd, rect, cls="ApplicationFrameWindow", title="", pid=0, show=SW_SHOWNORMAL):
+        self.windows[hwnd] = _FakeWindow(hwnd, rect, cls, title, pid, show)
+        for on_shown, _ in self._visibility_callbacks:
+            on_shown(hwnd)
+        return self.windows[hwnd]
+
+    def destroy_window(self, hwnd):
+        self.windows.pop(hwnd, None)
+        if self.foreground == hwnd:
+            self.foreground = None
+        for callback in self._destroyed_callbacks:
+            callback(hwnd)
+
+    def is_window(self, hwnd: int) -> bool:
+        return hwnd in self.windows
+
+    def watch_destroyed(self, callback, known=None) -> bool:
+        # destroy_window reports right away, so there is nothing to sweep
+        self._destroyed_callbacks.append(callback)
+        return True
+
+    def watch_visibility(self, on_shown, on_hidden) -> bool:
+        self._visibility_callbacks.append((on_shown, on_hidden))
+        return True
+
+    def top_level_windows(self):
+        # Most recently added first, like a z-order
+        self._count("top_level_windows")
+        return [hwnd for hwnd in reversed(self.windows) if self.is_switchable(hwnd)]
+
+    def is_switchable(self, hwnd: int) -> bool:
+        win = self.windows.get(hwnd)
+        return win is not None and win.cls not in IGNORABLE_WINDOW_CLASSES
+
+    def activate(self, hwnd: int):
+        self._count("activate")
+        self.foreground = hwnd
+        if self.on_activate is not None:
+            self.on_activate(hwnd)
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def foreground_window(self):
+        self._count("foreground_window")
+        return self.foreground
+
+    def class_name(self, hwnd: int) -> str:
+        self._count("class_name")
+        return self.windows[hwnd].cls
+
+    def window_title(self, hwnd: int) -> str:
+        self._count("window_title")
+        return self.windows[hwnd].title
+
+    def window_rect(self, hwnd: int):
+        self._count("window_rect")
+        return self.windows[hwnd].rect
+
+    def show_state(self, hwnd: int) -> int:
+        self._count("show_state")
+        return self.windows[hwnd].show
+
+    def normal_rect(self, hwnd: int):
+        self._count("normal_rect")
+        win = self.windows[hwnd]
+        return win.normal_rect if win.show != SW_SHOWNORMAL else win.rect
+
+    def show_window(self, hwnd: int, cmd: int, asynchronous: bool = False):
+        self._count("show_window")
+        win = self.windows[hwnd]
+        if cmd == SW_MAXIMIZE and win.show != SW_SHOWMAXIMIZED:
+            if win.show == SW_SHOWNORMAL:
+                win.normal_rect = win.rect
+            win.rect = self._work_area_for(win.normal_rect)
+            win.show = SW_SHOWMAXIMIZED
+        elif cmd == SW_SHOWMINNOACTIVE and win.show != SW_SHOWMINIMIZED:
+            if win.show == SW_SHOWNORMAL:
+                win.normal_rect = win.rect
+            win.rect = (-32000, -32000, -31840, -31972)  # where Windows parks minimized windows
+            win.show = SW_SHOWMINIMIZED
+        elif cmd == SW_RESTORE and win.show != SW_SHOWNORMAL:
+            win.rect = win.normal_rect
+            win.show = SW_SHOWNORMAL
+
+    def set_window_rect(self, hwnd: int, rect, flags: int = 0):
+        self._count("set_window_rect")
+        if self.move_latency:
+            time.sleep(self.move_latency)
+        win = self.windows[hwnd]
+        win.rect = tuple(rect)
+        win.show = SW_SHOWNORMAL
+
+    def set_placement(self, hwnd: int, rect, cmd: int):
+        self._count("set_placement")
+        win = self.windows[hwnd]
+        win.normal_rect = tuple(rect)
+        if cmd == SW_SHOWMAXIMIZED:
+            win.rect = self._work_area_for(win.normal_rect)
+            win.show = SW_SHOWMAXIMIZED
+        elif cmd == SW_SHOWMINNOACTIVE:
+            win.rect = (-32000, -32000, -31840, -31972)
+            win.show = SW_SHOWMINIMIZED
+        else:
+            win.rect = win.normal_rect
+            win.show = SW_SHOWNORMAL
+
+    def set_window_rects(self, moves, flags: int = 0):
+        # All moves land together or, if one window refuses, none do
+        self._count("set_window_rects")
+        self.transactions.append([hwnd for hwnd, _ in moves])
+        for hwnd, _ in moves:
+            if hwnd in self.refusing or hwnd in self.hung:
+                return hwnd
+        if self.move_latency:
+            time.sleep(self.move_latency)
+        for hwnd, rect in moves:
+            win = self.windows[hwnd]
+            win.rect = tuple(rect)
+            win.show = SW_SHOWNORMAL
         return None
 
+    def is_hung(self, hwnd: int) -> bool:
+        return hwnd in self.hung
 
-def _is_browser_window():
-    proc = _get_foreground_process_name()
-    return proc in BROWSER_PROCESSES if proc else False
+    def _work_area_for(self, rect):
+        cx = (rect[0] + rect[2]) // 2
+        cy = (rect[1] + rect[3]) // 2
+        for area in self.work_areas:
+            if area[0] <= cx < area[2] and area[1] <= cy < area[3]:
+                return area
+        return self.work_areas[0]
+
+
+_windows = None
+
+
+def _get_window_backend():
+    global _windows
+    if _windows is None:
+        with _singletons_lock:
+            if _windows is None:
+                _windows = _Win32WindowBackend()
+    return _windows
+
+
+def _get_foreground_window():
+    return _get_window_backend().foreground_window()
+
+
+class _WindowOp:
+    __slots__ = ("rect", "maximized", "remember", "snapped", "queued")
+
+    def __init__(self, rect, maximized, remember=False, snapped=None, queued=0.0):
+        self.rect = rect
+        self.maximized = maximized
+        self.remember = remember  # record the pre-move geometry when applying
+        self.snapped = snapped
+        self.queued = queued
+
+
+class _WindowWorker:
+    """Applies window moves on a dedicated thread, latest target wins.
+
+    Each hwnd has at most one pending target: a restored rect and/or a
+    maximized flag. A submit for an hwnd that is still queued merges into the
+    queued target instead of adding a step, so a burst of cycle presses costs
+    one move. ``state`` reports the pending target before the on-screen one,
+    which lets the next cycle step build on what was already requested.
+    Moves use SWP_ASYNCWINDOWPOS/ShowWindowAsync so a hung window can't stall
+    the worker either; since an applied move may not be on screen yet,
+    ``state`` keeps reporting its target until the window is there or
+    APPLIED_TARGET_TTL_SEC has passed.
+
+    Action metrics only see the enqueue; with ``metrics`` the worker records
+    each move's queue-to-applied latency as WINDOW_MOVE_METRIC.
+
+    ``submit_batch`` queues a whole layout (latest wins) that is applied as
+    one DeferWindowPos transaction, so all windows move in a single repaint;
+    if any window refuses, the layout falls back to one move per window.
+    Only windows that are normal and stay normal go in the transaction; the
+    rest get SetWindowPlacement (restored rect plus show state at once), so
+    a maximized window isn't restored and re-maximized on screen and a
+    minimized one isn't activated.
+
+    ``submit_layout`` takes a function that builds such a layout and runs it
+    here, so the window queries a layout needs (state and monitor of every
+    candidate) stay off the keyboard hook thread. It returns a Future of the
+    moves built; a layout replaced before it ran has its Future cancelled.
+
+    ``submit_frame`` is how an ``animator`` moves a window; any other submit
+    for that window cancels its animation.
+
+    With ``remember`` the window's on-screen geometry is read here, right
+    before the move, and kept in the geometry memory; the caller's thread
+    (usually the keyboard hook) makes no window queries for it.
+    """
+
+    def __init__(self, backend=None, metrics=None, clock=time.perf_counter):
+        self._backend = backend
+        self._clock = clock
+        self._metrics = metrics
+        self._metric = metrics.slot(WINDOW_MOVE_METRIC) if metrics is not None else None
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # hwnd -> _WindowOp, oldest first
+        self._inflight = None  # (hwnd, _WindowOp) being applied right now
+        self._applied = {}  # hwnd -> (_WindowOp, expiry) of moves that may not be on screen yet
+        self._batch = None  # {hwnd: rect} layout waiting to be applied
+        self._batch_remember = False
+        self._batch_queued = 0.0
+        self._inflight_batch = None
+        self._layout = None  # (build, remember, Future) waiting to run
+        self._building = False
+        self._thread = None
+        self.animator = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.peak_depth = 0
+        self.transactions = 0
+        self.fallbacks = 0
+        self.placements = 0
+
+    def _windows(self):
+        return self._backend or _get_window_backend()
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="window-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, hwnd: int, rect=None, maximized=None, remember: bool = False):
+        if self.animator is not None:
+            self.animator.cancel(hwnd)
+        self._queue(hwnd, rect, maximized, remember, rect)
+
+    def submit_frame(self, hwnd: int, rect):
+        self._queue(hwnd, rect, False)
+
+    def remember(self, hwnd: int, snapped=None):
+        # Records the geometry before the next move of hwnd, e.g. an animation's first frame
+        self._queue(hwnd, None, None, True, snapped)
+
+    def _queue(self, hwnd: int, rect, maximized, remember=False, snapped=None):
+        with self._cond:
+            if self._batch is not None:
+                self._batch.pop(hwnd, None)  # this newer target wins over the queued layout
+            op = self._pending.get(hwnd)
+            if op is not None:
+                if rect is not None:
+                    op.rect = tuple(rect)
+                if maximized is not None:
+                    op.maximized = maximized
+                if remember:
+                    # The window hasn't moved yet, so what is on screen is still the original
+                    op.remember = True
+                    op.snapped = snapped
+                self.coalesced += 1
+            else:
+                self._pending[hwnd] = _WindowOp(tuple(rect) if rect is not None else None, maximized,
+                                                remember, snapped, self._clock())
+                self.submitted += 1
+                self.peak_depth = max(self.peak_depth, len(self._pending))
+                self._cond.notify()
+        if self._thread is None:
+            self.start()
+
+    def submit_batch(self, moves, remember: bool = False):
+        # moves: [(hwnd, rect)] or [(hwnd, rect, show)] with show one of
+        # SW_SHOWNORMAL/SW_SHOWMAXIMIZED/SW_SHOWMINIMIZED (rect is then the
+        # restored rect); replaces a layout that hasn't been applied yet
+        batch = {move[0]: (tuple(move[1]), move[2] if len(move) > 2 else SW_SHOWNORMAL) for move in moves}
+        if self.animator is not None:
+            for hwnd in batch:
+                self.animator.cancel(hwnd)
+        with self._cond:
+            for hwnd in batch:
+                self._pending.pop(hwnd, None)
+            if self._batch is not None:
+                self.coalesced += 1
+            else:
+                self.submitted += 1
+                self._batch_queued = self._clock()
+            self._batch = batch
+            self._batch_remember = remember
+            self._cond.notify()
+        if self._thread is None:
+            self.start()
+
+    def submit_layout(self, build, remember: bool = False) -> Future:
+        # build() -> moves for submit_batch, called on the worker; latest wins
+        future = Future()
+        with self._cond:
+            if self._layout is not None:
+                self.coalesced += 1
+                self._layout[2].cancel()
+            self._layout = (build, remember, future)
+            self._cond.notify()
+        if self._thread is None:
+            self.start()
+        return future
+
+    def state(self, hwnd: int):
+        # -> (restored rect, maximized) with any pending target applied on top
+        if self.animator is not None:
+            # Mid-animation the window is somewhere along the way; its target counts
+            target = self.animator.target(hwnd)
+            if target is not None:
+                return target, False
+        rect = maximized = None
+        with self._cond:
+            # The move being applied may not be on screen yet either
+            ops = [self._pending.get(hwnd), self._inflight and self._inflight[0] == hwnd and self._inflight[1]]
+            for batch in (self._batch, self._inflight_batch):
+                if batch and hwnd in batch:
+                    rect, show = batch[hwnd]
+                    ops.append(_WindowOp(rect, show == SW_SHOWMAXIMIZED))
+            for op in ops:
+                if op:
+                    rect = op.rect if rect is None else rect
+                    maximized = op.maximized if maximized is None else maximized
+            applied = self._applied.get(hwnd)
+        if rect is not None and maximized is not None:
+            return rect, maximized
+        windows = self._windows()
+        on_screen_max = windows.show_state(hwnd) == SW_SHOWMAXIMIZED
+        on_screen = windows.normal_rect(hwnd) if on_screen_max else windows.window_rect(hwnd)
+        if applied is not None:
+            op, expiry = applied
+            landed = ((op.maximized is None or op.maximized == on_screen_max)
+                      and (op.rect is None or on_screen_max or _rect_close(on_screen, op.rect)))
+            if landed or self._clock() >= expiry:
+                with self._cond:
+                    if self._applied.get(hwnd) is applied:
+                        del self._applied[hwnd]
+            else:
+                rect = op.rect if rect is None else rect
+                maximized = op.maximized if maximized is None else maximized
+        if rect is None:
+            rect = on_screen
+        if maximized is None:
+            maximized = on_screen_max
+        return rect, maximized
+
+    def depth(self) -> int:
+        return len(self._pending) + (self._batch is not None) + (self._layout is not None)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth(),
+            "peak_depth": self.peak_depth,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "applied": self.applied,
+            "transactions": self.transactions,
+            "fallbacks": self.fallbacks,
+            "placements": self.placements,
+        }
+
+    def wait_idle(self, timeout: float = 1.0) -> bool:
+        def _idle():
+            return (not self._pending and self._inflight is None and self._layout is None
+                    and not self._building and self._batch is None and self._inflight_batch is None)
+
+        with self._cond:
+            return self._cond.wait_for(_idle, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and self._batch is None and self._layout is None:
+                    self._cond.wait()
+                layout, self._layout = self._layout, None
+                self._building = layout is not None
+            if layout is not None:
+                # Built here, then queued like any other layout (and applied next)
+                build, remember, future = layout
+                moves = None
+                if future.set_running_or_notify_cancel():
+                    try:
+                        moves = build()
+                    except Exception as exc:
+                        _log(LOG_ERROR, "Windows", f"layout failed ({exc})")
+                        future.set_exception(exc)
+                        moves = None
+                    else:
+                        future.set_result(moves)
+                if moves:
+                    self.submit_batch(moves, remember)
+                with self._cond:
+                    self._building = False
+                    self._cond.notify_all()
+                continue
+            with self._cond:
+                # A layout goes first; single moves queued after it were taken out of it
+                batch, self._batch = self._batch, None
+                if batch is None:
+                    hwnd, op = self._pending.popitem(last=False)
+                    self._inflight = (hwnd, op)
+                    queued = op.queued
+                else:
+                    self._inflight_batch = batch
+                    remember = self._batch_remember
+                    queued = self._batch_queued
+            error = False
+            try:
+                if batch is None:
+                    self._apply(hwnd, op)
+                else:
+                    self._apply_batch(batch, remember)
+            except Exception as exc:
+                error = True
+                target = "layout" if batch is not None else f"move of {hwnd:#x}"
+                _log(LOG_ERROR, "Windows", f"{target} failed ({exc})")
+            now = self._clock()
+            if self._metric is not None:
+                self._metrics.record(self._metric, now - queued, error)
+            with self._cond:
+                for stale in [h for h, (_, exp) in self._applied.items() if exp <= now]:
+                    del self._applied[stale]
+                if not error:
+                    # The moves are async; state() reports them until they are on screen
+                    expiry = now + APPLIED_TARGET_TTL_SEC
+                    if batch is None:
+                        self._applied[hwnd] = (op, expiry)
+                    else:
+                        for moved, (rect, show) in batch.items():
+                            self._applied[moved] = (_WindowOp(rect, show == SW_SHOWMAXIMIZED), expiry)
+                self._inflight = None
+                self._inflight_batch = None
+                self.applied += 1
+                self._cond.notify_all()
+
+    def _remember(self, hwnd: int, show: int, snapped):
+        windows = self._windows()
+        rect = windows.window_rect(hwnd) if show == SW_SHOWNORMAL else windows.normal_rect(hwnd)
+        _remember_geometry(hwnd, rect, show == SW_SHOWMAXIMIZED, snapped)
+
+    def _apply(self, hwnd: int, op):
+        windows = self._windows()
+        show = windows.show_state(hwnd)
+        if op.remember:
+            self._remember(hwnd, show, op.snapped)
+        is_max = show == SW_SHOWMAXIMIZED
+        if is_max and (op.rect is not None or op.maximized is False):
+            windows.show_window(hwnd, SW_RESTORE, asynchronous=True)
+            is_max = False
+        if op.rect is not None:
+            windows.set_window_rect(hwnd, op.rect, SWP_ASYNCWINDOWPOS)
+        if op.maximized and not is_max:
+            windows.show_window(hwnd, SW_MAXIMIZE, asynchronous=True)
+
+    def _apply_batch(self, batch, remember: bool = False):
+        windows = self._windows()
+        moves = []
+        for hwnd, (rect, show) in batch.items():
+            current = windows.show_state(hwnd)
+            if remember:
+                self._remember(hwnd, current, rect)
+            if current == SW_SHOWNORMAL and show == SW_SHOWNORMAL:
+                moves.append((hwnd, rect))
+                continue
+            try:
+                windows.set_placement(hwnd, rect, PLACEMENT_SHOW[show])
+                self.placements += 1
+            except Exception as exc:
+                _log(LOG_ERROR, "Windows", f"placement of {hwnd:#x} failed ({exc})")
+        if moves:
+            self.transactions += 1
+            refused = windows.set_window_rects(moves)
+            if refused is not None:
+                # The transaction is all or nothing; fall back to one async move per window
+                self.fallbacks += 1
+                _log(LOG_DEBUG, "Windows", "layout transaction refused", hwnd=f"{refused:#x}")
+                for hwnd, rect in moves:
+                    try:
+                        windows.set_window_rect(hwnd, rect, SWP_ASYNCWINDOWPOS)
+                    except Exception as exc:
+                        _log(LOG_ERROR, "Windows", f"move of {hwnd:#x} failed ({exc})")
+
+
+_window_worker = None
+
+
+def _get_window_worker():
+    global _window_worker
+    if _window_worker is None:
+        with _singletons_lock:
+            if _window_worker is None:
+                worker = _WindowWorker(metrics=_metrics)
+                worker.start()
+                _window_worker = worker
+    return _window_worker
+
+
+def _get_window_state(hwnd: int):
+    return _get_window_worker().state(hwnd)
+
+
+# ---------------- ANIMATION ----------------
+ANIMATION_DURATION_SEC = 0.15
+ANIMATION_DEFAULT_HZ = 60  # when the display doesn't report its refresh rate
+ANIMATION_MIN_DISTANCE = 8  # px; smaller moves just jump
+ENUM_CURRENT_SETTINGS = -1
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002  # Windows 10 1803+
+TIMER_ALL_ACCESS = 0x1F0003
+INFINITE = 0xFFFFFFFF
+
+_animate_snaps = False
+
+
+def _display_refresh_hz() -> int:
+    # Primary display; 0/1 mean "hardware default" and tell us nothing
+    if win32api is not None:
+        try:
+            hz = win32api.EnumDisplaySettings(None, ENUM_CURRENT_SETTINGS).DisplayFrequency
+            if hz > 1:
+                return hz
+        except Exception:
+            pass
+    return ANIMATION_DEFAULT_HZ
+
+
+def _ease_out(t: float) -> float:
+    return 1.0 - (1.0 - t) ** 3
+
+
+class _HighResTimer:
+    """Sleeps on a high-resolution waitable timer.
+
+    Condition.wait (and time.sleep before Python 3.11) round up to the
+    ~15.6ms system tick, so a 60Hz frame would often wait two ticks.
+    """
+
+    def __init__(self):
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.CreateWaitableTimerExW.restype = wintypes.HANDLE
+        kernel32.CreateWaitableTimerExW.argtypes = (ctypes.c_void_p, wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD)
+        kernel32.SetWaitableTimer.argtypes = (wintypes.HANDLE, ctypes.POINTER(ctypes.c_longlong), wintypes.LONG,
+                                              ctypes.c_void_p, ctypes.c_void_p, wintypes.BOOL)
+        kernel32.WaitForSingleObject.argtypes = (wintypes.HANDLE, wintypes.DWORD)
+        handle = kernel32.CreateWaitableTimerExW(None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS)
+        if not handle:
+            raise ctypes.WinError(ctypes.get_last_error())
+        self._kernel32 = kernel32
+        self._handle = handle
+
+    def sleep(self, seconds: float):
+        due = ctypes.c_longlong(-max(1, int(seconds * 1e7)))  # relative, in 100ns units
+        if self._kernel32.SetWaitableTimer(self._handle, ctypes.byref(due), 0, None, None, False):
+            self._kernel32.WaitForSingleObject(self._handle, INFINITE)
+        else:
+            time.sleep(seconds)
+
+
+def _precise_sleep():
+    # -> sleep(seconds) for frame pacing
+    if sys.platform == "win32":
+        try:
+            return _HighResTimer().sleep
+        except OSError as exc:
+            _log(LOG_DEBUG, "Animation", f"no high-resolution timer ({exc})")
+    return time.sleep
+
+
+class _VirtualClock:
+    """Manually advanced stand-in for ``time.perf_counter``."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class _FramePacer:
+    """Frame deadlines on a fixed grid: ``start + frame * period``.
+
+    A late frame doesn't shift the grid; the next deadline is the first grid
+    slot after the frame was rendered, and every slot passed over is counted
+    as dropped. So a stall costs frames, never drift.
+    """
+
+    def __init__(self, hz: float, start: float):
+        self.period = 1.0 / hz
+        self.start = start
+        self.frame = 1  # frame 0 is what is already on screen
+
+    def deadline(self) -> float:
+        return self.start + self.frame * self.period
+
+    def advance(self, now: float) -> int:
+        # Called after rendering the current frame at ``now`` -> frames dropped
+        following = max(self.frame + 1, int((now - self.start) / self.period) + 1)
+        dropped = following - self.frame - 1
+        self.frame = following
+        return dropped
+
+
+class _Animation:
+    __slots__ = ("start_rect", "end_rect", "start", "duration", "frames", "dropped")
+
+    def __init__(self, start_rect, end_rect, start: float, duration: float):
+        self.start_rect = tuple(start_rect)
+        self.end_rect = tuple(end_rect)
+        self.start = start
+        self.duration = duration
+        self.frames = 0
+        self.dropped = 0
+
+    def done(self, now: float) -> bool:
+        return now - self.start >= self.duration
+
+    def rect_at(self, now: float):
+        t = _ease_out(min(1.0, max(0.0, (now - self.start) / self.duration)))
+        return tuple(int(round(a + (b - a) * t)) for a, b in zip(self.start_rect, self.end_rect))
+
+
+class _WindowAnimator:
+    """Slides snapped windows to their target, one frame per display refresh.
+
+    Frames go to the window worker (``submit_frame``), so a window that can't
+    keep up coalesces frames instead of queueing them. All animations share
+    one ``_FramePacer`` grid and one thread; the hook thread only registers
+    the target. A new snap mid-animation starts from wherever the window is
+    now; any other move of the window (maximize, tiling, workspaces) cancels
+    it. ``tick`` renders one frame and can be driven by a ``_VirtualClock``.
+    Between frames the thread sleeps on a high-resolution timer
+    (``_precise_sleep``), not a Condition timeout, which would round each
+    wait up to the system tick.
+    """
+
+    def __init__(self, sink, hz: float = ANIMATION_DEFAULT_HZ, duration: float = ANIMATION_DURATION_SEC,
+                 clock=time.perf_counter, sleep=None):
+        self._sink = sink
+        self.hz = hz
+        self.duration = duration
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._animations = {}  # hwnd -> _Animation
+        self._pacer = None
+        self._thread = None
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="animator", daemon=True)
+        self._thread.start()
+
+    def animate(self, hwnd: int, start_rect, end_rect) -> bool:
+        # -> False if the move is too small to be worth animating
+        with self._cond:
+            now = self._clock()
+            current = self._animations.get(hwnd)
+            if current is not None:
+                start_rect = current.rect_at(now)
+                self.cancelled += 1
+            if max(abs(a - b) for a, b in zip(start_rect, end_rect)) < ANIMATION_MIN_DISTANCE:
+                self._animations.pop(hwnd, None)
+                return False
+            self._animations[hwnd] = _Animation(start_rect, end_rect, now, self.duration)
+            self.started += 1
+            if self._pacer is None:
+                self._pacer = _FramePacer(self.hz, now)
+            self._cond.notify()
+        return True
+
+    def cancel(self, hwnd: int):
+        with self._cond:
+            if self._animations.pop(hwnd, None) is not None:
+                self.cancelled += 1
+
+    def cancel_all(self):
+        with self._cond:
+            self.cancelled += len(self._animations)
+            self._animations.clear()
+
+    def target(self, hwnd: int):
+        with self._cond:
+            animation = self._animations.get(hwnd)
+            return animation.end_rect if animation is not None else None
+
+    def hwnds(self):
+        with self._cond:
+            return list(self._animations)
+
+    def active(self) -> int:
+        with self._cond:
+            return len(self._animations)
+
+    def next_deadline(self):
+        with self._cond:
+            return self._pacer.deadline() if self._pacer is not None else None
+
+    def tick(self, now: float = None):
+        # Renders the current frame of every animation if its deadline has passed
+        with self._cond:
+            if self._pacer is None:
+                return
+            now = self._clock() if now is None else now
+            if now < self._pacer.deadline():
+                return
+            # Submitted under the lock so a cancelling move can't be overtaken by a frame
+            for hwnd, animation in list(self._animations.items()):
+                animation.frames += 1
+                if animation.done(now):
+                    del self._animations[hwnd]
+                    self.completed += 1
+                    self._sink.submit_frame(hwnd, animation.end_rect)
+                    _log(LOG_DEBUG, "Animation", "done", hwnd=f"{hwnd:#x}",
+                         frames=animation.frames, dropped=animation.dropped)
+                else:
+                    self._sink.submit_frame(hwnd, animation.rect_at(now))
+            self.frames += 1
+            if not self._animations:
+                self._pacer = None
+                return
+            dropped = self._pacer.advance(now)
+            if dropped:
+                self.dropped += dropped
+                for animation in self._animations.values():
+                    animation.dropped += dropped
+
+    def stats(self) -> dict:
+        return {
+            "hz": self.hz,
+            "active": self.active(),
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "frames": self.frames,
+            "dropped": self.dropped,
+        }
+
+    def _run(self):
+        sleep = self._sleep or _precise_sleep()
+        while True:
+            with self._cond:
+                while self._pacer is None:
+                    self._cond.wait()  # idle until animate(); no deadline to hit
+                remaining = self._pacer.deadline() - self._clock()
+            if remaining > 0:
+                sleep(remaining)
+                continue  # the pacer may have been reset meanwhile
+            try:
+                self.tick()
+            except Exception as exc:
+                _log(LOG_ERROR, "Animation", f"frame failed ({exc})")
+
+
+_window_animator = None
+
+
+def _get_window_animator():
+    global _window_animator
+    if _window_animator is None:
+        with _singletons_lock:
+            if _window_animator is None:
+                worker = _get_window_worker()
+                animator = _WindowAnimator(worker, _display_refresh_hz())
+                animator.start()
+                worker.animator = animator
+                _get_window_backend().watch_destroyed(animator.cancel, animator.hwnds)
+                _window_animator = animator
+    return _window_animator
+
+
+def _set_animate_snaps(enabled: bool):
+    global _animate_snaps
+    _animate_snaps = enabled
+    if not enabled and _window_animator is not None:
+        _window_animator.cancel_all()
+    _log(LOG_INFO, "Animation", "snap animation " + ("on" if enabled else "off"))
+
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+OBJID_WINDOW = 0
+WINEVENT_OUTOFCONTEXT = 0x0000
+WM_APP = 0x8000
+WM_DISPLAYCHANGE = 0x007E
+WM_SETTINGCHANGE = 0x001A
+WM_DPICHANGED = 0x02E0
+SPI_SETWORKAREA = 0x002F
+MDT_EFFECTIVE_DPI = 0
+DEFAULT_DPI = 96
+
+
+class _Win32MessageThread:
+    """Owns a thread with a Win32 message loop for hooks that need one.
+
+    SetWinEventHook callbacks are delivered through the message queue of the
+    thread that installed the hook, so hooks are installed via ``call`` which
+    runs the function on the loop thread.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._thread_id = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._keepalive = []  # ctypes callbacks must outlive their hooks
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def call(self, fn):
+        with self._lock:
+            self._pending.append(fn)
+        self.start()
+        ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_APP, 0, 0)
+
+    def keep(self, obj):
+        self._keepalive.append(obj)
+        return obj
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for fn in pending:
+            try:
+                fn()
+            except Exception as exc:
+                _log(LOG_ERROR, "Message thread", f"call failed ({exc})")
+
+    def _run(self):
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        msg = wintypes.MSG()
+        # Force creation of the thread's message queue before anyone posts to it
+        user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, 0)
+        self._ready.set()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            if msg.message == WM_APP and not msg.hWnd:
+                self._drain()
+                continue
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+
+_message_thread = _Win32MessageThread()
+
+
+def _install_win_event_hook(event: int, on_event) -> bool:
+    # SetWinEventHook on the message thread; on_event gets the raw WINEVENTPROC args
+    WINEVENTPROC = ctypes.WINFUNCTYPE(
+        None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+        wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD,
+    )
+    proc = _message_thread.keep(WINEVENTPROC(on_event))
+    installed = threading.Event()
+    result = {}
+
+    def _install():
+        result["hook"] = ctypes.windll.user32.SetWinEventHook(
+            event, event, None, proc, 0, 0, WINEVENT_OUTOFCONTEXT,
+        )
+        installed.set()
+
+    _message_thread.call(_install)
+    installed.wait(2.0)
+    return bool(result.get("hook"))
+
+
+class _Win32ForegroundSource:
+    """Foreground window and process lookups backed by user32/kernel32."""
+
+    def foreground_window(self):
+        return _get_foreground_window()
+
+    def window_pid(self, hwnd: int):
+        try:
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            return pid
+        except Exception:
+            return None
+
+    def process_name(self, pid: int):
+        try:
+            handle = win32api.OpenProcess(
+                win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ,
+                False,
+                pid,
+            )
+            try:
+                exe = win32process.GetModuleFileNameEx(handle, 0)
+                return os.path.basename(exe).lower()
+            finally:
+                win32api.CloseHandle(handle)
+        except Exception:
+            return None
+
+    def process_started(self, pid: int):
+        # Creation time; tells a reused pid apart from the process that had it before
+        try:
+            handle = win32api.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+            try:
+                return win32process.GetProcessTimes(handle)["CreationTime"]
+            finally:
+                win32api.CloseHandle(handle)
+        except Exception:
+            return None
+
+    def watch(self, callback) -> bool:
+        # Subscribe to EVENT_SYSTEM_FOREGROUND; the callback receives the new hwnd
+        def _on_event(hook, event, hwnd, id_object, id_child, thread_id, time_ms):
+            if hwnd:
+                callback(hwnd)
+
+        return _install_win_event_hook(EVENT_SYSTEM_FOREGROUND, _on_event)
+
+
+class _FakeForegroundSource:
+    """In-memory stand-in for _Win32ForegroundSource.
+
+    ``windows`` maps hwnd -> pid and ``processes`` maps pid -> exe name.
+    ``activate`` simulates a foreground change notification and ``restart``
+    hands a pid to a new process, the way Windows reuses pids.
+    """
+
+    def __init__(self, windows=None, processes=None):
+        self.windows = dict(windows or {})
+        self.processes = dict(processes or {})
+        self.started = {}  # pid -> start "time", bumped by restart
+        self.foreground = None
+        self.name_lookups = 0
+        self._callback = None
+
+    def foreground_window(self):
+        return self.foreground
+
+    def window_pid(self, hwnd: int):
+        return self.windows.get(hwnd)
+
+    def process_name(self, pid: int):
+        self.name_lookups += 1
+        return self.processes.get(pid)
+
+    def process_started(self, pid: int):
+        return self.started.get(pid, 0)
+
+    def restart(self, pid: int, name: str):
+        self.processes[pid] = name
+        self.started[pid] = self.started.get(pid, 0) + 1
+
+    def watch(self, callback) -> bool:
+        self._callback = callback
+        return True
+
+    def activate(self, hwnd: int):
+        self.foreground = hwnd
+        if self._callback:
+            self._callback(hwnd)
+
+
+class _ForegroundTracker:
+    """Keeps the foreground process name resolved ahead of keypresses.
+
+    Foreground changes resolve hwnd -> pid -> exe name through a bounded
+    LRU cache, so readers only touch ``foreground``. Entries are keyed on
+    (pid, process start time) because Windows reuses pids. ``foreground`` is
+    one (hwnd, pid, exe) tuple replaced as a whole, so a reader on another
+    thread never pairs one window's hwnd with another's exe.
+    """
+
+    def __init__(self, source, cache_size: int = FOREGROUND_CACHE_SIZE):
+        self._source = source
+        self._cache_size = max(1, cache_size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._watching = False
+        self._listeners = ()
+        self.foreground = (None, None, None)  # (hwnd, pid, exe)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def start(self):
+        self._watching = bool(self._source.watch(self._on_foreground))
+        self._on_foreground(self._source.foreground_window())
+        return self._watching
+
+    def add_listener(self, listener):
+        # listener(hwnd, exe) after every foreground change the tracker sees
+        self._listeners += (listener,)
+
+    def snapshot(self):
+        # -> (hwnd, pid, exe) of the foreground window, from one update
+        if not self._watching:
+            # No notifications available: resolve on demand (still cache-backed)
+            self._on_foreground(self._source.foreground_window())
+        return self.foreground
+
+    def current_process_name(self):
+        return self.snapshot()[2]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._cache),
+            "capacity": self._cache_size,
+        }
+
+    def process_name_for(self, hwnd: int):
+        pid = self._source.window_pid(hwnd)
+        return self._lookup(pid) if pid else None
+
+    def _on_foreground(self, hwnd):
+        if not hwnd:
+            self.foreground = (None, None, None)
+            _publish_state("foreground", (None, None))
+            return
+        pid = self._source.window_pid(hwnd)
+        name = self._lookup(pid) if pid else None
+        self.foreground = (hwnd, pid, name)
+        _publish_state("foreground", (hwnd, name))
+        for listener in self._listeners:
+            listener(hwnd, name)
+
+    def _lookup(self, pid: int):
+        key = (pid, self._source.process_started(pid))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+        name = self._source.process_name(pid)
+        with self._lock:
+            self.misses += 1
+            if name is None:
+                # Don't pin failed lookups (e.g. elevated processes may resolve later)
+                return None
+            self._cache[key] = name
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return name
+
+
+def _get_foreground_tracker():
+    global _foreground
+    if _foreground is None:
+        with _singletons_lock:
+            if _foreground is None:
+                tracker = _ForegroundTracker(_Win32ForegroundSource())
+                tracker.start()
+                _foreground = tracker
+    return _foreground
+
+
+def _get_foreground_process_name():
+    return _get_foreground_tracker().current_process_name()
 
 
 def _startup_shortcut_path():
@@ -166,19 +2090,24 @@ def _startup_shortcut_path():
     return os.path.join(startup_dir, STARTUP_LINK_NAME)
 
 
+def _create_startup_shortcut(path: str):
+    # Runs on the COM apartment
+    shell = win32com.client.Dispatch("WScript.Shell")
+    shortcut = shell.CreateShortcut(path)
+    shortcut.TargetPath = sys.executable
+    shortcut.Arguments = f'"{os.path.abspath(sys.argv[0])}"'
+    shortcut.WorkingDirectory = os.path.dirname(os.path.abspath(sys.argv[0]))
+    shortcut.IconLocation = sys.executable
+    shortcut.Save()
+
+
 def _add_to_startup():
     try:
         path = _startup_shortcut_path()
-        shell = win32com.client.Dispatch("WScript.Shell")
-        shortcut = shell.CreateShortcut(path)
-        shortcut.TargetPath = sys.executable
-        shortcut.Arguments = f'"{os.path.abspath(sys.argv[0])}"'
-        shortcut.WorkingDirectory = os.path.dirname(os.path.abspath(sys.argv[0]))
-        shortcut.IconLocation = sys.executable
-        shortcut.Save()
-        print(f"Startup: added shortcut at {path}")
+        _get_com_apartment().call(_create_startup_shortcut, path)
+        _log(LOG_INFO, "Startup", f"added shortcut at {path}")
     except Exception as exc:
-        print(f"Startup: failed to add ({exc})")
+        _log(LOG_ERROR, "Startup", f"failed to add ({exc})")
 
 
 def _remove_from_startup():
@@ -186,48 +2115,21 @@ def _remove_from_startup():
         path = _startup_shortcut_path()
         if os.path.exists(path):
             os.remove(path)
-            print(f"Startup: removed shortcut at {path}")
+            _log(LOG_INFO, "Startup", f"removed shortcut at {path}")
         else:
-            print("Startup: no shortcut to remove")
+            _log(LOG_INFO, "Startup", "no shortcut to remove")
     except Exception as exc:
-        print(f"Startup: failed to remove ({exc})")
-
-
-def _send_ctrl_combo(key: str):
-    # Temporarily release Shift so we don't send Ctrl+Shift+key
-    had_shift = keyboard.is_pressed("shift")
-    if had_shift:
-        keyboard.release("shift")
-    try:
-        keyboard.send(f"ctrl+{key}")
-    finally:
-        if had_shift:
-            keyboard.press("shift")
-
-
-def _send_ctrl_slash():
-    # Send Ctrl + '/' reliably, releasing Shift if held
-    had_shift = keyboard.is_pressed("shift")
-    if had_shift:
-        keyboard.release("shift")
-    try:
-        _key_event(VK_CONTROL)
-        _key_event(VK_OEM_2)
-        _key_event(VK_OEM_2, up=True)
-        _key_event(VK_CONTROL, up=True)
-    finally:
-        if had_shift:
-            keyboard.press("shift")
+        _log(LOG_ERROR, "Startup", f"failed to remove ({exc})")
 
 
 def _create_tray_image():
-    if Image is None:
+    if not _tray_available():
         return None
     icon_path = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "icon.ico")
     try:
         return Image.open(icon_path)
     except Exception as exc:
-        print(f"Tray icon: failed to load {icon_path} ({exc}); using fallback.")
+        _log(LOG_WARNING, "Tray icon", f"failed to load {icon_path} ({exc}); using fallback")
         if ImageDraw is None:
             return None
         img = Image.new("RGB", (64, 64), (43, 119, 232))
@@ -237,18 +2139,186 @@ def _create_tray_image():
 
 
 def _is_ignorable_window(hwnd: int) -> bool:
-    cls = win32gui.GetClassName(hwnd)
-    return cls in ("Progman", "WorkerW", "Shell_TrayWnd")
+    cls = _get_window_backend().class_name(hwnd)
+    return cls in IGNORABLE_WINDOW_CLASSES
+
+
+# ---------------- MONITOR TOPOLOGY ----------------
+class _Win32MonitorProvider:
+    """Enumerates monitors via user32 and reports display/DPI/work-area changes."""
+
+    def __init__(self):
+        self._hwnd = None
+
+    def monitors(self):
+        # -> list of (handle, monitor_rect, work_rect, dpi)
+        result = []
+        for handle, _, _ in win32api.EnumDisplayMonitors(None, None):
+            info = win32api.GetMonitorInfo(handle)
+            result.append((int(handle), tuple(info["Monitor"]), tuple(info["Work"]), self._dpi(handle)))
+        return result
+
+    def _dpi(self, handle):
+        try:
+            dpi_x = ctypes.c_uint()
+            dpi_y = ctypes.c_uint()
+            ctypes.windll.shcore.GetDpiForMonitor(
+                int(handle), MDT_EFFECTIVE_DPI, ctypes.byref(dpi_x), ctypes.byref(dpi_y)
+            )
+            return dpi_x.value or DEFAULT_DPI
+        except Exception:
+            return DEFAULT_DPI
+
+    def watch(self, callback) -> bool:
+        # Broadcasts like WM_DISPLAYCHANGE only reach top-level windows, so use a
+        # hidden one (not HWND_MESSAGE) owned by the message thread.
+        def _wndproc(hwnd, msg, wparam, lparam):
+            if msg in (WM_DISPLAYCHANGE, WM_DPICHANGED) or (
+                msg == WM_SETTINGCHANGE and wparam == SPI_SETWORKAREA
+            ):
+                callback()
+            return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
+
+        created = threading.Event()
+
+        def _create():
+            wc = win32gui.WNDCLASS()
+            wc.lpszClassName = f"{APP_NAME} Display Watcher"
+            wc.lpfnWndProc = _wndproc
+            wc.hInstance = win32api.GetModuleHandle(None)
+            win32gui.RegisterClass(wc)
+            self._hwnd = win32gui.CreateWindow(
+                wc.lpszClassName, wc.lpszClassName, 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None
+            )
+            created.set()
+
+        _message_thread.call(_create)
+        created.wait(2.0)
+        return bool(self._hwnd)
+
+
+class _FakeMonitorProvider:
+    """In-memory monitor layout; ``change()`` simulates a display/DPI change."""
+
+    def __init__(self, monitors):
+        self.layout = list(monitors)
+        self.enumerations = 0
+        self._callback = None
+
+    def monitors(self):
+        self.enumerations += 1
+        return list(self.layout)
+
+    def watch(self, callback) -> bool:
+        self._callback = callback
+        return True
+
+    def change(self, monitors):
+        self.layout = list(monitors)
+        if self._callback:
+            self._callback()
+
+
+class _MonitorInfo:
+    """One monitor plus its precomputed snap target tables."""
+
+    __slots__ = ("handle", "rect", "work", "dpi", "width_targets", "height_spans", "zones")
+
+    def __init__(self, handle, rect, work, dpi, zone_layouts=None):
+        self.handle = handle
+        self.rect = rect
+        self.work = work
+        self.dpi = dpi
+        self.width_targets = {
+            side: [_make_target_rect(work, w, side) for w in WINDOW_WIDTHS]
+            for side in ("left", "right")
+        }
+        self.height_spans = {
+            anchor: _make_height_spans(work, WINDOW_WIDTHS, anchor)
+            for anchor in ("top", "bottom")
+        }
+        self.zones = _make_zone_rects(work, _zone_layout_for(zone_layouts or ZONE_LAYOUTS, rect))
+
+
+class _MonitorTopology:
+    """Monitor index (and zone index) rebuilt only when the display configuration changes."""
+
+    def __init__(self, provider, zone_layouts=None):
+        self._provider = provider
+        self._zone_layouts = zone_layouts
+        self._monitors = ()
+        self.zones = _ZoneIndex(())
+        self.rebuilds = 0
+
+    def start(self):
+        self._provider.watch(self.rebuild)
+        self.rebuild()
+
+    def rebuild(self):
+        try:
+            monitors = tuple(_MonitorInfo(*m, self._zone_layouts) for m in self._provider.monitors())
+        except Exception as exc:
+            _log(LOG_ERROR, "Monitors", f"enumeration failed ({exc})")
+            return
+        if not monitors and self._monitors:
+            # Mid display change Windows can briefly report no monitors; keep the last good layout
+            _log(LOG_WARNING, "Monitors", "enumeration returned no monitors; keeping the previous layout")
+            return
+        monitors = tuple(sorted(monitors, key=lambda mon: (mon.rect[0], mon.rect[1])))
+        # Swapped atomically for readers on other threads
+        self.zones = _ZoneIndex(monitors)
+        self._monitors = monitors
+        self.rebuilds += 1
+
+    def monitors(self):
+        return self._monitors
+
+    def monitor_for_rect(self, rect):
+        if not self._monitors:
+            self.rebuild()
+        monitors = self._monitors
+        if not monitors:
+            return None
+        l, t, r, b = rect
+        cx = (l + r) // 2
+        cy = (t + b) // 2
+        for mon in monitors:
+            ml, mt, mr, mb = mon.rect
+            if ml <= cx < mr and mt <= cy < mb:
+                return mon
+
+        # Center is off-screen: nearest monitor, like MONITOR_DEFAULTTONEAREST
+        def _distance(mon):
+            ml, mt, mr, mb = mon.rect
+            dx = max(ml - cx, 0, cx - (mr - 1))
+            dy = max(mt - cy, 0, cy - (mb - 1))
+            return dx * dx + dy * dy
+
+        return min(monitors, key=_distance)
+
+
+def _get_monitor_topology():
+    global _topology
+    if _topology is None:
+        with _singletons_lock:
+            if _topology is None:
+                topology = _MonitorTopology(_Win32MonitorProvider(), _load_zone_layouts())
+                topology.start()
+                _topology = topology
+    return _topology
+
+
+def _get_monitor_for_window(hwnd: int):
+    return _get_monitor_topology().monitor_for_rect(_get_window_state(hwnd)[0])
 
 
 def _get_monitor_work_area_for_window(hwnd: int):
-    monitor = win32api.MonitorFromWindow(hwnd, win32con.MONITOR_DEFAULTTONEAREST)
-    info = win32api.GetMonitorInfo(monitor)
-    return info["Work"]  # (l,t,r,b)
+    monitor = _get_monitor_for_window(hwnd)
+    return monitor.work if monitor is not None else None  # (l,t,r,b)
 
 
 def _get_window_rect(hwnd: int):
-    return win32gui.GetWindowRect(hwnd)
+    return _get_window_state(hwnd)[0]
 
 
 def _rect_close(a, b, tol=WINDOW_POS_TOL_PX) -> bool:
@@ -277,38 +2347,34 @@ def _make_target_rect(work_area, width_ratio: float, side: str):
 
 
 def _set_window_rect(hwnd: int, rect):
-    l, t, r, b = rect
-    w = r - l
-    h = b - t
-    win32gui.SetWindowPos(
-        hwnd,
-        None,
-        l, t, w, h,
-        win32con.SWP_NOZORDER | win32con.SWP_NOACTIVATE
-    )
+    # Every snap goes through here, so this is where pre-snap geometry is kept.
+    # The move itself is queued; a maximized window is restored first.
+    worker = _get_window_worker()
+    if _animate_snaps:
+        current, maximized = _get_window_state(hwnd)
+        if not maximized:
+            worker.remember(hwnd, rect)
+            if _get_window_animator().animate(hwnd, current, rect):
+                return
+    worker.submit(hwnd, rect, maximized=False, remember=True)
 
 
 def _cycle_widths(side: str):
-    if not _debounced():
-        return
-
     hwnd = _get_foreground_window()
     if not hwnd or _is_ignorable_window(hwnd):
         return
 
-    work_area = _get_monitor_work_area_for_window(hwnd)
-    targets = [_make_target_rect(work_area, w, side) for w in WINDOW_WIDTHS]
+    current, is_maximized = _get_window_state(hwnd)
+    monitor = _get_monitor_topology().monitor_for_rect(current)
+    if monitor is None:
+        return
+    targets = monitor.width_targets[side]
 
     # IMPORTANT: if maximized, restart at 50.40% (targets[0])
-    placement = win32gui.GetWindowPlacement(hwnd)
-    is_maximized = (placement[1] == win32con.SW_SHOWMAXIMIZED)
     if is_maximized:
-        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
         _set_window_rect(hwnd, targets[0])
         return
 
-    current = _get_window_rect(hwnd)
-
     next_rect = targets[0]
     for i, tr in enumerate(targets):
         if _rect_close(current, tr):
@@ -341,11 +2407,10 @@ def _clamp_width_to_work_area(rect, work_area):
     return (l, t, r, b)
 
 
-def _make_vertical_target_rects(work_area, height_ratios, anchor: str, current_rect):
-    wl, wt, wr, wb = work_area
+def _make_height_spans(work_area, height_ratios, anchor: str):
+    _, wt, _, wb = work_area
     work_h = wb - wt
-    l, _, r, _ = _clamp_width_to_work_area(current_rect, work_area)
-    targets = []
+    spans = []
     for hr in height_ratios:
         h = int(round(work_h * hr))
         h = min(h, work_h)
@@ -357,28 +2422,26 @@ def _make_vertical_target_rects(work_area, height_ratios, anchor: str, current_r
             t = wb - h
         else:
             raise ValueError("anchor must be 'top' or 'bottom'")
-        targets.append((l, t, r, b))
-    return targets
+        spans.append((t, b))
+    return spans
 
 
-def _cycle_heights(anchor: str):
-    if not _debounced():
-        return
+def _make_vertical_target_rects(monitor, anchor: str, current_rect):
+    l, _, r, _ = _clamp_width_to_work_area(current_rect, monitor.work)
+    return [(l, t, r, b) for t, b in monitor.height_spans[anchor]]
+
 
+def _cycle_heights(anchor: str):
     hwnd = _get_foreground_window()
     if not hwnd or _is_ignorable_window(hwnd):
         return
 
-    placement = win32gui.GetWindowPlacement(hwnd)
-    is_maximized = (placement[1] == win32con.SW_SHOWMAXIMIZED)
-    if is_maximized:
-        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-        current = _get_window_rect(hwnd)
-    else:
-        current = _get_window_rect(hwnd)
-
-    work_area = _get_monitor_work_area_for_window(hwnd)
-    targets = _make_vertical_target_rects(work_area, WINDOW_WIDTHS, anchor, current)
+    # Maximized windows cycle from their restored rect
+    current, _ = _get_window_state(hwnd)
+    monitor = _get_monitor_topology().monitor_for_rect(current)
+    if monitor is None:
+        return
+    targets = _make_vertical_target_rects(monitor, anchor, current)
 
     next_rect = targets[0]
     for i, tr in enumerate(targets):
@@ -398,19 +2461,13 @@ def _cycle_top_heights():
 
 
 def _set_vertical_position(position: str):
-    if not _debounced():
-        return
-
     hwnd = _get_foreground_window()
     if not hwnd or _is_ignorable_window(hwnd):
         return
 
-    if position != "full":
-        placement = win32gui.GetWindowPlacement(hwnd)
-        if placement[1] == win32con.SW_SHOWMAXIMIZED:
-            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-
     work_area = _get_monitor_work_area_for_window(hwnd)
+    if work_area is None:
+        return
     wl, wt, wr, wb = work_area
     work_h = wb - wt
 
@@ -450,225 +2507,1339 @@ def _maximize_restore_active_window():
     if not hwnd or _is_ignorable_window(hwnd):
         return
 
-    placement = win32gui.GetWindowPlacement(hwnd)
-    show_cmd = placement[1]
-
-    # Toggle maximize/restore reliably via ShowWindow
-    if show_cmd == win32con.SW_SHOWMAXIMIZED:
-        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-    else:
-        win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
-
-
-def _key_event(vk: int, up: bool = False):
-    flags = KEYEVENTF_KEYUP if up else 0
-    ctypes.windll.user32.keybd_event(vk, 0, flags, 0)
-
-
-def _hard_refresh():
-    if _is_browser_window():
-        _key_event(VK_CONTROL)
-        _key_event(VK_F5)
-        _key_event(VK_F5, up=True)
-        _key_event(VK_CONTROL, up=True)
-    else:
-        _send_ctrl_slash()
+    # Toggle against the pending state so fast presses don't cancel out
+    _, is_maximized = _get_window_state(hwnd)
+    _get_window_worker().submit(hwnd, maximized=not is_maximized, remember=not is_maximized)
+
+
+# ---------------- GEOMETRY MEMORY ----------------
+GEOMETRY_MEMORY_SIZE = 256  # windows (and apps) whose pre-snap geometry is kept
+GEOMETRY_FILE_NAME = "geometry.bin"
+
+
+class _GeometryEntry:
+    __slots__ = ("rect", "maximized", "snapped")
+
+    def __init__(self, rect, maximized, snapped):
+        self.rect = rect
+        self.maximized = maximized
+        self.snapped = snapped  # where the last snap put the window
+
+
+class _GeometryMemory:
+    """Bounded LRU of each window's geometry from before it was snapped.
+
+    Entries are keyed by hwnd, with an "exe|class" fallback that also
+    survives restarts through ``save``/``load``. Repeated snaps of a window
+    that is still where the previous snap left it keep the original geometry,
+    so restore undoes a whole F13/F15 cycle rather than one step. Both tables
+    are capped at ``capacity``; destroyed windows are dropped via ``forget``.
+
+    The file is MAGIC followed by records of int32 l, t, r, b, a maximized
+    byte and a uint16 key length, each followed by the UTF-8 key.
+    """
+
+    RECORD = struct.Struct("<4iBH")
+    MAGIC = b"MMOG1"
+
+    def __init__(self, capacity: int = GEOMETRY_MEMORY_SIZE):
+        self.capacity = max(1, capacity)
+        self._by_hwnd = OrderedDict()
+        self._by_app = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def remember(self, hwnd: int, rect, maximized: bool, snapped=None, app_key=None):
+        with self._lock:
+            entry = self._by_hwnd.get(hwnd)
+            if entry is not None and entry.snapped is not None and _rect_close(rect, entry.snapped):
+                entry.snapped = snapped
+                self._by_hwnd.move_to_end(hwnd)
+                return
+            self._by_hwnd[hwnd] = _GeometryEntry(tuple(rect), maximized, snapped)
+            self._by_hwnd.move_to_end(hwnd)
+            if app_key:
+                self._by_app[app_key] = (tuple(rect), maximized)
+                self._by_app.move_to_end(app_key)
+            for table in (self._by_hwnd, self._by_app):
+                while len(table) > self.capacity:
+                    table.popitem(last=False)
+                    self.evictions += 1
+
+    def recall(self, hwnd: int, app_key=None):
+        # -> (rect, maximized) or None; the hwnd entry is consumed
+        with self._lock:
+            entry = self._by_hwnd.pop(hwnd, None)
+            if entry is not None:
+                return entry.rect, entry.maximized
+            return self._by_app.get(app_key) if app_key else None
+
+    def forget(self, hwnd: int):
+        with self._lock:
+            self._by_hwnd.pop(hwnd, None)
+
+    def hwnds(self):
+        with self._lock:
+            return list(self._by_hwnd)
+
+    def stats(self) -> dict:
+        return {
+            "windows": len(self._by_hwnd),
+            "apps": len(self._by_app),
+            "evictions": self.evictions,
+            "capacity": self.capacity,
+        }
+
+    def save(self, path: str):
+        with self._lock:
+            apps = list(self._by_app.items())
+        out = bytearray(self.MAGIC)
+        for key, (rect, maximized) in apps:
+            raw = key.encode("utf-8")[:0xFFFF]
+            out += self.RECORD.pack(*rect, 1 if maximized else 0, len(raw)) + raw
+        with open(path, "wb") as fh:
+            fh.write(out)
+
+    def load(self, path: str):
+        with open(path, "rb") as fh:
+            blob = fh.read()
+        if not blob.startswith(self.MAGIC):
+            raise ValueError(f"{path} is not a geometry file")
+        pos = len(self.MAGIC)
+        size = self.RECORD.size
+        with self._lock:
+            while pos + size <= len(blob):
+                l, t, r, b, maximized, key_len = self.RECORD.unpack_from(blob, pos)
+                pos += size
+                key = blob[pos:pos + key_len].decode("utf-8", "replace")
+                pos += key_len
+                self._by_app[key] = ((l, t, r, b), bool(maximized))
+            while len(self._by_app) > self.capacity:
+                self._by_app.popitem(last=False)
+
+
+_geometry = None
+
+
+def _get_geometry_memory():
+    global _geometry
+    if _geometry is None:
+        with _singletons_lock:
+            if _geometry is None:
+                memory = _GeometryMemory()
+                path = _app_data_path(GEOMETRY_FILE_NAME)
+                if os.path.exists(path):
+                    try:
+                        memory.load(path)
+                    except Exception as exc:
+                        _log(LOG_ERROR, "Geometry", f"failed to load {path} ({exc})")
+                _get_window_backend().watch_destroyed(memory.forget, memory.hwnds)
+                _geometry = memory
+    return _geometry
+
+
+def _save_geometry_memory():
+    if _geometry is None:
+        return
+    try:
+        _geometry.save(_app_data_path(GEOMETRY_FILE_NAME))
+    except Exception as exc:
+        _log(LOG_ERROR, "Geometry", f"failed to save ({exc})")
 
 
-def _refresh_tap():
-    if _is_browser_window():
-        print("Refresh: browser (Ctrl+R)")
-        keyboard.send("ctrl+r")
-    else:
-        print("Refresh: non-browser (Ctrl+/)")
-        _send_ctrl_slash()
+def _window_app_key(hwnd: int):
+    exe = _get_foreground_tracker().process_name_for(hwnd)
+    if not exe:
+        return None
+    return f"{exe}|{_get_window_backend().class_name(hwnd)}"
 
 
-def _refresh_hold():
-    if _is_browser_window():
-        print("Hard refresh: browser (Ctrl+F5)")
-        _hard_refresh()
-    else:
-        print("Refresh (hold): non-browser (Ctrl+/)")
-        _send_ctrl_slash()
+def _remember_geometry(hwnd: int, rect, maximized: bool, snapped=None):
+    # Called by the window worker with the on-screen geometry just before a move
+    _get_geometry_memory().remember(hwnd, rect, maximized, snapped, _window_app_key(hwnd))
 
 
-def _print_screen():
-    # Release modifiers to avoid Win/Alt/Shift altering the snapshot behavior
-    released = []
-    for mod in ("windows", "alt", "ctrl", "shift"):
-        if keyboard.is_pressed(mod):
-            keyboard.release(mod)
-            released.append(mod)
-    try:
-        # Simple, reliable: ask keyboard to send Print Screen; fallback to direct key events
-        keyboard.send("print screen")
-    except Exception:
-        _key_event(VK_SNAPSHOT)
-        _key_event(VK_SNAPSHOT, up=True)
-    finally:
-        for mod in released:
-            keyboard.press(mod)
-
-
-def _send_tab_combo(shift: bool):
-    if _is_browser_window():
-        # Browser: Ctrl+Tab / Ctrl+Shift+Tab
-        mods = [VK_CONTROL]
-        if shift:
-            mods.append(VK_SHIFT)
-        for key in mods:
-            _key_event(key)
-        _key_event(VK_TAB)
-        _key_event(VK_TAB, up=True)
-        for key in reversed(mods):
-            _key_event(key, up=True)
-    else:
-        # Non-browser: Ctrl+PgUp / Ctrl+PgDn via keyboard for reliability
-        keyboard.send("ctrl+page up" if shift else "ctrl+page down")
+def _restore_geometry():
+    hwnd = _get_foreground_window()
+    if not hwnd or _is_ignorable_window(hwnd):
+        return
+    saved = _get_geometry_memory().recall(hwnd, _window_app_key(hwnd))
+    if saved is None:
+        return
+    rect, maximized = saved
+    _get_window_worker().submit(hwnd, rect, maximized)
+
+
+# ---------------- WINDOW INDEX ----------------
+class _WindowIndex:
+    """Switchable top-level windows in activation order, overall and per exe.
+
+    Seeded by one enumeration, then kept current from window events: shown
+    windows are added, hidden ones removed, and a foreground change
+    moves the window to the most-recent end of both its app's list and the
+    global list. Every list is an OrderedDict, so updates are O(1) and the
+    actions' queries only look at an end of one list, however many windows
+    are open. Repeatedly focusing an app's least recent window therefore
+    cycles through all of that app's windows. Destroyed windows are dropped
+    by the backend's IsWindow sweep; until then lookups skip them.
+    """
+
+    def __init__(self, backend, tracker):
+        self._backend = backend
+        self._tracker = tracker
+        self._lock = threading.Lock()
+        self._order = OrderedDict()  # hwnd -> exe, least recently active first
+        self._by_exe = {}  # exe -> OrderedDict(hwnd -> None), same order
+        self.events = 0
+
+    def start(self):
+        # Enumeration is topmost first; insert bottom-up so the top window is most recent
+        for hwnd in reversed(self._backend.top_level_windows()):
+            self._touch(hwnd, self._tracker.process_name_for(hwnd))
+        self._backend.watch_visibility(self._on_shown, self.remove)
+        self._backend.watch_destroyed(self.remove, self.windows)
+        self._tracker.add_listener(self._on_foreground)
+        hwnd, _, exe = self._tracker.foreground
+        if hwnd:
+            self._on_foreground(hwnd, exe)
+
+    def __len__(self):
+        return len(self._order)
+
+    def stats(self) -> dict:
+        return {"windows": len(self._order), "apps": len(self._by_exe), "events": self.events}
+
+    def windows(self):
+        # -> hwnds, most recently active first
+        with self._lock:
+            return list(reversed(self._order))
+
+    def most_recent(self, exe: str, exclude=None):
+        with self._lock:
+            for hwnd in reversed(self._by_exe.get(exe.lower(), ())):
+                if hwnd != exclude and self._backend.is_window(hwnd):
+                    return hwnd
+        return None
 
+    def least_recent(self, exe: str, exclude=None):
+        with self._lock:
+            for hwnd in self._by_exe.get(exe.lower(), ()):
+                if hwnd != exclude and self._backend.is_window(hwnd):
+                    return hwnd
+        return None
 
-def _prev_tab():
-    _send_tab_combo(shift=True)
+    def previous(self, exclude=None):
+        with self._lock:
+            for hwnd in reversed(self._order):
+                if hwnd != exclude and self._backend.is_window(hwnd):
+                    return hwnd
+        return None
 
+    def remove(self, hwnd: int):
+        with self._lock:
+            self.events += 1
+            if hwnd not in self._order:
+                return
+            exe = self._order.pop(hwnd)
+            windows = self._by_exe[exe]
+            del windows[hwnd]
+            if not windows:
+                del self._by_exe[exe]
+
+    def _on_shown(self, hwnd: int):
+        if hwnd in self._order or not self._backend.is_switchable(hwnd):
+            self.events += 1
+            return
+        self._touch(hwnd, self._tracker.process_name_for(hwnd))
 
-def _next_tab():
-    _send_tab_combo(shift=False)
+    def _on_foreground(self, hwnd: int, exe):
+        if hwnd not in self._order and not self._backend.is_switchable(hwnd):
+            self.events += 1
+            return
+        self._touch(hwnd, exe)
+
+    def _touch(self, hwnd: int, exe):
+        exe = exe.lower() if exe else None
+        with self._lock:
+            self.events += 1
+            previous = self._order.get(hwnd, exe)
+            if previous != exe:
+                # exe resolved late (e.g. an elevated window); move it to the right app
+                windows = self._by_exe[previous]
+                del windows[hwnd]
+                if not windows:
+                    del self._by_exe[previous]
+            self._order[hwnd] = exe
+            self._order.move_to_end(hwnd)
+            windows = self._by_exe.get(exe)
+            if windows is None:
+                windows = self._by_exe[exe] = OrderedDict()
+            windows[hwnd] = None
+            windows.move_to_end(hwnd)
+
+
+_window_index = None
+
+
+def _get_window_index():
+    global _window_index
+    if _window_index is None:
+        with _singletons_lock:
+            if _window_index is None:
+                index = _WindowIndex(_get_window_backend(), _get_foreground_tracker())
+                index.start()
+                _window_index = index
+    return _window_index
+
+
+def _focus_window(hwnd) -> bool:
+    if not hwnd:
+        return False
+    _get_window_backend().activate(hwnd)
+    return True
 
 
-def _browser_nav(back: bool):
-    # Alt+Left / Alt+Right for browser navigation
-    _key_event(VK_MENU)
-    _key_event(VK_LEFT if back else VK_RIGHT)
-    _key_event(VK_LEFT if back else VK_RIGHT, up=True)
-    _key_event(VK_MENU, up=True)
+def _next_app_window():
+    # Least recent window of the foreground app; repeated presses cycle through them all
+    hwnd, _, exe = _get_foreground_tracker().snapshot()
+    if hwnd and exe:
+        _focus_window(_get_window_index().least_recent(exe, exclude=hwnd))
 
 
-def _switch_virtual_desktop(back: bool):
-    # Send Win+Ctrl+Left/Right; temporarily release Shift so it doesn't move windows
-    had_shift = keyboard.is_pressed("shift")
-    if had_shift:
-        keyboard.release("shift")
-    try:
-        _key_event(VK_LWIN)
-        _key_event(VK_CONTROL)
-        _key_event(VK_LEFT if back else VK_RIGHT)
-        _key_event(VK_LEFT if back else VK_RIGHT, up=True)
-        _key_event(VK_CONTROL, up=True)
-        _key_event(VK_LWIN, up=True)
-    finally:
-        if had_shift:
-            keyboard.press("shift")
+def _last_window():
+    # Back to the previously active window of any app (Alt+Tab without the switcher)
+    hwnd, _, _ = _get_foreground_tracker().snapshot()
+    _focus_window(_get_window_index().previous(exclude=hwnd))
 
 
-def _tab_press(name: str, shift: bool):
-    if name in _tab_state:
-        return
-    stop_evt = threading.Event()
-    _tab_state[name] = stop_evt
-    _send_tab_combo(shift)
+def _focus_app(exe: str) -> bool:
+    return _focus_window(_get_window_index().most_recent(exe))
 
-    def _runner():
-        delay = TAB_REPEAT_INITIAL_SEC
-        while not stop_evt.wait(delay):
-            _send_tab_combo(shift)
-            delay = TAB_REPEAT_SEC
 
-    threading.Thread(target=_runner, daemon=True).start()
+# ---------------- ZONES ----------------
+ZONES_FILE_NAME = "zones.json"
+ZONE_INDEX_MIN_CELL_PX = 64  # spatial index buckets are about one zone in size, never smaller
 
 
-def _tab_release(name: str):
-    stop_evt = _tab_state.pop(name, None)
-    if stop_evt:
-        stop_evt.set()
+def _grid_zones(cols: int, rows: int):
+    # Evenly split grid as fractional (l, t, r, b) rects of the work area, reading order
+    return [
+        (c / cols, r / rows, (c + 1) / cols, (r + 1) / rows)
+        for r in range(rows)
+        for c in range(cols)
+    ]
 
 
-def _win_d_chord():
-    # Send Win+D with aggressive key-up to avoid Win sticking (and Win+P)
-    _key_event(VK_D, up=True)
-    _key_event(VK_LWIN, up=True)
-    time.sleep(0.005)
-    _key_event(VK_LWIN)
-    time.sleep(0.005)
-    _key_event(VK_D)
-    time.sleep(0.015)  # let Windows register the chord
-    _key_event(VK_D, up=True)
-    _key_event(VK_LWIN, up=True)
-    _key_event(VK_LWIN, up=True)  # extra release guard
+# Zone layouts as fractions of a monitor's work area. Keys are "default" or a
+# monitor resolution like "2560x1440"; zones.json in the app data folder uses
+# the same shape and overrides these.
+ZONE_LAYOUTS = {
+    "default": _grid_zones(3, 2),
+}
 
 
-def _get_shell_app():
-    global _shell_app
-    if _shell_app is not None:
-        return _shell_app
+def _load_zone_layouts():
+    layouts = dict(ZONE_LAYOUTS)
+    path = _app_data_path(ZONES_FILE_NAME)
+    if not os.path.exists(path):
+        return layouts
     try:
-        _shell_app = win32com.client.Dispatch("Shell.Application")
-    except Exception:
-        _shell_app = None
-    return _shell_app
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        for key, zones in data.items():
+            layouts[key] = [tuple(float(v) for v in zone) for zone in zones]
+    except Exception as exc:
+        _log(LOG_ERROR, "Zones", f"failed to load {path} ({exc})")
+    return layouts
 
 
-def _toggle_desktop():
-    # Prefer Shell.ToggleDesktop for proper toggle; fall back to a Win+D chord
-    shell = _get_shell_app()
-    if shell:
-        try:
-            pythoncom.CoInitialize()
-        except Exception:
-            pass
-        try:
-            shell.ToggleDesktop()
+def _make_zone_rects(work_area, fractions):
+    wl, wt, wr, wb = work_area
+    work_w = wr - wl
+    work_h = wb - wt
+    return [
+        (
+            wl + int(round(work_w * fl)),
+            wt + int(round(work_h * ft)),
+            wl + int(round(work_w * fr)),
+            wt + int(round(work_h * fb)),
+        )
+        for fl, ft, fr, fb in fractions
+    ]
+
+
+def _zone_layout_for(layouts, monitor_rect):
+    l, t, r, b = monitor_rect
+    return layouts.get(f"{r - l}x{b - t}") or layouts.get("default") or []
+
+
+class _ZoneIndex:
+    """Uniform-grid spatial index over every zone on every monitor.
+
+    Zones are bucketed by the cell holding their center, with cells sized to
+    the average zone so a bucket holds about one zone. ``nearest`` walks
+    rings of cells outward from the query point and stops once no unvisited
+    ring can hold anything closer, so a lookup touches a handful of buckets
+    regardless of how many zones exist. ``rects`` is in cycle order: monitors
+    left to right, zones in layout order within each monitor.
+    """
+
+    def __init__(self, monitors, cell: int = 0):
+        zones = [rect for mon in monitors for rect in mon.zones]
+        if not cell and zones:
+            mean_area = sum((r - l) * (b - t) for l, t, r, b in zones) / len(zones)
+            cell = int(mean_area ** 0.5)
+        self.cell = cell = max(cell, ZONE_INDEX_MIN_CELL_PX)
+        self.rects = []
+        self.monitor_of = []  # zone id -> index into monitors
+        self._centers = []
+        self._buckets = {}
+        for mon_idx, mon in enumerate(monitors):
+            for rect in mon.zones:
+                zone_id = len(self.rects)
+                cx = (rect[0] + rect[2]) // 2
+                cy = (rect[1] + rect[3]) // 2
+                self.rects.append(rect)
+                self.monitor_of.append(mon_idx)
+                self._centers.append((cx, cy))
+                self._buckets.setdefault((cx // cell, cy // cell), []).append(zone_id)
+        if self._buckets:
+            cols = [c for c, _ in self._buckets]
+            rows = [r for _, r in self._buckets]
+            self._extent = (min(cols), min(rows), max(cols), max(rows))
+
+    def __len__(self):
+        return len(self.rects)
+
+    def nearest(self, x: int, y: int, monitor=None):
+        """Zone id whose center is closest to (x, y), optionally on one monitor only."""
+        if not self._buckets:
+            return None
+        cell = self.cell
+        qc, qr = x // cell, y // cell
+        min_c, min_r, max_c, max_r = self._extent
+        max_ring = max(qc - min_c, max_c - qc, qr - min_r, max_r - qr, 0)
+        best = None
+        best_d2 = 0
+        for ring in range(max_ring + 1):
+            for key in self._ring_cells(qc, qr, ring):
+                for zone_id in self._buckets.get(key, ()):
+                    if monitor is not None and self.monitor_of[zone_id] != monitor:
+                        continue
+                    zx, zy = self._centers[zone_id]
+                    d2 = (zx - x) ** 2 + (zy - y) ** 2
+                    # Equidistant zones: the lowest id (cycle order) wins, whatever the walk order
+                    if best is None or d2 < best_d2 or (d2 == best_d2 and zone_id < best):
+                        best = zone_id
+                        best_d2 = d2
+            # Anything in ring+1 or beyond is at least ring * cell away (and could tie at exactly that)
+            if best is not None and best_d2 < (ring * cell) ** 2:
+                break
+        return best
+
+    @staticmethod
+    def _ring_cells(qc: int, qr: int, ring: int):
+        if ring == 0:
+            yield (qc, qr)
             return
-        except Exception:
-            pass
-        finally:
-            try:
-                pythoncom.CoUninitialize()
-            except Exception:
-                pass
-
-    try:
-        _win_d_chord()
-    except Exception:
-        pass  # keep hotkey resilient
+        for c in range(qc - ring, qc + ring + 1):
+            yield (c, qr - ring)
+            yield (c, qr + ring)
+        for r in range(qr - ring + 1, qr + ring):
+            yield (qc - ring, r)
+            yield (qc + ring, r)
 
-
-def _toggle_desktop_press(name: str):
-    # Fire only once per physical press (ignore OS key auto-repeat)
-    if name in _toggle_state:
-        return
-    _toggle_state.add(name)
-    _toggle_desktop()
+    def zone_for_rect(self, rect, monitor=None):
+        return self.nearest((rect[0] + rect[2]) // 2, (rect[1] + rect[3]) // 2, monitor)
 
 
-def _toggle_desktop_release(name: str):
-    _toggle_state.discard(name)
+def _zone_target_window():
+    hwnd = _get_foreground_window()
+    if not hwnd or _is_ignorable_window(hwnd):
+        return None
+    return hwnd
 
 
-def _maximize_press(name: str):
-    # Fire once per physical press to avoid rapid toggle on key repeat
-    if name in _maximize_state:
+def _snap_to_zone():
+    hwnd = _zone_target_window()
+    if not hwnd:
         return
-    _maximize_state.add(name)
-    _maximize_restore_active_window()
+    index = _get_monitor_topology().zones
+    zone_id = index.zone_for_rect(_get_window_rect(hwnd))
+    if zone_id is not None:
+        _set_window_rect(hwnd, index.rects[zone_id])
 
 
-def _maximize_release(name: str):
-    _maximize_state.discard(name)
+def _cycle_zone(step: int):
+    # Already in a zone -> move to the next/previous one (crossing monitors);
+    # otherwise snap to the nearest zone first.
+    hwnd = _zone_target_window()
+    if not hwnd:
+        return
+    index = _get_monitor_topology().zones
+    if not len(index):
+        return
+    current = _get_window_rect(hwnd)
+    zone_id = index.zone_for_rect(current)
+    if _rect_close(current, index.rects[zone_id]):
+        zone_id = (zone_id + step) % len(index)
+    _set_window_rect(hwnd, index.rects[zone_id])
+
+
+def _next_zone():
+    _cycle_zone(1)
+
+
+def _prev_zone():
+    _cycle_zone(-1)
+
+
+def _move_to_next_monitor():
+    # Keep the window's relative position, then snap it to the nearest zone there
+    hwnd = _zone_target_window()
+    if not hwnd:
+        return
+    topology = _get_monitor_topology()
+    monitors = topology.monitors()
+    if len(monitors) < 2:
+        return
+    current = _get_window_rect(hwnd)
+    source = topology.monitor_for_rect(current)
+    if source not in monitors:
+        return  # the layout changed under us
+    target_idx = (monitors.index(source) + 1) % len(monitors)
+    target = monitors[target_idx]
+    sl, st, sr, sb = source.work
+    tl, tt, tr, tb = target.work
+    cx = (current[0] + current[2]) / 2
+    cy = (current[1] + current[3]) / 2
+    x = tl + int((cx - sl) * (tr - tl) / max(sr - sl, 1))
+    y = tt + int((cy - st) * (tb - tt) / max(sb - st, 1))
+    zone_id = topology.zones.nearest(x, y, monitor=target_idx)
+    if zone_id is not None:
+        _set_window_rect(hwnd, topology.zones.rects[zone_id])
+        return
+    # No zones on that monitor: just recenter the window there
+    w = current[2] - current[0]
+    h = current[3] - current[1]
+    rect = (x - w // 2, y - h // 2, x - w // 2 + w, y - h // 2 + h)
+    _set_window_rect(hwnd, _clamp_width_to_work_area(rect, target.work))
+
+
+# ---------------- TILING ----------------
+def _split_span(start: int, end: int, count: int):
+    # count adjacent integer spans that exactly cover [start, end)
+    size = end - start
+    return [(start + size * i // count, start + size * (i + 1) // count) for i in range(count)]
+
+
+def _tile_columns(work, count: int, main_ratio: float):
+    l, t, r, b = work
+    return [(cl, t, cr, b) for cl, cr in _split_span(l, r, count)]
+
+
+def _tile_main_stack(work, count: int, main_ratio: float):
+    l, t, r, b = work
+    if count == 1:
+        return [tuple(work)]
+    split = l + int(round((r - l) * main_ratio))
+    return [(l, t, split, b)] + [(split, st, r, sb) for st, sb in _split_span(t, b, count - 1)]
+
+
+def _tile_grid(work, count: int, main_ratio: float):
+    l, t, r, b = work
+    cols = 1
+    while cols * cols < count:
+        cols += 1
+    rows = -(-count // cols)
+    rects = []
+    for row, (rt, rb) in enumerate(_split_span(t, b, rows)):
+        # A short last row widens its windows to fill the row
+        in_row = min(cols, count - row * cols)
+        rects += [(cl, rt, cr, rb) for cl, cr in _split_span(l, r, in_row)]
+    return rects
+
+
+# name -> fn(work area, window count, main ratio) -> rects, foreground window first
+TILE_LAYOUTS = {"columns": _tile_columns, "main_stack": _tile_main_stack, "grid": _tile_grid}
+
+
+def _tile_targets(hwnd: int):
+    # Foreground window first, then the other visible windows on its monitor, most recent first.
+    # Two queries per candidate: a maximized window's own rect is on its monitor too.
+    windows = _get_window_backend()
+    topology = _get_monitor_topology()
+    monitor = topology.monitor_for_rect(_get_window_state(hwnd)[0])
+    tiles = [hwnd]
+    for other in _get_window_index().windows():
+        if other == hwnd or windows.show_state(other) == SW_SHOWMINIMIZED:
+            continue
+        if topology.monitor_for_rect(windows.window_rect(other)) is monitor:
+            tiles.append(other)
+    return monitor, tiles
+
+
+def _tile(layout: str):
+    hwnd = _get_foreground_window()
+    if not hwnd or _is_ignorable_window(hwnd):
+        return
+    _get_window_worker().submit_layout(lambda: _tile_moves(hwnd, layout), remember=True)
+
+
+def _tile_moves(hwnd: int, layout: str):
+    # Runs on the window worker -> [(hwnd, rect)] or None
+    monitor, tiles = _tile_targets(hwnd)
+    if monitor is None:
+        return None
+    ratio = WINDOW_WIDTHS[0]
+    if layout == "main_stack":
+        # Pressing again cycles the main window through WINDOW_WIDTHS, like F13/F15
+        current = _get_window_state(hwnd)[0]
+        for i, width in enumerate(WINDOW_WIDTHS):
+            if _rect_close(current, _tile_main_stack(monitor.work, len(tiles), width)[0]):
+                ratio = WINDOW_WIDTHS[(i + 1) % len(WINDOW_WIDTHS)]
+                break
+    return list(zip(tiles, TILE_LAYOUTS[layout](monitor.work, len(tiles), ratio)))
+
+
+def _tile_columns_action():
+    _tile("columns")
+
+
+def _tile_main_stack_action():
+    _tile("main_stack")
+
+
+def _tile_grid_action():
+    _tile("grid")
+
+
+# ---------------- WORKSPACES ----------------
+WORKSPACES_FILE_NAME = "workspaces.bin"
+WORKSPACE_DEFAULT_NAME = "default"
+
+
+def _title_tokens(title: str):
+    return frozenset(re.findall(r"\w+", title.lower()))
+
+
+def _title_similarity(a, b) -> float:
+    # Jaccard over word sets: "Inbox (3) - Mail" still matches "Inbox (12) - Mail"
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _WorkspaceEntry:
+    __slots__ = ("exe", "cls", "title", "rect", "show", "monitor", "tokens")
+
+    def __init__(self, exe, cls, title, rect, show, monitor):
+        self.exe = exe
+        self.cls = cls
+        self.title = title
+        self.rect = rect  # restored (normal) rect, also for maximized/minimized windows
+        self.show = show
+        self.monitor = monitor  # index into the workspace's monitors
+        self.tokens = _title_tokens(title)
+
+
+class _Workspace:
+    __slots__ = ("name", "monitors", "entries")
+
+    def __init__(self, name, monitors, entries):
+        self.name = name
+        self.monitors = monitors  # work areas, in topology order
+        self.entries = entries
+
+
+class _WorkspaceStore:
+    """Named desktop snapshots in one compact file.
+
+    The file is MAGIC, then per workspace a uint16-length UTF-8 name, a
+    monitor count with their work areas, a string table (exe, class and title
+    strings stored once) and the window records: int32 l, t, r, b, a show
+    byte, a monitor byte and three uint16 string indexes.
+    """
+
+    MAGIC = b"MMOW1"
+    HEADER = struct.Struct("<HBHH")  # name length, monitors, strings, entries
+    MONITOR = struct.Struct("<4i")
+    STRING = struct.Struct("<H")
+    RECORD = struct.Struct("<4iBB3H")
+
+    def __init__(self):
+        self._workspaces = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        with self._lock:
+            return sorted(self._workspaces)
+
+    def get(self, name: str):
+        with self._lock:
+            return self._workspaces.get(name)
+
+    def put(self, workspace):
+        with self._lock:
+            self._workspaces[workspace.name] = workspace
+
+    def dumps(self) -> bytes:
+        with self._lock:
+            workspaces = list(self._workspaces.values())
+        out = bytearray(self.MAGIC)
+        for ws in workspaces:
+            strings = {}
+            for entry in ws.entries:
+                for text in (entry.exe, entry.cls, entry.title):
+                    strings.setdefault(text, len(strings))
+            name = ws.name.encode("utf-8")[:0xFFFF]
+            out += self.HEADER.pack(len(name), len(ws.monitors), len(strings), len(ws.entries)) + name
+            for work in ws.monitors:
+                out += self.MONITOR.pack(*work)
+            for text in strings:
+                raw = text.encode("utf-8")[:0xFFFF]
+                out += self.STRING.pack(len(raw)) + raw
+            for e in ws.entries:
+                out += self.RECORD.pack(*e.rect, e.show, e.monitor,
+                                        strings[e.exe], strings[e.cls], strings[e.title])
+        return bytes(out)
+
+    def loads(self, blob: bytes):
+        if not blob.startswith(self.MAGIC):
+            raise ValueError("not a workspace file")
+        pos = len(self.MAGIC)
+        workspaces = {}
+        while pos + self.HEADER.size <= len(blob):
+            name_len, monitor_count, string_count, entry_count = self.HEADER.unpack_from(blob, pos)
+            pos += self.HEADER.size
+            name = blob[pos:pos + name_len].decode("utf-8", "replace")
+            pos += name_len
+            monitors = []
+            for _ in range(monitor_count):
+                monitors.append(self.MONITOR.unpack_from(blob, pos))
+                pos += self.MONITOR.size
+            strings = []
+            for _ in range(string_count):
+                (size,) = self.STRING.unpack_from(blob, pos)
+                pos += self.STRING.size
+                strings.append(blob[pos:pos + size].decode("utf-8", "replace"))
+                pos += size
+            entries = []
+            for _ in range(entry_count):
+                l, t, r, b, show, monitor, exe, cls, title = self.RECORD.unpack_from(blob, pos)
+                pos += self.RECORD.size
+                entries.append(_WorkspaceEntry(strings[exe], strings[cls], strings[title],
+                                               (l, t, r, b), show, monitor))
+            workspaces[name] = _Workspace(name, monitors, entries)
+        with self._lock:
+            self._workspaces.update(workspaces)
+
+    def save(self, path: str):
+        # Written aside and swapped in, so a crash mid-write keeps the old file
+        data = self.dumps()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        with open(path, "rb") as fh:
+            self.loads(fh.read())
+
+
+def _match_workspace(entries, windows):
+    """Pair snapshot entries with live windows -> [(hwnd, entry)].
+
+    Windows only pair within the same exe + class. Identical titles pair
+    first through a dict; whatever is left in a group pairs greedily by
+    title similarity, so a reboot (new hwnds, slightly different titles)
+    still finds its windows without comparing every window to every entry.
+    ``windows`` is [(hwnd, exe, class, title)].
+    """
+    groups = {}
+    for hwnd, exe, cls, title in windows:
+        groups.setdefault((exe, cls), []).append((hwnd, title))
+    wanted = {}
+    for entry in entries:
+        wanted.setdefault((entry.exe, entry.cls), []).append(entry)
+    matches = []
+    for key, group_entries in wanted.items():
+        candidates = groups.get(key)
+        if not candidates:
+            continue
+        by_title = {}
+        for hwnd, title in candidates:
+            by_title.setdefault(title, []).append(hwnd)
+        used = set()
+        rest = []
+        for entry in group_entries:
+            hwnds = by_title.get(entry.title)
+            if hwnds:
+                hwnd = hwnds.pop()
+                used.add(hwnd)
+                matches.append((hwnd, entry))
+            else:
+                rest.append(entry)
+        free = [(hwnd, _title_tokens(title)) for hwnd, title in candidates if hwnd not in used]
+        if not rest or not free:
+            continue
+        scored = sorted(
+            ((_title_similarity(entry.tokens, tokens), i, j)
+             for i, entry in enumerate(rest) for j, (_, tokens) in enumerate(free)),
+            reverse=True,
+        )
+        taken_entries = set()
+        taken_windows = set()
+        for _, i, j in scored:
+            if i in taken_entries or j in taken_windows:
+                continue
+            taken_entries.add(i)
+            taken_windows.add(j)
+            matches.append((free[j][0], rest[i]))
+    return matches
+
+
+def _remap_rect(rect, saved_work, work):
+    # Keep a window's place relative to its monitor's work area if that changed size
+    if tuple(saved_work) == tuple(work):
+        return tuple(rect)
+    sl, st, sr, sb = saved_work
+    l, t, r, b = work
+    sx = (r - l) / max(1, sr - sl)
+    sy = (b - t) / max(1, sb - st)
+    return (
+        l + int(round((rect[0] - sl) * sx)),
+        t + int(round((rect[1] - st) * sy)),
+        l + int(round((rect[2] - sl) * sx)),
+        t + int(round((rect[3] - st) * sy)),
+    )
+
+
+_workspaces = None
+
+
+def _get_workspaces():
+    global _workspaces
+    if _workspaces is None:
+        with _singletons_lock:
+            if _workspaces is None:
+                store = _WorkspaceStore()
+                path = _app_data_path(WORKSPACES_FILE_NAME)
+                if os.path.exists(path):
+                    try:
+                        store.load(path)
+                    except Exception as exc:
+                        _log(LOG_ERROR, "Workspaces", f"failed to load {path} ({exc})")
+                _workspaces = store
+    return _workspaces
+
+
+def _live_windows():
+    # -> [(hwnd, exe, class, title)] for every switchable window, most recent first
+    windows = _get_window_backend()
+    tracker = _get_foreground_tracker()
+    return [(hwnd, tracker.process_name_for(hwnd) or "", windows.class_name(hwnd), windows.window_title(hwnd))
+            for hwnd in _get_window_index().windows()]
+
+
+def _capture_workspace(name: str = WORKSPACE_DEFAULT_NAME, save: bool = True) -> Future:
+    # -> Future done once the snapshot is stored; the window queries run on the worker
+    return _get_window_worker().submit_layout(lambda: _store_workspace(name, save))
+
+
+def _store_workspace(name: str, save: bool):
+    # Runs on the window worker; a layout that only reads, so it returns no moves
+    windows = _get_window_backend()
+    topology = _get_monitor_topology()
+    monitors = topology.monitors()
+    entries = []
+    for hwnd, exe, cls, title in _live_windows():
+        show = windows.show_state(hwnd)
+        rect = tuple(windows.normal_rect(hwnd) if show != SW_SHOWNORMAL else windows.window_rect(hwnd))
+        monitor = topology.monitor_for_rect(rect)
+        index = monitors.index(monitor) if monitor in monitors else 0
+        entries.append(_WorkspaceEntry(exe, cls, title, rect, show, index))
+    workspace = _Workspace(name, [mon.work for mon in monitors], entries)
+    store = _get_workspaces()
+    store.put(workspace)
+    if save:
+        try:
+            store.save(_app_data_path(WORKSPACES_FILE_NAME))
+        except Exception as exc:
+            _log(LOG_ERROR, "Workspaces", f"failed to save ({exc})")
+    _log(LOG_INFO, "Workspaces", f"saved {name!r}", windows=len(entries))
+    return None
+
+
+def _restore_workspace(name: str = WORKSPACE_DEFAULT_NAME):
+    # -> Future of the moves, built on the window worker, or None if there is no such workspace
+    workspace = _get_workspaces().get(name)
+    if workspace is None:
+        return None
+    return _get_window_worker().submit_layout(lambda: _workspace_moves(workspace), remember=True)
+
+
+def _workspace_moves(workspace):
+    # Runs on the window worker -> [(hwnd, rect, show)]
+    monitors = _get_monitor_topology().monitors()
+    moves = []
+    for hwnd, entry in _match_workspace(workspace.entries, _live_windows()):
+        rect = entry.rect
+        if monitors and entry.monitor < len(workspace.monitors):
+            # The same monitor slot if it still exists, else the first monitor
+            work = monitors[entry.monitor].work if entry.monitor < len(monitors) else monitors[0].work
+            rect = _remap_rect(rect, workspace.monitors[entry.monitor], work)
+        moves.append((hwnd, rect, entry.show))
+    return moves
+
+
+def _save_workspace_action():
+    _capture_workspace(WORKSPACE_DEFAULT_NAME)
+
+
+def _restore_workspace_action():
+    _restore_workspace(WORKSPACE_DEFAULT_NAME)
+
+
+def _key_event(vk: int, up: bool = False):
+    flags = KEYEVENTF_KEYUP if up else 0
+    ctypes.windll.user32.keybd_event(vk, 0, flags, 0)
+
+
+# ---------------- CHORDS ----------------
+class _KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class _HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [
+        ("uMsg", wintypes.DWORD),
+        ("wParamL", wintypes.WORD),
+        ("wParamH", wintypes.WORD),
+    ]
+
+
+class _INPUTUNION(ctypes.Union):
+    # SendInput validates cbSize, so the union must be as large as MOUSEINPUT
+    _fields_ = [("ki", _KEYBDINPUT), ("mi", _MOUSEINPUT), ("hi", _HARDWAREINPUT)]
+
+
+class _INPUT(ctypes.Structure):
+    _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+
+def _build_input_array(events):
+    # events: sequence of (vk, up) -> ready-to-send INPUT array
+    inputs = (_INPUT * len(events))()
+    for item, (vk, up) in zip(inputs, events):
+        flags = KEYEVENTF_KEYUP if up else 0
+        if vk in EXTENDED_VKS:
+            flags |= KEYEVENTF_EXTENDEDKEY
+        item.type = INPUT_KEYBOARD
+        item.u.ki.wVk = vk
+        item.u.ki.dwFlags = flags
+    return inputs
+
+
+class _ChordBatch:
+    """One precompiled SendInput batch: readable events plus the INPUT array."""
+
+    __slots__ = ("events", "inputs")
+
+    def __init__(self, events):
+        self.events = tuple(events)
+        self.inputs = _build_input_array(self.events)
+
+
+class _Chord:
+    """A key chord compiled once into a batch per held-modifier combination.
+
+    ``release_mask`` lists modifiers that must not leak into the chord: when any
+    of them is physically held, its variant releases it first and presses it
+    again at the end, all inside the same batch.
+    """
+
+    __slots__ = ("name", "release_mask", "variants")
+
+    def __init__(self, name: str, mods, key: int, release_mask: int = 0):
+        self.name = name
+        self.release_mask = release_mask
+        body = [(vk, False) for vk in mods]
+        body += [(key, False), (key, True)]
+        body += [(vk, True) for vk in reversed(mods)]
+        self.variants = {}
+        bits = [bit for bit in MODIFIER_VKS if release_mask & bit]
+        for combo in range(1 << len(bits)):
+            held = [bits[i] for i in range(len(bits)) if combo & (1 << i)]
+            mask = 0
+            for bit in held:
+                mask |= bit
+            events = [(MODIFIER_VKS[bit], True) for bit in held]
+            events += body
+            events += [(MODIFIER_VKS[bit], False) for bit in reversed(held)]
+            self.variants[mask] = _ChordBatch(events)
+
+    def batch(self, held_mask: int = 0) -> _ChordBatch:
+        return self.variants[held_mask & self.release_mask]
+
+
+# name -> (modifier vks, key vk, modifiers to release while sending)
+CHORD_SPECS = {
+    "refresh": ((VK_CONTROL,), VK_R, 0),
+    "hard_refresh": ((VK_CONTROL,), VK_F5, 0),
+    "ctrl_slash": ((VK_CONTROL,), VK_OEM_2, MOD_SHIFT),
+    "undo": ((VK_CONTROL,), VK_Z, MOD_SHIFT),
+    "redo": ((VK_CONTROL,), VK_Y, MOD_SHIFT),
+    "browser_next_tab": ((VK_CONTROL,), VK_TAB, 0),
+    "browser_prev_tab": ((VK_CONTROL, VK_SHIFT), VK_TAB, 0),
+    "next_tab": ((VK_CONTROL,), VK_NEXT, 0),
+    "prev_tab": ((VK_CONTROL,), VK_PRIOR, 0),
+    "browser_back": ((VK_MENU,), VK_LEFT, 0),
+    "browser_forward": ((VK_MENU,), VK_RIGHT, 0),
+    "desktop_left": ((VK_LWIN, VK_CONTROL), VK_LEFT, MOD_SHIFT),
+    "desktop_right": ((VK_LWIN, VK_CONTROL), VK_RIGHT, MOD_SHIFT),
+    "print_screen": ((), VK_SNAPSHOT, MOD_WIN | MOD_RWIN | MOD_ALT | MOD_CTRL | MOD_SHIFT),
+}
+
+_CHORDS = {name: _Chord(name, *spec) for name, spec in CHORD_SPECS.items()}
+
+
+class _SendInputInjector:
+    """Fires each chord batch with a single SendInput call."""
+
+    def __init__(self):
+        self._send = ctypes.windll.user32.SendInput
+        self._send.argtypes = (wintypes.UINT, ctypes.POINTER(_INPUT), ctypes.c_int)
+        self._send.restype = wintypes.UINT
+        self._size = ctypes.sizeof(_INPUT)
+
+    def send(self, batch: _ChordBatch):
+        count = len(batch.events)
+        sent = self._send(count, batch.inputs, self._size)
+        if sent != count:
+            raise ctypes.WinError()
+
+
+class _RecordingInjector:
+    """Fake injector that records batches; ``syscalls`` counts send() calls."""
+
+    def __init__(self):
+        self.batches = []
+        self.syscalls = 0
+
+    def send(self, batch: _ChordBatch):
+        self.syscalls += 1
+        self.batches.append(batch.events)
+
+
+def _get_injector():
+    global _injector
+    if _injector is None:
+        with _singletons_lock:
+            if _injector is None:
+                _injector = _SendInputInjector()
+    return _injector
+
+
+def _held_modifiers(mask: int) -> int:
+    if _keymap is not None:
+        return _keymap.held & mask
+    held = 0
+    for bit, name in MODIFIER_NAMES.items():
+        if mask & bit and keyboard.is_pressed(name):
+            held |= bit
+    return held
+
+
+def _fire_chord(name: str):
+    chord = _CHORDS[name]
+    held = _held_modifiers(chord.release_mask) if chord.release_mask else 0
+    _get_injector().send(chord.batch(held))
+
+
+def _send_ctrl_slash():
+    # Ctrl + '/', releasing Shift if held
+    _fire_chord("ctrl_slash")
+
+
+def _refresh_tap():
+    _log(LOG_DEBUG, "Refresh", "non-browser (Ctrl+/)")
+    _send_ctrl_slash()
+
+
+def _refresh_hold():
+    _log(LOG_DEBUG, "Refresh", "hold: non-browser (Ctrl+/)")
+    _send_ctrl_slash()
+
+
+def _browser_refresh():
+    _log(LOG_DEBUG, "Refresh", "browser (Ctrl+R)")
+    _fire_chord("refresh")
+
+
+def _browser_hard_refresh():
+    _log(LOG_DEBUG, "Refresh", "hard: browser (Ctrl+F5)")
+    _fire_chord("hard_refresh")
+
+
+def _print_screen():
+    # Release modifiers to avoid Win/Alt/Shift altering the snapshot behavior
+    _fire_chord("print_screen")
+
+
+def _prev_tab():
+    # Non-browser: Ctrl+PgUp
+    _fire_chord("prev_tab")
+
+
+def _next_tab():
+    # Non-browser: Ctrl+PgDn
+    _fire_chord("next_tab")
+
+
+def _browser_prev_tab():
+    # Browser: Ctrl+Shift+Tab
+    _fire_chord("browser_prev_tab")
+
+
+def _browser_next_tab():
+    # Browser: Ctrl+Tab
+    _fire_chord("browser_next_tab")
+
+
+def _browser_nav(back: bool):
+    # Alt+Left / Alt+Right for browser navigation
+    _fire_chord("browser_back" if back else "browser_forward")
+
+
+def _switch_virtual_desktop(back: bool):
+    # Send Win+Ctrl+Left/Right; Shift is released in-batch so it doesn't move windows
+    _fire_chord("desktop_left" if back else "desktop_right")
+
+
+def _win_d_chord():
+    # Send Win+D with aggressive key-up to avoid Win sticking (and Win+P)
+    _key_event(VK_D, up=True)
+    _key_event(VK_LWIN, up=True)
+    time.sleep(0.005)
+    _key_event(VK_LWIN)
+    time.sleep(0.005)
+    _key_event(VK_D)
+    time.sleep(0.015)  # let Windows register the chord
+    _key_event(VK_D, up=True)
+    _key_event(VK_LWIN, up=True)
+    _key_event(VK_LWIN, up=True)  # extra release guard
+
 
+def _get_shell_app():
+    # Only called on the COM apartment, which keeps the object for the process lifetime
+    global _shell_app
+    if _shell_app is None:
+        _shell_app = win32com.client.Dispatch("Shell.Application")
+    return _shell_app
 
-def _get_volume_endpoint():
-    global _volume_endpoint
-    if _volume_endpoint is not None:
-        return _volume_endpoint
+
+def _toggle_desktop_sta():
+    # Prefer Shell.ToggleDesktop for proper toggle; fall back to a Win+D chord
+    try:
+        _get_shell_app().ToggleDesktop()
+        return
+    except Exception:
+        pass
 
     try:
+        _win_d_chord()
+    except Exception:
+        pass  # keep hotkey resilient
+
+
+def _toggle_desktop():
+    # Queued so the hook never waits on Explorer
+    _get_com_apartment().submit(_toggle_desktop_sta)
+
+
+# ---------------- VOLUME ----------------
+EDATAFLOW_RENDER = 0
+
+
+def _make_pycaw_callbacks(on_level, on_default_device_changed):
+    # comtypes/pycaw are Windows-only, so the COM callback classes are built lazily
+    from comtypes import COMObject
+    from pycaw.api.endpointvolume import IAudioEndpointVolumeCallback
+    from pycaw.api.mmdeviceapi import IMMNotificationClient
+
+    class _VolumeCallback(COMObject):
+        _com_interfaces_ = [IAudioEndpointVolumeCallback]
+
+        def OnNotify(self, pNotify):
+            on_level(pNotify.contents.fMasterVolume)
+            return 0
+
+    class _DeviceCallback(COMObject):
+        _com_interfaces_ = [IMMNotificationClient]
+
+        def OnDefaultDeviceChanged(self, flow, role, device_id):
+            if flow == EDATAFLOW_RENDER:
+                on_default_device_changed()
+            return 0
+
+        def OnDeviceStateChanged(self, device_id, new_state):
+            return 0
+
+        def OnDeviceAdded(self, device_id):
+            return 0
+
+        def OnDeviceRemoved(self, device_id):
+            return 0
+
+        def OnPropertyValueChanged(self, device_id, key):
+            return 0
+
+    return _VolumeCallback(), _DeviceCallback()
+
+
+class _PycawEndpoint:
+    """Default render endpoint with a change-notification registration."""
+
+    def __init__(self, endpoint, callback):
+        self._endpoint = endpoint
+        self._callback = callback
+        endpoint.RegisterControlChangeNotify(callback)
+
+    def level(self) -> float:
+        return self._endpoint.GetMasterVolumeLevelScalar()
+
+    def set_level(self, level: float):
+        self._endpoint.SetMasterVolumeLevelScalar(level, None)
+
+    def step(self):
+        # Scalar size of one VolumeStepUp on this device, from its step count
+        _, count = self._endpoint.GetVolumeStepInfo()
+        return 1.0 / (count - 1) if count > 1 else None
+
+    def close(self):
+        try:
+            self._endpoint.UnregisterControlChangeNotify(self._callback)
+        except Exception:
+            pass
+
+
+class _PycawVolumeBackend:
+    """Opens the default speakers and reports default-device changes.
+
+    The enumerator and endpoint live on the COM apartment; the returned
+    endpoint is a proxy that forwards each call there.
+    """
+
+    def __init__(self, apartment=None):
+        self._apartment = apartment
+        self._enumerator = None
+        self._device_callback = None
+
+    def connect(self, on_level, on_default_device_changed):
+        apartment = self._apartment or _get_com_apartment()
+        endpoint = apartment.call(self._connect, on_level, on_default_device_changed)
+        return _ApartmentProxy(apartment, endpoint)
+
+    def _connect(self, on_level, on_default_device_changed):
+        _ensure_subsystem("audio")
+        volume_cb, device_cb = _make_pycaw_callbacks(on_level, on_default_device_changed)
+        if self._enumerator is None:
+            try:
+                self._enumerator = AudioUtilities.GetDeviceEnumerator()
+                self._enumerator.RegisterEndpointNotificationCallback(device_cb)
+                self._device_callback = device_cb
+            except Exception as exc:
+                _log(LOG_WARNING, "Volume", f"device notifications unavailable ({exc})")
         devices = AudioUtilities.GetSpeakers()
         interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        _volume_endpoint = cast(interface, POINTER(IAudioEndpointVolume))
-    except Exception:
-        _volume_endpoint = None
-    return _volume_endpoint
+        return _PycawEndpoint(cast(interface, POINTER(IAudioEndpointVolume)), volume_cb)
+
+
+class _FakeVolumeEndpoint:
+    def __init__(self, backend):
+        self._backend = backend
+        self.get_calls = 0
+        self.set_calls = 0
+        self.closed = False
+
+    def level(self) -> float:
+        self.get_calls += 1
+        if self._backend.failing:
+            raise OSError("endpoint gone")
+        return self._backend.device_level
+
+    def step(self):
+        return 1.0 / (self._backend.step_count - 1)
+
+    def set_level(self, level: float):
+        self.set_calls += 1
+        self._backend.device_level = level
+
+    def post(self, name: str, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(getattr(self, name)(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeVolumeBackend:
+    """In-memory default audio device; counts connects and COM calls.
+
+    While ``failing`` is set, reading the level raises, like a device that
+    disappeared between Activate and the first call.
+    """
+
+    def __init__(self, level: float = 0.5, step_count: int = 51):
+        self.device_level = level
+        self.step_count = step_count
+        self.failing = False
+        self.endpoints = []
+        self._on_level = None
+        self._on_default = None
+
+    def com_calls(self) -> int:
+        return sum(ep.get_calls + ep.set_calls for ep in self.endpoints)
+
+    def connect(self, on_level, on_default_device_changed):
+        self._on_level = on_level
+        self._on_default = on_default_device_changed
+        self.endpoints.append(_FakeVolumeEndpoint(self))
+        return self.endpoints[-1]
+
+    def external_change(self, level: float):
+        # Another app (or the OS flyout) changed the volume
+        self.device_level = level
+        if self._on_level:
+            self._on_level(level)
+
+    def change_default_device(self, level: float):
+        # e.g. a headset was unplugged and the speakers became the default
+        self.device_level = level
+        if self._on_default:
+            self._on_default()
 
 
 def _volume_keypress(up: bool):
@@ -677,89 +3848,523 @@ def _volume_keypress(up: bool):
     _key_event(vk)
 
 
-def _volume_step(up: bool):
-    endpoint = _get_volume_endpoint()
-    if not endpoint:
-        _volume_keypress(up)
-        return
+def _volume_keypress_steps(steps: int):
+    for _ in range(abs(steps)):
+        _volume_keypress(steps > 0)
+
+
+class _VolumeEngine:
+    """Applies volume steps with one SetMasterVolumeLevelScalar per flush.
+
+    Steps requested before the pending flush runs (a hotkey plus an IPC or
+    WebSocket request, or several of those) merge into one write. Repeat
+    ticks are further apart than a flush takes, so each tick is its own write;
+    acceleration grows the step per tick instead. The current level is cached
+    and kept fresh by endpoint change notifications, so applying steps never
+    reads the level back. The endpoint is rebuilt lazily after the default
+    render device changes. A step is the device's own VolumeStepUp size
+    (``step=None``) unless one is given.
+    """
+
+    def __init__(self, backend, scheduler=None, step: float = None,
+                 fallback=_volume_keypress_steps):
+        self._backend = backend
+        self._scheduler = scheduler
+        self._fixed_step = step
+        self._step = step or VOLUME_STEP_SCALAR
+        self._fallback = fallback
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._flush_call = None
+        self._endpoint = None
+        self._stale = True
+        self.level = None
+        self.flushes = 0
+
+    def request(self, steps: int):
+        # Without a scheduler the caller drives flush() itself
+        with self._lock:
+            self._pending += steps
+            if self._flush_call is None and self._scheduler is not None:
+                self._flush_call = self._scheduler.call_later(0, self.flush)
+
+    def flush(self):
+        with self._lock:
+            steps, self._pending = self._pending, 0
+            self._flush_call = None
+        if not steps:
+            return
+        self.flushes += 1
+        endpoint = self._get_endpoint()
+        if endpoint is None:
+            self._fallback(steps)
+            return
+        level = min(1.0, max(0.0, round(self.level + steps * self._step, 4)))
+        # Posted to the COM apartment, not waited on: the scheduler thread
+        # also runs key repeat and must not block on a slow audio driver
+        self.level = level
+        _publish_state("volume", level)
+        endpoint.post("set_level", level).add_done_callback(
+            lambda future: self._on_written(future, steps)
+        )
 
-    try:
-        if up:
-            endpoint.VolumeStepUp(None)
-        else:
-            endpoint.VolumeStepDown(None)
-    except Exception:
-        _volume_keypress(up)
+    def _on_written(self, future, steps: int):
+        if future.exception() is not None:
+            self._stale = True
+            self._fallback(steps)
+
+    def _get_endpoint(self):
+        if self._stale:
+            if self._endpoint is not None:
+                self._endpoint.close()
+                self._endpoint = None
+            endpoint = None
+            try:
+                endpoint = self._backend.connect(self._on_level, self._on_default_device_changed)
+                self.level = endpoint.level()
+                if self._fixed_step is None:
+                    self._step = endpoint.step() or VOLUME_STEP_SCALAR
+                self._endpoint = endpoint
+                _publish_state("volume", self.level)
+                self._stale = False
+            except Exception as exc:
+                _log(LOG_WARNING, "Volume", f"endpoint unavailable ({exc})")
+                if endpoint is not None:
+                    # Registered for change notifications; don't leak that
+                    endpoint.close()
+        return self._endpoint
 
+    def _on_level(self, level: float):
+        self.level = level
+        _publish_state("volume", level)
 
-def _volume_press(name: str, up: bool):
-    if name in _volume_state:
-        return
-    stop_evt = threading.Event()
-    _volume_state[name] = stop_evt
-    _volume_step(up)
+    def _on_default_device_changed(self):
+        # Called on a COM thread; just mark stale and reconnect on the next flush
+        self._stale = True
 
-    def _runner():
-        delay = VOLUME_REPEAT_INITIAL_SEC
-        while not stop_evt.wait(delay):
-            _volume_step(up)
-            delay = VOLUME_REPEAT_SEC
 
-    threading.Thread(target=_runner, daemon=True).start()
+def _get_volume_engine():
+    global _volume_engine
+    if _volume_engine is None:
+        with _singletons_lock:
+            if _volume_engine is None:
+                _volume_engine = _VolumeEngine(_PycawVolumeBackend(), _get_scheduler())
+    return _volume_engine
 
 
-def _volume_release(name: str):
-    stop_evt = _volume_state.pop(name, None)
-    if stop_evt:
-        stop_evt.set()
+def _volume_accel(ticks: int) -> int:
+    steps = 1
+    for threshold, value in VOLUME_ACCEL_CURVE:
+        if ticks >= threshold:
+            steps = value
+    return steps
 
 
-def _legacy_shift_f23_action():
-    # Preserved old behavior: browser back or Ctrl+Z
-    if _is_browser_window():
-        _browser_nav(back=True)
-    else:
-        _send_ctrl_combo("z")
+def _volume_step(up: bool, steps: int = 1):
+    _get_volume_engine().request(steps if up else -steps)
 
 
-def _legacy_shift_f24_action():
-    # Preserved old behavior: browser forward or Ctrl+Y
-    if _is_browser_window():
-        _browser_nav(back=False)
-    else:
-        _send_ctrl_combo("y")
+# Per-app volume (audio sessions of the foreground process)
+AUDIO_SESSION_STATE_EXPIRED = 2
 
 
-def _handle_f23_press(e):
-    # Debug logging noisy during normal use; keep commented for troubleshooting.
-    # proc = _get_foreground_process_name()
-    # print(f"Active process: {proc or 'unknown'}")
-    if keyboard.is_pressed("ctrl"):
-        _switch_virtual_desktop(back=True)
-        return
-    _volume_press(VOLUME_DOWN_HOTKEY, up=False)
+def _make_session_callbacks(on_created, on_expired):
+    from comtypes import COMObject
+    from pycaw.api.audiopolicy import IAudioSessionEvents, IAudioSessionNotification
 
+    class _SessionNotification(COMObject):
+        _com_interfaces_ = [IAudioSessionNotification]
 
-def _handle_f23_release(e):
-    if keyboard.is_pressed("ctrl"):
-        return
-    _volume_release(VOLUME_DOWN_HOTKEY)
+        def OnSessionCreated(self, new_session):
+            on_created(new_session)
+            return 0
 
+    def make_events(key):
+        class _SessionEvents(COMObject):
+            _com_interfaces_ = [IAudioSessionEvents]
 
-def _handle_f24_press(e):
-    # Debug logging noisy during normal use; keep commented for troubleshooting.
-    # proc = _get_foreground_process_name()
-    # print(f"Active process: {proc or 'unknown'}")
-    if keyboard.is_pressed("ctrl"):
-        _switch_virtual_desktop(back=False)
-        return
-    _volume_press(VOLUME_UP_HOTKEY, up=True)
+            def OnStateChanged(self, new_state):
+                if new_state == AUDIO_SESSION_STATE_EXPIRED:
+                    on_expired(key)
+                return 0
 
+            def OnSessionDisconnected(self, reason):
+                on_expired(key)
+                return 0
 
-def _handle_f24_release(e):
-    if keyboard.is_pressed("ctrl"):
-        return
-    _volume_release(VOLUME_UP_HOTKEY)
+            def OnDisplayNameChanged(self, *args):
+                return 0
+
+            def OnIconPathChanged(self, *args):
+                return 0
+
+            def OnSimpleVolumeChanged(self, *args):
+                return 0
+
+            def OnChannelVolumeChanged(self, *args):
+                return 0
+
+            def OnGroupingParamChanged(self, *args):
+                return 0
+
+        return _SessionEvents()
+
+    return _SessionNotification(), make_events
+
+
+class _PycawSession:
+    """One audio session (ISimpleAudioVolume) with its expiry registration."""
+
+    def __init__(self, control, volume, events=None):
+        self._control = control
+        self._volume = volume
+        self._events = events
+        if events is not None:
+            control.RegisterAudioSessionNotification(events)
+
+    def level(self) -> float:
+        return self._volume.GetMasterVolume()
+
+    def set_level(self, level: float):
+        self._volume.SetMasterVolume(level, None)
+
+    def close(self):
+        if self._events is None:
+            return
+        try:
+            self._control.UnregisterAudioSessionNotification(self._events)
+        except Exception:
+            pass
+
+
+class _PycawSessionBackend:
+    """Audio sessions of the default render device, owned by the COM apartment.
+
+    ``sessions()`` enumerates (pid, key, session) on the apartment; created
+    and expired notifications are forwarded to the callbacks given to
+    ``connect``. Sessions are handed out as apartment proxies.
+
+    Notifications arrive on MTA threads, so the interface they carry is
+    never used: a created notification queues one re-enumeration on the
+    apartment, which reports the sessions it hadn't seen before. ``_known``
+    is shared with those threads and guarded by ``_lock``.
+    """
+
+    def __init__(self, apartment=None):
+        self._apartment = apartment
+        self._manager = None
+        self._notification = None
+        self._make_events = None
+        self._lock = threading.Lock()
+        self._known = {}  # session instance id -> _PycawSession
+        self._refresh_pending = False
+        self._on_created = None
+        self._on_expired = None
+        self.enumerations = 0
+
+    def _get_apartment(self):
+        return self._apartment or _get_com_apartment()
+
+    def connect(self, on_created, on_expired):
+        self._on_created = on_created
+        self._on_expired = on_expired
+        self._get_apartment().call(self._connect)
+
+    def sessions(self):
+        apartment = self._get_apartment()
+        return [(pid, key, _ApartmentProxy(apartment, session))
+                for pid, key, session in apartment.call(self._enumerate)]
+
+    def _get_manager(self):
+        if self._manager is None:
+            _ensure_subsystem("audio")
+            self._manager = AudioUtilities.GetAudioSessionManager()
+        return self._manager
+
+    def _connect(self):
+        manager = self._get_manager()
+        self._notification, self._make_events = _make_session_callbacks(self._created, self._expired)
+        # The manager only sends notifications once sessions were enumerated
+        manager.GetSessionEnumerator()
+        manager.RegisterSessionNotification(self._notification)
+
+    def _wrap(self, control):
+        from pycaw.api.audiopolicy import IAudioSessionControl2, ISimpleAudioVolume
+        control = control.QueryInterface(IAudioSessionControl2)
+        if control.GetState() == AUDIO_SESSION_STATE_EXPIRED:
+            return None
+        key = control.GetSessionInstanceIdentifier()
+        with self._lock:
+            session = self._known.get(key)
+        if session is None:
+            events = self._make_events(key) if self._make_events else None
+            session = _PycawSession(control, control.QueryInterface(ISimpleAudioVolume), events)
+            with self._lock:
+                self._known[key] = session
+        return control.GetProcessId(), key, session
+
+    def _enumerate(self):
+        self.enumerations += 1
+        enumerator = self._get_manager().GetSessionEnumerator()
+        found = []
+        for i in range(enumerator.GetCount()):
+            entry = self._wrap(enumerator.GetSession(i))
+            if entry is not None:
+                found.append(entry)
+        return found
+
+    def _created(self, control):
+        # MTA thread: control belongs to this apartment, so look again from the STA
+        with self._lock:
+            if self._refresh_pending:
+                return
+            self._refresh_pending = True
+        self._get_apartment().submit(self._refresh)
+
+    def _refresh(self):
+        with self._lock:
+            self._refresh_pending = False
+            seen = set(self._known)
+        apartment = self._get_apartment()
+        for pid, key, session in self._enumerate():
+            if key not in seen and self._on_created is not None:
+                self._on_created(pid, key, _ApartmentProxy(apartment, session))
+
+    def _expired(self, key):
+        with self._lock:
+            session = self._known.pop(key, None)
+        if session is not None:
+            # Unregistering inside the callback deadlocks; let the apartment do it afterwards
+            self._get_apartment().submit(session.close)
+        if self._on_expired is not None:
+            self._on_expired(key)
+
+
+class _FakeAudioSession:
+    def __init__(self, level: float):
+        self.device_level = level
+        self.expired = False
+        self.get_calls = 0
+        self.set_calls = 0
+
+    def level(self) -> float:
+        self.get_calls += 1
+        if self.expired:
+            raise OSError("AUDCLNT_E_DEVICE_INVALIDATED")
+        return self.device_level
+
+    def set_level(self, level: float):
+        self.set_calls += 1
+        if self.expired:
+            raise OSError("AUDCLNT_E_DEVICE_INVALIDATED")
+        self.device_level = level
+
+
+class _FakeSessionManager:
+    """In-memory audio sessions; counts enumerations and per-session calls.
+
+    ``enum_cost`` busy-waits that long per session on each enumeration, to
+    stand in for the COM round trips a real enumeration makes.
+    """
+
+    def __init__(self, enum_cost: float = 0.0, notifications: bool = True):
+        self.enum_cost = enum_cost
+        self.notifications = notifications
+        self.by_key = {}  # key -> (pid, _FakeAudioSession)
+        self.expired = []
+        self.enumerations = 0
+        self._next_key = 0
+        self._on_created = None
+        self._on_expired = None
+
+    def connect(self, on_created, on_expired):
+        if not self.notifications:
+            raise OSError("session notifications unavailable")
+        self._on_created = on_created
+        self._on_expired = on_expired
+
+    def sessions(self):
+        self.enumerations += 1
+        deadline = time.perf_counter() + self.enum_cost * len(self.by_key)
+        while time.perf_counter() < deadline:
+            pass
+        return [(pid, key, session) for key, (pid, session) in self.by_key.items()]
+
+    def add_session(self, pid: int, level: float = 1.0) -> str:
+        self._next_key += 1
+        key = f"session-{self._next_key}"
+        session = _FakeAudioSession(level)
+        self.by_key[key] = (pid, session)
+        if self._on_created:
+            self._on_created(pid, key, session)
+        return key
+
+    def expire_session(self, key: str):
+        pid, session = self.by_key.pop(key)
+        session.expired = True
+        self.expired.append(session)
+        if self._on_expired:
+            self._on_expired(key)
+
+    def set_calls(self) -> int:
+        live = [session for _, session in self.by_key.values()]
+        return sum(session.set_calls for session in live + self.expired)
+
+
+class _AudioSessionCache:
+    """Audio sessions indexed by pid, kept current by session notifications.
+
+    One enumeration fills the index; created/expired notifications keep it
+    current, so repeat ticks reuse the same session objects. A pid with no
+    indexed session (no notifications, or an app that just started audio)
+    triggers a rescan at most once per ``rescan_sec``. A rescan is merged
+    into the index rather than replacing it, so a session created by a
+    notification during the enumeration is kept. A session that expired
+    during the enumeration is not brought back.
+    """
+
+    def __init__(self, backend, rescan_sec: float = AUDIO_SESSION_RESCAN_SEC):
+        self._backend = backend
+        self._rescan_sec = rescan_sec
+        self._lock = threading.Lock()
+        self._by_pid = {}  # pid -> {key: session}
+        self._pid_of = {}  # key -> pid
+        self._connected = False
+        self._last_scan = None
+        self._expired_in_scan = None  # keys expired while an enumeration runs
+        self.hits = 0
+        self.misses = 0
+        self.scans = 0
+
+    def sessions_for(self, pid: int):
+        with self._lock:
+            sessions = self._by_pid.get(pid)
+            if sessions:
+                self.hits += 1
+                return list(sessions.items())
+            self.misses += 1
+            now = time.perf_counter()
+            if self._last_scan is not None and now - self._last_scan < self._rescan_sec:
+                return []
+            self._last_scan = now
+        self._scan()
+        with self._lock:
+            return list(self._by_pid.get(pid, {}).items())
+
+    def expire(self, key: str):
+        with self._lock:
+            if self._expired_in_scan is not None:
+                self._expired_in_scan.add(key)
+            pid = self._pid_of.pop(key, None)
+            sessions = self._by_pid.get(pid)
+            if sessions is not None:
+                sessions.pop(key, None)
+                if not sessions:
+                    del self._by_pid[pid]
+
+    def stats(self) -> dict:
+        return {"pids": len(self._by_pid), "sessions": len(self._pid_of),
+                "hits": self.hits, "misses": self.misses, "scans": self.scans}
+
+    def _scan(self):
+        if not self._connected:
+            self._connected = True
+            try:
+                self._backend.connect(self._on_created, self.expire)
+            except Exception as exc:
+                _log(LOG_WARNING, "App volume", f"session notifications unavailable ({exc})")
+        with self._lock:
+            self._expired_in_scan = set()
+        try:
+            found = self._backend.sessions()
+        except Exception as exc:
+            _log(LOG_WARNING, "App volume", f"session enumeration failed ({exc})")
+            with self._lock:
+                self._expired_in_scan = None
+            return
+        with self._lock:
+            expired, self._expired_in_scan = self._expired_in_scan, None
+            self.scans += 1
+            for pid, key, session in found:
+                if key not in expired:
+                    self._by_pid.setdefault(pid, {})[key] = session
+                    self._pid_of[key] = pid
+
+    def _on_created(self, pid: int, key: str, session):
+        with self._lock:
+            self._by_pid.setdefault(pid, {})[key] = session
+            self._pid_of[key] = pid
+
+
+class _AppVolumeEngine:
+    """Coalesces per-app volume steps onto the target process's audio sessions.
+
+    Mirrors _VolumeEngine: steps requested during one scheduler tick become
+    one level change per session. The target pid is captured when the steps
+    are requested, so a focus change mid-hold starts a fresh target.
+    """
+
+    def __init__(self, cache, scheduler=None, step: float = VOLUME_STEP_SCALAR):
+        self._cache = cache
+        self._scheduler = scheduler
+        self._step = step
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pending = 0
+        self._flush_call = None
+        self.flushes = 0
+
+    def request(self, pid: int, steps: int):
+        with self._lock:
+            if pid != self._pid:
+                self._pid = pid
+                self._pending = 0
+            self._pending += steps
+            if self._flush_call is None and self._scheduler is not None:
+                self._flush_call = self._scheduler.call_later(0, self.flush)
+
+    def flush(self):
+        with self._lock:
+            pid, steps, self._pending = self._pid, self._pending, 0
+            self._flush_call = None
+        if not steps or not pid:
+            return
+        self.flushes += 1
+        sessions = self._cache.sessions_for(pid)
+        if not sessions:
+            _log(LOG_DEBUG, "App volume", "no audio session", pid=pid)
+            return
+        for key, session in sessions:
+            try:
+                level = min(1.0, max(0.0, round(session.level() + steps * self._step, 4)))
+                session.set_level(level)
+            except Exception:
+                self._cache.expire(key)
+
+
+def _get_app_volume_engine():
+    global _app_volume_engine
+    if _app_volume_engine is None:
+        with _singletons_lock:
+            if _app_volume_engine is None:
+                cache = _AudioSessionCache(_PycawSessionBackend())
+                _app_volume_engine = _AppVolumeEngine(cache, _get_scheduler())
+    return _app_volume_engine
+
+
+def _app_volume_step(up: bool, steps: int = 1):
+    _, pid, _ = _get_foreground_tracker().snapshot()
+    _get_app_volume_engine().request(pid, steps if up else -steps)
+
+
+def _undo():
+    # Preserved old Shift+F23 behavior (browsers map it to back via PROFILE_RULES)
+    _fire_chord("undo")
+
+
+def _redo():
+    # Preserved old Shift+F24 behavior (browsers map it to forward)
+    _fire_chord("redo")
 
 
 def _open_this_pc():
@@ -771,19 +4376,7 @@ def _open_this_pc():
     try:
         subprocess.Popen(["explorer.exe", "shell:MyComputerFolder"])
     except Exception as exc:
-        print(f"This PC: failed to open ({exc})")
-
-
-def _open_this_pc_press(name: str):
-    # Fire once per physical press to avoid repeat-open on key auto-repeat
-    if name in _this_pc_state:
-        return
-    _this_pc_state.add(name)
-    _open_this_pc()
-
-
-def _open_this_pc_release(name: str):
-    _this_pc_state.discard(name)
+        _log(LOG_ERROR, "This PC", f"failed to open ({exc})")
 
 
 def _prevent_sleep():
@@ -800,49 +4393,1725 @@ def _allow_sleep(prev_state):
     ctypes.windll.kernel32.SetThreadExecutionState(prev_state or ES_CONTINUOUS)
 
 
-def _refresh_press(name: str):
-    global _refresh_state
-    if _refresh_state.get("active"):
+# ---------------- METRICS ----------------
+# Histogram bucket upper bounds: 1 us .. ~2 s in quarter-octave steps, plus an overflow bucket
+METRIC_BUCKET_BOUNDS = tuple(1e-6 * 2 ** (i / 4) for i in range(84))
+METRICS_FILE_NAME = "metrics.json"
+
+
+def _app_data_path(name: str) -> str:
+    base = os.path.join(os.environ.get("APPDATA") or os.path.expanduser("~"), APP_NAME)
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, name)
+
+
+class _ActionMetrics:
+    """Fixed-bucket latency histograms per action, preallocated at registration.
+
+    ``record`` is called on the hook thread and only does a bisect plus a few
+    array increments. Counters are not locked; a lost increment under a rare
+    race is acceptable for diagnostics.
+    """
+
+    def __init__(self, bounds=METRIC_BUCKET_BOUNDS):
+        self._bounds = bounds
+        self.names = []
+        self._slots = {}
+        self._counts = []
+        self._errors = array("Q")
+        self._totals = array("d")
+        self._max = array("d")
+
+    def slot(self, name: str) -> int:
+        idx = self._slots.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self._slots[name] = idx
+            self.names.append(name)
+            self._counts.append(array("Q", bytes(8 * (len(self._bounds) + 1))))
+            self._errors.append(0)
+            self._totals.append(0.0)
+            self._max.append(0.0)
+        return idx
+
+    def record(self, idx: int, seconds: float, error: bool = False):
+        self._counts[idx][bisect_left(self._bounds, seconds)] += 1
+        self._totals[idx] += seconds
+        if seconds > self._max[idx]:
+            self._max[idx] = seconds
+        if error:
+            self._errors[idx] += 1
+
+    def _percentile(self, idx: int, pct: float) -> float:
+        counts = self._counts[idx]
+        total = sum(counts)
+        if not total:
+            return 0.0
+        target = total * pct / 100.0
+        running = 0
+        for bucket, count in enumerate(counts):
+            running += count
+            if running >= target:
+                if bucket < len(self._bounds):
+                    return min(self._bounds[bucket], self._max[idx])
+                return self._max[idx]
+        return self._max[idx]
+
+    def snapshot(self) -> dict:
+        result = {}
+        for idx, name in enumerate(self.names):
+            count = sum(self._counts[idx])
+            if not count:
+                continue
+            result[name] = {
+                "count": count,
+                "errors": self._errors[idx],
+                "mean_us": round(self._totals[idx] / count * 1e6, 1),
+                "p50_us": round(self._percentile(idx, 50) * 1e6, 1),
+                "p95_us": round(self._percentile(idx, 95) * 1e6, 1),
+                "p99_us": round(self._percentile(idx, 99) * 1e6, 1),
+                "max_us": round(self._max[idx] * 1e6, 1),
+            }
+        return result
+
+    def dump_json(self, path: str = None) -> str:
+        path = path or _app_data_path(METRICS_FILE_NAME)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"generated": time.time(), "actions": self.snapshot()}, fh, indent=2)
+        return path
+
+
+_metrics = _ActionMetrics()
+
+
+def _dump_metrics():
+    try:
+        path = _metrics.dump_json()
+        _log(LOG_INFO, "Metrics", f"written to {path}")
+    except Exception as exc:
+        _log(LOG_ERROR, "Metrics", f"failed to write ({exc})")
+
+
+# ---------------- MACROS ----------------
+KEYEVENTF_SCANCODE = 0x0008
+MACRO_FILE_NAME = "macro.bin"
+MACRO_SPIN_SEC = 0.002  # sleep until this close to a deadline, then spin on perf_counter
+MACRO_TIMER_MS = 1  # system timer resolution requested while a macro plays (Windows)
+# Scan codes shared by the navigation cluster and the numpad; extended unless keypad
+NAV_CLUSTER_SCANS = {0x47, 0x48, 0x49, 0x4B, 0x4D, 0x4F, 0x50, 0x51, 0x52, 0x53}
+EXTENDED_KEY_NAMES = {"right ctrl", "right alt", "alt gr", "left windows", "right windows", "menu", "apps"}
+
+
+def _is_extended_key(event) -> bool:
+    if event.name in EXTENDED_KEY_NAMES:
+        return True
+    return event.scan_code in NAV_CLUSTER_SCANS and not getattr(event, "is_keypad", False)
+
+
+def _raise_timer_resolution(ms: int) -> bool:
+    # timeBeginPeriod: waits and sleeps wake within ``ms`` instead of the default tick
+    if sys.platform != "win32":
+        return False
+    return ctypes.windll.winmm.timeBeginPeriod(ms) == 0
+
+
+def _restore_timer_resolution(ms: int):
+    ctypes.windll.winmm.timeEndPeriod(ms)
+
+
+class _ScanBatch:
+    """SendInput batch of scan-code events: (scan, up, extended) tuples."""
+
+    __slots__ = ("events", "inputs")
+
+    def __init__(self, events):
+        self.events = tuple(events)
+        self.inputs = (_INPUT * len(self.events))()
+        for item, (scan, up, extended) in zip(self.inputs, self.events):
+            flags = KEYEVENTF_SCANCODE
+            if up:
+                flags |= KEYEVENTF_KEYUP
+            if extended:
+                flags |= KEYEVENTF_EXTENDEDKEY
+            item.type = INPUT_KEYBOARD
+            item.u.ki.wScan = scan
+            item.u.ki.dwFlags = flags
+
+
+class _Macro:
+    """Recorded key events packed as (delta_us, scan, flags) records.
+
+    Each record is 7 bytes: uint32 microseconds since the previous event,
+    uint16 scan code and a flag byte (bit 0 key up, bit 1 extended).
+    """
+
+    RECORD = struct.Struct("<IHB")
+    MAGIC = b"MMOM1"
+    FLAG_UP = 0x1
+    FLAG_EXTENDED = 0x2
+
+    def __init__(self, data: bytes = b""):
+        self.data = bytes(data)
+        self._compiled = None
+
+    def __len__(self):
+        return len(self.data) // self.RECORD.size
+
+    @classmethod
+    def from_events(cls, events):
+        # events: iterable of (seconds, scan, up, extended) in time order
+        out = bytearray()
+        prev = None
+        for t, scan, up, extended in events:
+            delta_us = 0 if prev is None else max(0, int(round((t - prev) * 1e6)))
+            prev = t
+            flags = (cls.FLAG_UP if up else 0) | (cls.FLAG_EXTENDED if extended else 0)
+            out += cls.RECORD.pack(min(delta_us, 0xFFFFFFFF), scan & 0xFFFF, flags)
+        return cls(out)
+
+    def events(self):
+        # -> list of (offset seconds from first event, scan, up, extended)
+        result = []
+        offset_us = 0
+        for delta_us, scan, flags in self.RECORD.iter_unpack(self.data):
+            offset_us += delta_us
+            result.append((offset_us / 1e6, scan, bool(flags & self.FLAG_UP), bool(flags & self.FLAG_EXTENDED)))
+        return result
+
+    def compiled(self):
+        # Prebuilt one-event INPUT arrays so playback only calls SendInput
+        if self._compiled is None:
+            self._compiled = [
+                (offset, _ScanBatch([(scan, up, extended)]))
+                for offset, scan, up, extended in self.events()
+            ]
+        return self._compiled
+
+    def save(self, path: str):
+        with open(path, "wb") as fh:
+            fh.write(self.MAGIC + self.data)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as fh:
+            blob = fh.read()
+        if not blob.startswith(cls.MAGIC):
+            raise ValueError(f"{path} is not a macro file")
+        return cls(blob[len(cls.MAGIC):])
+
+
+class _MacroRecorder:
+    """Collects key events from the keymap hook while recording.
+
+    Deck hotkeys are skipped so the record/play keys never end up in a macro.
+    On stop, ups without a recorded down and downs without a recorded up (the
+    modifiers held for the record hotkey) are dropped.
+    """
+
+    def __init__(self, ignore_keys=()):
+        self._ignore = set(ignore_keys)
+        self._events = []
+        self.recording = False
+
+    def start(self):
+        self._events = []
+        self.recording = True
+
+    def on_event(self, event):
+        if not self.recording or event.name in self._ignore:
+            return
+        self._events.append((
+            time.perf_counter(),
+            event.scan_code,
+            event.event_type == "up",
+            _is_extended_key(event),
+        ))
+
+    def stop(self) -> _Macro:
+        self.recording = False
+        events, self._events = self._events, []
+        held = set()
+        kept = []
+        for item in events:
+            key = (item[1], item[3])
+            if item[2]:
+                if key not in held:
+                    continue
+                held.discard(key)
+            else:
+                held.add(key)
+            kept.append(item)
+        # Backward pass: keep a down (or auto-repeat down) only if an up follows it
+        released = set()
+        result = []
+        for item in reversed(kept):
+            key = (item[1], item[3])
+            if item[2]:
+                released.add(key)
+            elif key not in released:
+                continue
+            result.append(item)
+        result.reverse()
+        return _Macro.from_events(result)
+
+
+class _MacroPlayer:
+    """Plays macros on a worker thread with hybrid sleep-then-spin pacing.
+
+    Each event sleeps until MACRO_SPIN_SEC before its deadline and then spins on
+    perf_counter. On Windows the timer resolution is raised to MACRO_TIMER_MS
+    for the playback, otherwise the sleep can overshoot by a whole 15.6 ms
+    tick and no spin can make up for that. Spinning gets the median lateness
+    to a few microseconds, but the tail is set by how often the thread gets
+    preempted: on a busy machine p99 can still reach milliseconds. Yielding
+    in the spin (``time.sleep(0)``) was measured to raise the median without
+    improving the tail, so the spin doesn't yield.
+
+    ``cancel()`` stops playback and releases any key the macro still holds.
+    ``last_report`` holds lateness stats for the last playback.
+    """
+
+    def __init__(self, injector_factory=None, clock=time.perf_counter, spin: float = MACRO_SPIN_SEC):
+        self._injector_factory = injector_factory or _get_injector
+        self._clock = clock
+        self._spin = spin
+        self._cancel = threading.Event()
+        self._thread = None
+        self.last_report = None
+
+    def is_playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, macro: _Macro) -> bool:
+        if self.is_playing():
+            return False
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self.play_blocking, args=(macro, self._cancel), name="macro", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        self._cancel.set()
+
+    def play_blocking(self, macro: _Macro, cancel: threading.Event = None) -> dict:
+        cancel = cancel or threading.Event()
+        injector = self._injector_factory()
+        clock = self._clock
+        spin = self._spin
+        lateness = []
+        held = {}
+        timer = _raise_timer_resolution(MACRO_TIMER_MS)
+        try:
+            start = clock()
+            for offset, batch in macro.compiled():
+                deadline = start + offset
+                remaining = deadline - clock()
+                if remaining > spin and cancel.wait(remaining - spin):
+                    break
+                while clock() < deadline and not cancel.is_set():
+                    pass
+                if cancel.is_set():
+                    break
+                injector.send(batch)
+                lateness.append(clock() - deadline)
+                scan, up, extended = batch.events[0]
+                if up:
+                    held.pop((scan, extended), None)
+                else:
+                    held[(scan, extended)] = True
+        finally:
+            if timer:
+                _restore_timer_resolution(MACRO_TIMER_MS)
+        cancelled = cancel.is_set()
+        if held:
+            # Don't leave keys stuck down after a cancel
+            injector.send(_ScanBatch([(scan, True, extended) for scan, extended in held]))
+        ordered = sorted(lateness)
+        self.last_report = {
+            "events": len(macro),
+            "sent": len(lateness),
+            "cancelled": cancelled,
+            "p50_us": round(ordered[len(ordered) // 2] * 1e6, 1) if ordered else 0.0,
+            "p99_us": round(ordered[int(len(ordered) * 0.99)] * 1e6, 1) if ordered else 0.0,
+            "max_us": round(ordered[-1] * 1e6, 1) if ordered else 0.0,
+        }
+        _log(LOG_INFO, "Macro", f"playback {self.last_report}")
+        return self.last_report
+
+
+_macro_recorder = None
+_macro_player = _MacroPlayer()
+
+
+def _get_macro_recorder():
+    global _macro_recorder
+    if _macro_recorder is None:
+        with _singletons_lock:
+            if _macro_recorder is None:
+                _macro_recorder = _MacroRecorder(ignore_keys=_bound_keys(KEYMAP))
+    return _macro_recorder
+
+
+def _macro_record_toggle():
+    recorder = _get_macro_recorder()
+    if recorder.recording:
+        if _keymap is not None:
+            _keymap.tap = None
+        macro = recorder.stop()
+        try:
+            macro.save(_app_data_path(MACRO_FILE_NAME))
+        except Exception as exc:
+            _log(LOG_ERROR, "Macro", f"failed to save ({exc})")
+        _log(LOG_INFO, "Macro", f"recorded {len(macro)} events")
+        return
+    if _macro_player.is_playing():
+        return
+    recorder.start()
+    if _keymap is not None:
+        _keymap.tap = recorder.on_event
+    _log(LOG_INFO, "Macro", "recording")
+
+
+def _macro_play_toggle():
+    if _macro_player.is_playing():
+        _macro_player.cancel()
+        return
+    if _macro_recorder is not None and _macro_recorder.recording:
+        return
+    try:
+        macro = _Macro.load(_app_data_path(MACRO_FILE_NAME))
+    except FileNotFoundError:
+        _log(LOG_INFO, "Macro", "nothing recorded yet")
+        return
+    except Exception as exc:
+        _log(LOG_ERROR, "Macro", f"failed to load ({exc})")
         return
-    _refresh_state = {"active": True, "hold": False}
+    _macro_player.play(macro)
+
+
+# ---------------- PROFILES ----------------
+PROFILES_FILE_NAME = "profiles.json"
+PROFILE_CACHE_SIZE = 256  # hwnds whose matched profile is memoized
+
+# Per-application action overrides, first match wins. A rule matches the
+# foreground window on any of "exe", "class" and "title"; each is an exact,
+# case-insensitive string, "glob:<pattern>" or "re:<regex>". "actions" maps a
+# keymap action to the ACTIONS entry to run instead for that window. Rules
+# from profiles.json (a list of the same dicts) are tried before these.
+PROFILE_RULES = [
+    {
+        "name": "browser",
+        "exe": "chrome.exe",
+        "actions": {
+            "refresh": "browser_refresh",
+            "hard_refresh": "browser_hard_refresh",
+            "prev_tab": "browser_prev_tab",
+            "next_tab": "browser_next_tab",
+            "undo": "browser_back",
+            "redo": "browser_forward",
+        },
+    },
+]
+
+
+def _compile_profile_pattern(spec):
+    # -> (is_exact, lowercased string or compiled regex)
+    if spec.startswith("re:"):
+        return False, re.compile(spec[3:])
+    if spec.startswith("glob:"):
+        return False, re.compile(fnmatch.translate(spec[5:]), re.IGNORECASE)
+    return True, spec.lower()
+
+
+def _profile_field_matches(pattern, value: str) -> bool:
+    if pattern is None:
+        return True
+    is_exact, matcher = pattern
+    if is_exact:
+        return value.lower() == matcher
+    return matcher.match(value) is not None
+
+
+class _ProfileRule:
+    __slots__ = ("name", "order", "exe", "cls", "title", "actions")
+
+    def __init__(self, spec: dict, order: int):
+        self.name = spec.get("name") or f"rule {order}"
+        self.order = order
+        self.exe = _compile_profile_pattern(spec["exe"]) if spec.get("exe") else None
+        self.cls = _compile_profile_pattern(spec["class"]) if spec.get("class") else None
+        self.title = _compile_profile_pattern(spec["title"]) if spec.get("title") else None
+        self.actions = dict(spec.get("actions") or {})
+
+    def matches(self, exe: str, cls: str, title: str) -> bool:
+        return (
+            _profile_field_matches(self.exe, exe)
+            and _profile_field_matches(self.cls, cls)
+            and _profile_field_matches(self.title, title)
+        )
+
+
+class _ProfileSet:
+    """Profile rules compiled into a layered lookup with a per-hwnd memo.
+
+    Rules with an exact exe go into a dict keyed by exe name; only the rest
+    are tried as patterns, in rule order, and only up to the first exact
+    candidate that matched. The result is memoized per hwnd (together with
+    the title when any rule looks at titles), so a keypress normally costs a
+    dict hit no matter how many rules exist.
+    """
+
+    def __init__(self, rules, cache_size: int = PROFILE_CACHE_SIZE):
+        self.rules = [_ProfileRule(spec, order) for order, spec in enumerate(rules)]
+        self._by_exe = {}
+        self._patterns = []
+        for rule in self.rules:
+            if rule.exe is not None and rule.exe[0]:
+                self._by_exe.setdefault(rule.exe[1], []).append(rule)
+            else:
+                self._patterns.append(rule)
+        self._uses_title = any(rule.title is not None for rule in self.rules)
+        self._cache_size = max(1, cache_size)
+        self._cache = OrderedDict()  # hwnd -> (title, rule or None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def match(self, exe: str, cls: str, title: str):
+        best = None
+        for rule in self._by_exe.get(exe.lower(), ()):
+            if rule.matches(exe, cls, title):
+                best = rule
+                break
+        for rule in self._patterns:
+            if best is not None and rule.order > best.order:
+                break
+            if rule.matches(exe, cls, title):
+                best = rule
+                break
+        return best
+
+    def for_window(self, hwnd: int, exe):
+        windows = _get_window_backend()
+        title = windows.window_title(hwnd) if self._uses_title else None
+        with self._lock:
+            cached = self._cache.get(hwnd)
+            if cached is not None and cached[0] == title:
+                self._cache.move_to_end(hwnd)
+                self.hits += 1
+                return cached[1]
+        rule = self.match(exe or "", windows.class_name(hwnd), title or "")
+        with self._lock:
+            self.misses += 1
+            self._cache[hwnd] = (title, rule)
+            self._cache.move_to_end(hwnd)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return rule
+
+    def override(self, action_name: str):
+        # -> name of the action to run instead for the foreground window, or None
+        hwnd, _, exe = _get_foreground_tracker().snapshot()
+        if not hwnd:
+            return None
+        rule = self.for_window(hwnd, exe)
+        return rule.actions.get(action_name) if rule is not None else None
+
+    def forget(self, hwnd: int):
+        with self._lock:
+            self._cache.pop(hwnd, None)
+
+    def hwnds(self):
+        with self._lock:
+            return list(self._cache)
+
+    def stats(self) -> dict:
+        return {"rules": len(self.rules), "hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+_profiles = None
+
+
+def _load_profile_rules():
+    rules = []
+    path = _app_data_path(PROFILES_FILE_NAME)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                rules = list(json.load(fh))
+        except Exception as exc:
+            _log(LOG_ERROR, "Profiles", f"failed to load {path} ({exc})")
+            rules = []
+    return rules + PROFILE_RULES
+
+
+def _get_profiles():
+    global _profiles
+    if _profiles is None:
+        with _singletons_lock:
+            if _profiles is None:
+                profiles = _ProfileSet(_load_profile_rules())
+                for rule in profiles.rules:
+                    for name in rule.actions.values():
+                        if name not in ACTIONS:
+                            _log(LOG_WARNING, "Profiles", f"{rule.name} maps to unknown action {name!r}")
+                _get_window_backend().watch_destroyed(profiles.forget, profiles.hwnds)
+                _profiles = profiles
+    return _profiles
+
+
+def _resolve_action(action):
+    # Per-app override for the foreground window, used by the gesture engine
+    name = _get_profiles().override(action.name)
+    return ACTIONS.get(name, action) if name else action
+
+
+# ---------------- KEYMAP ----------------
+MODIFIER_KEY_BITS = {
+    "shift": MOD_SHIFT, "left shift": MOD_SHIFT, "right shift": MOD_SHIFT,
+    "ctrl": MOD_CTRL, "left ctrl": MOD_CTRL, "right ctrl": MOD_CTRL,
+    "alt": MOD_ALT, "left alt": MOD_ALT, "right alt": MOD_ALT, "alt gr": MOD_ALT,
+    "windows": MOD_WIN, "left windows": MOD_WIN, "right windows": MOD_WIN,
+}
+# Same, but telling the Windows keys apart, for chords that release held modifiers
+RELEASE_KEY_BITS = dict(MODIFIER_KEY_BITS, **{"right windows": MOD_RWIN})
+ALL_MODIFIER_MASKS = range((MOD_SHIFT | MOD_CTRL | MOD_ALT | MOD_WIN) + 1)
+GESTURES = ("press", "tap", "hold", "double_tap", "repeat")
+BINDING_OPTIONS = ("repeat_press",)
+
+
+class _Action:
+    """A named action bound to gestures in KEYMAP.
+
+    ``repeat`` (called with the repeat tick number) defaults to ``fn`` for
+    repeat bindings and ``repeat_timing`` is its (initial, interval) delay.
+    ``stepped(n)`` does n steps at once (``run <action> --steps N``); without
+    it ``fn`` runs n times.
+    """
+
+    __slots__ = ("name", "fn", "repeat", "repeat_timing", "stepped")
+
+    def __init__(self, name: str, fn, repeat=None, repeat_timing=None, stepped=None):
+        self.name = name
+        self.fn = fn
+        self.repeat = repeat
+        self.repeat_timing = repeat_timing
+        self.stepped = stepped
+
+
+def _parse_hotkey(hotkey: str):
+    # "ctrl+shift+f13" -> (MOD_CTRL | MOD_SHIFT, "f13")
+    *mods, key = [part.strip().lower() for part in hotkey.split("+")]
+    mask = 0
+    for mod in mods:
+        if mod not in MODIFIER_KEY_BITS:
+            raise ValueError(f"unknown modifier {mod!r} in {hotkey!r}")
+        mask |= MODIFIER_KEY_BITS[mod]
+    return mask, key
+
+
+def _bound_keys(bindings):
+    # Key names that some hotkey uses as its main key, e.g. {"f13", "f14", ...}
+    return frozenset(_parse_hotkey(binding[0])[1] for binding in bindings)
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def _hotkey_rank(mask: int):
+    # More modifiers first; ties go to the higher bit (Win > Alt > Ctrl > Shift)
+    return _popcount(mask), mask
+
+
+class _KeyGestureState:
+    __slots__ = ("down", "gen", "bindings", "consumed", "hold_call", "repeat_call",
+                 "tap_call", "pending_tap")
+
+    def __init__(self):
+        self.down = False
+        self.gen = 0
+        self.bindings = None
+        self.consumed = False
+        self.hold_call = None
+        self.repeat_call = None
+        self.tap_call = None
+        self.pending_tap = None
+
+
+class _GestureEngine:
+    """Per-physical-key state machine for press, tap, hold, double-tap and repeat.
+
+    ``key_down`` receives the gesture -> entry map resolved for the modifiers
+    held at that moment; the matching ``key_up`` and any OS auto-repeat downs
+    use the same map, whatever the modifiers are by then. Auto-repeat downs
+    fire only "repeat_press" entries (a press binding flagged to repeat, so
+    holding F13 keeps cycling) and are ignored by every other gesture, so a
+    held F14 maximizes once. A tap fires on release straight away unless
+    the key also has a double_tap binding, in which case it waits out the
+    double-tap window. Timers run on the shared scheduler; a generation counter
+    per key discards timers that fire after the press they belong to ended.
+    """
+
+    def __init__(self, scheduler=None, metrics=None, hold_sec: float = GESTURE_HOLD_SEC,
+                 double_tap_sec: float = GESTURE_DOUBLE_TAP_SEC, resolve=None):
+        self._scheduler = scheduler
+        self._metrics = metrics
+        self._resolve = resolve  # action -> action to run (per-app profiles)
+        self.hold_sec = hold_sec
+        self.double_tap_sec = double_tap_sec
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _sched(self):
+        return self._scheduler or _get_scheduler()
+
+    def key_down(self, key: str, bindings: dict):
+        fire = []
+        with self._lock:
+            st = self._states.get(key)
+            if st is None:
+                st = self._states[key] = _KeyGestureState()
+            if st.down:
+                # OS auto-repeat: only a press flagged repeat_press fires again, from
+                # the map of the first down; tap/hold/double_tap/repeat ignore it
+                press = st.bindings.get("repeat_press")
+                if press is None:
+                    return
+                fire.append((press, None))
+            else:
+                self._begin(st, key, bindings, fire)
+        for entry, tick in fire:
+            self._fire(entry, tick)
+
+    def _begin(self, st, key: str, bindings: dict, fire: list):
+        # First down of a press; called with the lock held, appends what to fire
+        st.down = True
+        st.gen += 1
+        gen = st.gen
+        st.bindings = bindings
+        st.consumed = False
+
+        if st.tap_call is not None:
+            st.tap_call.cancel()
+            st.tap_call = None
+            if "double_tap" in bindings:
+                st.consumed = True
+                fire.append((bindings["double_tap"], None))
+            else:
+                fire.append((st.pending_tap, None))  # modifiers changed; flush the old tap
+            st.pending_tap = None
+
+        press = bindings.get("press")
+        if press is not None:
+            fire.append((press, None))
+
+        repeat = bindings.get("repeat")
+        if repeat is not None:
+            fire.append((repeat, None))
+            initial, interval = repeat[0].repeat_timing
+            ticks = itertools.count(1)
+            st.repeat_call = self._sched().call_repeating(
+                initial, interval, lambda: self._on_repeat(key, gen, repeat, next(ticks))
+            )
+
+        if "hold" in bindings:
+            st.hold_call = self._sched().call_later(self.hold_sec, lambda: self._on_hold(key, gen))
+
+    def key_up(self, key: str):
+        with self._lock:
+            st = self._states.get(key)
+            if st is None or not st.down:
+                return
+            st.down = False
+            for call in (st.hold_call, st.repeat_call):
+                if call is not None:
+                    call.cancel()
+            st.hold_call = st.repeat_call = None
+            tap = st.bindings.get("tap")
+            if tap is None or st.consumed:
+                return
+            if "double_tap" in st.bindings:
+                gen = st.gen
+                st.pending_tap = tap
+                st.tap_call = self._sched().call_later(self.double_tap_sec, lambda: self._on_tap_timeout(key, gen))
+                return
+        self._fire(tap, None)
+
+    def _on_hold(self, key: str, gen: int):
+        with self._lock:
+            st = self._states[key]
+            if st.gen != gen or not st.down:
+                return
+            st.hold_call = None
+            st.consumed = True
+            entry = st.bindings["hold"]
+        self._fire(entry, None)
+
+    def _on_repeat(self, key: str, gen: int, entry, tick: int):
+        st = self._states[key]
+        if st.gen != gen or not st.down:
+            return
+        self._fire(entry, tick)
+
+    def _on_tap_timeout(self, key: str, gen: int):
+        with self._lock:
+            st = self._states[key]
+            if st.gen != gen or st.tap_call is None:
+                return
+            st.tap_call = None
+            entry, st.pending_tap = st.pending_tap, None
+        self._fire(entry, None)
+
+    def _fire(self, entry, tick):
+        action, slot, repeat_slot = entry
+        if self._resolve is not None:
+            action = self._resolve(action)
+        if tick is None:
+            fn = action.fn
+        else:
+            slot = repeat_slot
+            fn = (lambda: action.repeat(tick)) if action.repeat else action.fn
+        if _logger.level <= LOG_DEBUG:
+            # Skips building the kwargs on every keypress when debug is off
+            _log(LOG_DEBUG, "Keymap", "fire", action=action.name, tick=tick)
+        start = time.perf_counter()
+        error = False
+        try:
+            fn()
+        except Exception as exc:
+            error = True
+            _log(LOG_ERROR, "Keymap", f"{action.name} failed ({exc})")
+        if slot is not None:
+            self._metrics.record(slot, time.perf_counter() - start, error)
+
+
+class _Keymap:
+    """Declarative bindings compiled into one dispatch table for a single hook.
+
+    Every (key, held-modifier mask) pair is resolved at compile time to the
+    gesture map of the most specific hotkey whose modifiers are all held, so an
+    event costs one dict lookup. Equally specific hotkeys (Ctrl+Shift held with
+    only "ctrl+f13" and "shift+f13" bound) are ranked Win, Alt, Ctrl, Shift,
+    so the same one wins regardless of KEYMAP order. Modifier state is tracked from the same event
+    stream instead of querying the keyboard module. Timing (tap/hold/repeat) is
+    left to the gesture engine.
+    """
+
+    def __init__(self, bindings, actions, metrics=None, scheduler=None, resolve=None):
+        self.mods = 0
+        self.held = 0  # like mods, with MOD_RWIN for the right Windows key
+        self._held = {}  # modifier key name -> bit
+        self.tap = None  # optional observer of every event (macro recording)
+        self.gestures = _GestureEngine(scheduler, metrics, resolve=resolve)
+        self.table = self._compile(bindings, actions, metrics)
+        self.keys = frozenset(key for key, _ in self.table)  # keys some hotkey is bound to
+
+    @staticmethod
+    def _compile(bindings, actions, metrics):
+        by_key = {}
+        for hotkey, gesture, action_name, *options in bindings:
+            options = options[0] if options else {}
+            if action_name not in actions:
+                raise ValueError(f"unknown action {action_name!r} for {hotkey!r}")
+            if gesture not in GESTURES:
+                raise ValueError(f"unknown gesture {gesture!r} for {hotkey!r}")
+            for option in options:
+                if option not in BINDING_OPTIONS:
+                    raise ValueError(f"unknown option {option!r} for {hotkey!r}")
+            if options.get("repeat_press") and gesture != "press":
+                raise ValueError(f"repeat_press needs a press binding for {hotkey!r}")
+            action = actions[action_name]
+            if gesture == "repeat" and action.repeat_timing is None:
+                raise ValueError(f"action {action_name!r} has no repeat_timing for {hotkey!r}")
+            mask, key = _parse_hotkey(hotkey)
+            # (action, metric slot, repeat metric slot)
+            entry = (action, None, None)
+            if metrics is not None:
+                entry = (
+                    action,
+                    metrics.slot(action.name),
+                    metrics.slot(action.name + ":repeat") if gesture == "repeat" else None,
+                )
+            gestures = by_key.setdefault(key, {}).setdefault(mask, {})
+            gestures[gesture] = entry
+            if options.get("repeat_press"):
+                gestures["repeat_press"] = entry  # what an auto-repeat down fires
+        table = {}
+        for key, variants in by_key.items():
+            for held in ALL_MODIFIER_MASKS:
+                matches = [mask for mask in variants if mask & held == mask]
+                if matches:
+                    table[(key, held)] = variants[max(matches, key=_hotkey_rank)]
+        return table
+
+    def on_event(self, event):
+        tap = self.tap
+        if tap is not None:
+            tap(event)
+        name = event.name
+        down = event.event_type == "down"
+        if name not in self.keys:
+            # Unbound key (almost all typing): only modifier state can change
+            bit = MODIFIER_KEY_BITS.get(name)
+            if bit is None:
+                return
+            if down:
+                if name in self._held:
+                    return  # auto-repeat of a held modifier
+                self._held[name] = bit
+            else:
+                self._held.pop(name, None)
+            mods = held = 0
+            for held_name, held_bit in self._held.items():
+                mods |= held_bit
+                held |= RELEASE_KEY_BITS[held_name]
+            self.mods = mods
+            self.held = held
+            return
+
+        if down:
+            bindings = self.table.get((name, self.mods))
+            if bindings is not None:
+                self.gestures.key_down(name, bindings)
+        else:
+            self.gestures.key_up(name)
+
+
+TAB_REPEAT = (TAB_REPEAT_INITIAL_SEC, TAB_REPEAT_SEC)
+VOLUME_REPEAT = (VOLUME_REPEAT_INITIAL_SEC, VOLUME_REPEAT_SEC)
+
+ACTIONS = {
+    action.name: action
+    for action in (
+        _Action("cycle_left", _cycle_left),
+        _Action("cycle_right", _cycle_right),
+        _Action("cycle_bottom_heights", _cycle_bottom_heights),
+        _Action("cycle_top_heights", _cycle_top_heights),
+        _Action("maximize", _maximize_restore_active_window),
+        _Action("restore_geometry", _restore_geometry),
+        _Action("refresh", _refresh_tap),
+        _Action("hard_refresh", _refresh_hold),
+        _Action("browser_refresh", _browser_refresh),
+        _Action("browser_hard_refresh", _browser_hard_refresh),
+        _Action("prev_tab", _prev_tab, repeat_timing=TAB_REPEAT),
+        _Action("next_tab", _next_tab, repeat_timing=TAB_REPEAT),
+        _Action("browser_prev_tab", _browser_prev_tab, repeat_timing=TAB_REPEAT),
+        _Action("browser_next_tab", _browser_next_tab, repeat_timing=TAB_REPEAT),
+        _Action("undo", _undo),
+        _Action("redo", _redo),
+        _Action("browser_back", lambda: _browser_nav(back=True)),
+        _Action("browser_forward", lambda: _browser_nav(back=False)),
+        _Action("print_screen", _print_screen),
+        _Action("open_this_pc", _open_this_pc),
+        _Action("toggle_desktop", _toggle_desktop),
+        _Action("volume_down", lambda: _volume_step(up=False), repeat_timing=VOLUME_REPEAT,
+                repeat=lambda tick: _volume_step(False, _volume_accel(tick)),
+                stepped=lambda steps: _volume_step(False, steps)),
+        _Action("volume_up", lambda: _volume_step(up=True), repeat_timing=VOLUME_REPEAT,
+                repeat=lambda tick: _volume_step(True, _volume_accel(tick)),
+                stepped=lambda steps: _volume_step(True, steps)),
+        _Action("app_volume_down", lambda: _app_volume_step(up=False), repeat_timing=VOLUME_REPEAT,
+                repeat=lambda tick: _app_volume_step(False, _volume_accel(tick)),
+                stepped=lambda steps: _app_volume_step(False, steps)),
+        _Action("app_volume_up", lambda: _app_volume_step(up=True), repeat_timing=VOLUME_REPEAT,
+                repeat=lambda tick: _app_volume_step(True, _volume_accel(tick)),
+                stepped=lambda steps: _app_volume_step(True, steps)),
+        _Action("desktop_left", lambda: _switch_virtual_desktop(back=True)),
+        _Action("desktop_right", lambda: _switch_virtual_desktop(back=False)),
+        _Action("macro_record", _macro_record_toggle),
+        _Action("macro_play", _macro_play_toggle),
+        _Action("prev_zone", _prev_zone),
+        _Action("snap_to_zone", _snap_to_zone),
+        _Action("next_zone", _next_zone),
+        _Action("next_monitor", _move_to_next_monitor),
+        _Action("tile_columns", _tile_columns_action),
+        _Action("tile_main_stack", _tile_main_stack_action),
+        _Action("tile_grid", _tile_grid_action),
+        _Action("save_workspace", _save_workspace_action),
+        _Action("restore_workspace", _restore_workspace_action),
+        _Action("last_window", _last_window),
+        _Action("next_app_window", _next_app_window),
+    )
+}
+
+
+TRACE_OTHER_KEY = "other"  # stands in for every key that isn't bound or a modifier
+
+
+class _TraceRecorder:
+    """Writes hook events as "seconds,event_type,name" lines for bench.py replay.
+
+    Only bound keys and modifiers are written by name; every other key (so
+    anything typed, passwords included) is recorded as TRACE_OTHER_KEY,
+    which keeps its timing for the replay without its identity.
+    """
+
+    def __init__(self, path: str):
+        self._fh = open(path, "w", encoding="utf-8")
+        self._t0 = time.perf_counter()
+
+    def wrap(self, dispatch, keys):
+        keys = frozenset(keys) | frozenset(MODIFIER_KEY_BITS)
+
+        def _on_event(event):
+            name = event.name if event.name in keys else TRACE_OTHER_KEY
+            self._fh.write(f"{time.perf_counter() - self._t0:.6f},{event.event_type},{name}\n")
+            dispatch(event)
+
+        return _on_event
+
+    def close(self):
+        self._fh.close()
+
+
+def _install_keymap(recorder=None):
+    global _keymap
+    _keymap = _Keymap(KEYMAP, ACTIONS, _metrics, resolve=_resolve_action)
+    dispatch = _keymap.on_event
+    if recorder is not None:
+        dispatch = recorder.wrap(dispatch, _bound_keys(KEYMAP))
+    keyboard.hook(dispatch)
+    return _keymap
+
+
+# ---------------- SINGLE INSTANCE / IPC ----------------
+INSTANCE_MUTEX_NAME = "Local\\MMO Deck"
+INSTANCE_LOCK_NAME = "instance.lock"
+IPC_PIPE_NAME = r"\\.\pipe\MMO Deck"
+IPC_SOCKET_NAME = "mmo-deck.sock"
+IPC_TIMEOUT_SEC = 2.0
+IPC_COMMANDS = ("run", "focus", "workspace", "show", "ping", "actions")
+IPC_MAX_STEPS = 100  # a run request repeats its action at most this often
+IPC_REPLY_TIMEOUT_SEC = 1.0  # a deferred reply waits this long (under the client timeout)
+ERROR_ALREADY_EXISTS = 183
+PIPE_REJECT_REMOTE_CLIENTS = 0x8
+FILE_FLAG_FIRST_PIPE_INSTANCE = 0x00080000
+
+
+class _InstanceLock:
+    """Single-instance guard: a named mutex on Windows, an flock'ed file elsewhere."""
+
+    def __init__(self):
+        self._handle = None
+        self._kernel32 = None
+
+    def acquire(self) -> bool:
+        if sys.platform == "win32":
+            # ctypes can clobber GetLastError between calls; use its saved copy
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            kernel32.CreateMutexW.restype = wintypes.HANDLE
+            kernel32.CreateMutexW.argtypes = (ctypes.c_void_p, wintypes.BOOL, wintypes.LPCWSTR)
+            kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+            handle = kernel32.CreateMutexW(None, False, INSTANCE_MUTEX_NAME)
+            if not handle or ctypes.get_last_error() == ERROR_ALREADY_EXISTS:
+                if handle:
+                    kernel32.CloseHandle(handle)
+                return False
+            self._kernel32 = kernel32
+            self._handle = handle
+            return True
+        import fcntl
+        fh = open(_app_data_path(INSTANCE_LOCK_NAME), "w")
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._handle = fh
+        return True
+
+    def release(self):
+        if self._handle is None:
+            return
+        if sys.platform == "win32":
+            self._kernel32.CloseHandle(self._handle)
+        else:
+            self._handle.close()
+        self._handle = None
+
+
+def _ipc_address():
+    return IPC_PIPE_NAME if sys.platform == "win32" else _app_data_path(IPC_SOCKET_NAME)
+
+
+class _IpcConnection:
+    """Newline-delimited JSON over a connected pipe handle or Unix socket."""
+
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+        self._pipe = sys.platform == "win32"
+        self._buffer = b""
+
+    def _recv(self) -> bytes:
+        if self._pipe:
+            import win32file
+            try:
+                _, data = win32file.ReadFile(self._endpoint, 4096)
+            except Exception:
+                return b""  # ERROR_BROKEN_PIPE: the other end went away
+            return data
+        return self._endpoint.recv(4096)
+
+    def read(self):
+        while b"\n" not in self._buffer:
+            data = self._recv()
+            if not data:
+                return None
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def write(self, message: dict):
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        if self._pipe:
+            import win32file
+            win32file.WriteFile(self._endpoint, data)
+        else:
+            self._endpoint.sendall(data)
+
+    def close(self):
+        try:
+            if self._pipe:
+                import win32file
+                win32file.CloseHandle(self._endpoint)
+            else:
+                self._endpoint.close()
+        except Exception:
+            pass
+
+
+class _IpcServer:
+    """Accepts local connections and answers each JSON request with ``handler``.
+
+    Listens on a named pipe on Windows and a Unix socket elsewhere. Each
+    client gets a daemon thread and may send any number of requests over one
+    connection, which is what keeps round trips well under a millisecond.
+    The first pipe instance is created with FILE_FLAG_FIRST_PIPE_INSTANCE, so
+    if another process already owns the name the server fails to start
+    instead of sharing it.
+    """
+
+    def __init__(self, handler, address=None):
+        self._handler = handler
+        self.address = address or _ipc_address()
+        self._sock = None
+        self._thread = None
+        self._closed = False
+        self._first_instance = True
+
+    def start(self):
+        if sys.platform != "win32":
+            import socket
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # stale: whoever left it no longer holds the instance lock
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.bind(self.address)
+            self._sock.listen(8)
+        self._thread = threading.Thread(target=self._accept_loop, name="ipc", daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        if self._sock is not None:
+            sock, _ = self._sock.accept()
+            return _IpcConnection(sock)
+        import win32pipe
+        open_mode = win32pipe.PIPE_ACCESS_DUPLEX
+        if self._first_instance:
+            open_mode |= FILE_FLAG_FIRST_PIPE_INSTANCE
+        try:
+            handle = win32pipe.CreateNamedPipe(
+                self.address,
+                open_mode,
+                win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_READMODE_BYTE | win32pipe.PIPE_WAIT
+                | PIPE_REJECT_REMOTE_CLIENTS,
+                win32pipe.PIPE_UNLIMITED_INSTANCES, 4096, 4096, 0, None,
+            )
+        except Exception as exc:
+            if self._first_instance:
+                # Another process created the pipe first; don't serve alongside it
+                _log(LOG_ERROR, "IPC", f"{self.address} is already in use ({exc})")
+                self._closed = True
+            raise
+        self._first_instance = False
+        try:
+            win32pipe.ConnectNamedPipe(handle, None)
+        except Exception as exc:
+            # ERROR_PIPE_CONNECTED: the client won the race, the pipe is usable
+            if getattr(exc, "winerror", None) != 535:
+                import win32file
+                win32file.CloseHandle(handle)
+                raise
+        return _IpcConnection(handle)
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self._accept()
+            except Exception as exc:
+                if not self._closed:
+                    _log(LOG_ERROR, "IPC", f"accept failed ({exc})")
+                    time.sleep(0.1)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="ipc-client", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                request = conn.read()
+                if request is None:
+                    return
+                try:
+                    reply = _settle_reply(self._handler(request))
+                except Exception as exc:
+                    reply = {"ok": False, "error": str(exc)}
+                conn.write(reply)
+        except Exception as exc:
+            _log(LOG_ERROR, "IPC", f"client failed ({exc})")
+        finally:
+            conn.close()
+
+    def close(self):
+        self._closed = True
+        if self._sock is not None:
+            try:
+                self._sock.close()
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+
+class _IpcClient:
+    """Persistent connection to the running instance's IPC server."""
+
+    def __init__(self, address=None, timeout: float = IPC_TIMEOUT_SEC):
+        address = address or _ipc_address()
+        if sys.platform == "win32":
+            import win32file
+            import win32pipe
+            win32pipe.WaitNamedPipe(address, int(timeout * 1000))
+            handle = win32file.CreateFile(
+                address, win32file.GENERIC_READ | win32file.GENERIC_WRITE, 0, None,
+                win32file.OPEN_EXISTING, 0, None,
+            )
+            self._conn = _IpcConnection(handle)
+        else:
+            import socket
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(address)
+            self._conn = _IpcConnection(sock)
+
+    def request(self, message: dict) -> dict:
+        self._conn.write(message)
+        reply = self._conn.read()
+        if reply is None:
+            raise ConnectionError("instance closed the connection")
+        return reply
+
+    def close(self):
+        self._conn.close()
+
+
+def _ipc_request(message: dict, address=None) -> dict:
+    client = _IpcClient(address)
+    try:
+        return client.request(message)
+    finally:
+        client.close()
+
+
+def _request_show():
+    # Tk calls must happen on the Tk thread; headless mode starts its own
+    if _root is not None and not _headless:
+        _root.after(0, _show_window)
+    else:
+        _show_window()
+
 
-    def _hold_action():
-        # If still active when timer fires, treat as hold
-        if _refresh_state.get("active"):
-            _refresh_state["hold"] = True
-            _refresh_hold()
+def _deferred_reply(future: Future, make_reply) -> Future:
+    # -> Future of make_reply(result), for a request that finishes on another thread
+    reply = Future()
+
+    def _done(done):
+        if not reply.set_running_or_notify_cancel():
+            return  # the caller stopped waiting
+        if done.cancelled():
+            reply.set_result({"ok": False, "error": "replaced by a later request"})
+        elif done.exception() is not None:
+            reply.set_result({"ok": False, "error": str(done.exception())})
+        else:
+            try:
+                reply.set_result(make_reply(done.result()))
+            except Exception as exc:
+                reply.set_result({"ok": False, "error": str(exc)})
 
-    timer = threading.Timer(REFRESH_HOLD_THRESHOLD_SEC, _hold_action)
-    _refresh_state["timer"] = timer
-    timer.start()
+    future.add_done_callback(_done)
+    return reply
 
 
-def _refresh_release(name: str):
-    global _refresh_state
-    state = _refresh_state if isinstance(_refresh_state, dict) else {}
-    timer = state.get("timer")
-    if timer:
-        timer.cancel()
-    if state.get("active") and not state.get("hold"):
-        _refresh_tap()
-    _refresh_state = {}
+def _settle_reply(reply) -> dict:
+    # Waits on the caller's thread for a reply the handler deferred to a Future
+    if not isinstance(reply, Future):
+        return reply
+    try:
+        return reply.result(IPC_REPLY_TIMEOUT_SEC)
+    except FutureTimeoutError:
+        reply.cancel()
+        return {"ok": False, "error": "timed out"}
+
+
+def _handle_ipc_request(request: dict):
+    # -> reply dict, or a Future of one when the work finishes on another thread
+    cmd = request.get("cmd")
+    if cmd == "ping":
+        return {"ok": True, "pid": os.getpid()}
+    if cmd == "actions":
+        return {"ok": True, "actions": sorted(ACTIONS)}
+    if cmd == "show":
+        _request_show()
+        return {"ok": True}
+    if cmd == "focus":
+        exe = request.get("exe") or ""
+        if not _focus_app(exe):
+            return {"ok": False, "error": f"no window of {exe!r}"}
+        return {"ok": True}
+    if cmd == "workspace":
+        op = request.get("op")
+        name = request.get("name") or WORKSPACE_DEFAULT_NAME
+        if op == "list":
+            return {"ok": True, "workspaces": _get_workspaces().names()}
+        # Built on the window worker, so these reply with a Future
+        if op == "save":
+            return _deferred_reply(_capture_workspace(name),
+                                   lambda _: {"ok": True, "windows": len(_get_workspaces().get(name).entries)})
+        if op == "restore":
+            moves = _restore_workspace(name)
+            if moves is None:
+                return {"ok": False, "error": f"no workspace {name!r}"}
+            return _deferred_reply(moves, lambda moves: {"ok": True, "windows": len(moves or ())})
+        return {"ok": False, "error": f"unknown workspace op {op!r}"}
+    if cmd == "run":
+        name = request.get("action")
+        action = ACTIONS.get(name)
+        if action is None:
+            return {"ok": False, "error": f"unknown action {name!r}"}
+        steps = min(IPC_MAX_STEPS, max(1, int(request.get("steps") or 1)))
+        # Run on the scheduler thread, like key repeats; the reply doesn't wait for it
+        _get_scheduler().call_later(0, lambda: _run_action(action, steps))
+        return {"ok": True, "action": name}
+    return {"ok": False, "error": f"unknown command {cmd!r}"}
+
+
+def _run_action(action, steps: int):
+    # Same per-app resolution as a keypress
+    action = _resolve_action(action)
+    if action.stepped is not None:
+        action.stepped(steps)
+    else:
+        for _ in range(steps):
+            action.fn()
+
+
+def _run_cli(command, steps: int) -> int:
+    cmd, rest = command[0], command[1:]
+    request = {"cmd": cmd}
+    if cmd == "run":
+        if not rest:
+            print("usage: run <action> [--steps N]")
+            return 2
+        request.update(action=rest[0], steps=steps)
+    elif cmd == "focus":
+        if not rest:
+            print("usage: focus <exe>")
+            return 2
+        request.update(exe=rest[0])
+    elif cmd == "workspace":
+        if not rest or rest[0] not in ("save", "restore", "list"):
+            print("usage: workspace save|restore [name] | workspace list")
+            return 2
+        request.update(op=rest[0], name=rest[1] if len(rest) > 1 else None)
+    try:
+        reply = _ipc_request(request)
+    except Exception as exc:
+        print(f"{APP_NAME} is not running ({exc})")
+        return 2
+    if not reply.get("ok"):
+        print(f"Error: {reply.get('error')}")
+        return 1
+    if cmd == "actions":
+        print("\n".join(reply["actions"]))
+    elif cmd == "workspace":
+        print("\n".join(reply["workspaces"]) if "workspaces" in reply else f"{reply['windows']} windows")
+    elif cmd == "ping":
+        print(f"{APP_NAME} is running (pid {reply['pid']})")
+    return 0
+
+
+# ---------------- WEBSOCKET ----------------
+WS_HOST = "127.0.0.1"  # local only; put a reverse proxy in front to reach it from a phone
+WS_DEFAULT_PORT = 8765
+WS_START_TIMEOUT_SEC = 5.0
+WS_MAX_BATCH = 64
+WS_MAX_MESSAGE_BYTES = 64 * 1024
+WS_TOKEN_FILE_NAME = "websocket.token"
+WS_AUTH_TIMEOUT_SEC = 5.0
+WS_POLICY_VIOLATION = 1008  # close code for a missing or wrong token
+# Browser pages allowed to connect, e.g. "http://localhost:3000". Clients that
+# send no Origin (native apps, scripts) are let through to the token check.
+WS_ALLOWED_ORIGINS = ()
+
+_state_hub = None
+
+
+class _StateHub:
+    """Latest value of each pushed state key ("volume", "foreground").
+
+    publish() runs on whichever thread saw the change (scheduler, COM,
+    WinEvent) and only swaps a dict entry and pokes listeners, so it never
+    waits on a subscriber.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._listeners = ()
+        self.published = 0
+
+    def publish(self, key: str, value):
+        with self._lock:
+            if key in self._values and self._values[key] == value:
+                return
+            self._values[key] = value
+            self.published += 1
+            listeners = self._listeners
+        for listener in listeners:
+            listener(key)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners += (listener,)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            self._listeners = tuple(fn for fn in self._listeners if fn is not listener)
+
+
+def _publish_state(key: str, value):
+    hub = _state_hub
+    if hub is not None:
+        hub.publish(key, value)
+
+
+def _ws_token() -> str:
+    # Per-install secret a client sends first; created on first use, owner-only
+    path = _app_data_path(WS_TOKEN_FILE_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            token = fh.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(token)
+    return token
+
+
+def _profile_name_for(hwnd, exe):
+    if not hwnd:
+        return None
+    rule = _get_profiles().for_window(hwnd, exe)
+    return rule.name if rule is not None else None
+
+
+class _WsClient:
+    __slots__ = ("socket", "dirty", "wake", "pushes")
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.dirty = set()
+        self.wake = asyncio.Event()
+        self.pushes = 0
+
+
+class _WebSocketServer:
+    """Optional local control surface: runs actions and pushes state changes.
+
+    Runs its own asyncio loop on a daemon thread. A browser page can reach
+    127.0.0.1 too, so connections with an Origin outside ``origins`` are
+    refused at the handshake, and the first message must be
+    ``{"token": ...}`` matching the per-install secret (see _ws_token).
+    After that, messages are the IPC commands (see _handle_ipc_request) or
+    ``{"batch": [...]}`` of them, with an optional "id" echoed in the reply.
+    Commands run on the scheduler thread; the loop only awaits the result,
+    so a slow action never stalls other clients. Deriving pushed state (the
+    profile queries the foreground window's class and title) runs on one
+    helper thread for the same reason. State is coalesced: a publishing
+    thread only marks keys dirty and schedules one wake-up on the loop, and
+    each client's sender sends the latest values for whatever changed since
+    its previous send, so a slow client gets fewer, newer updates instead of
+    a growing queue.
+    """
+
+    def __init__(self, hub, handler, host: str = WS_HOST, port: int = WS_DEFAULT_PORT,
+                 token: str = None, origins=WS_ALLOWED_ORIGINS, scheduler=None):
+        self._hub = hub
+        self._handler = handler
+        self.host = host
+        self.port = port
+        self._token = token
+        self.origins = tuple(origins)
+        self._scheduler = scheduler
+        self._clients = set()
+        self._loop = None
+        self._thread = None
+        # One thread, so derivations finish in the order they were queued
+        self._deriver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="websocket-derive")
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._wake_pending = False
+        self._state = {}
+        self.commands = 0
+        self.fanouts = 0
+        self.rejected = 0
+
+    def start(self):
+        if not _ensure_subsystem("websocket"):
+            raise RuntimeError("websockets is not installed (pip install websockets)")
+        if self._token is None:
+            self._token = _ws_token()
+        self._state = self._derive(self._hub.snapshot())
+        ready = Future()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="websocket", daemon=True)
+        self._thread.start()
+        ready.result(timeout=WS_START_TIMEOUT_SEC)  # re-raises bind errors here
+        self._hub.subscribe(self._on_state)
+
+    def close(self):
+        self._hub.unsubscribe(self._on_state)
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=WS_START_TIMEOUT_SEC)
+        self._deriver.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "commands": self.commands,
+            "fanouts": self.fanouts,
+            "rejected": self.rejected,
+            "published": self._hub.published,
+        }
+
+    def _run(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(self._listen())
+        except Exception as exc:
+            loop.close()
+            ready.set_exception(exc)
+            return
+        self.port = server.sockets[0].getsockname()[1]  # resolves port 0
+        self._loop = loop
+        ready.set_result(None)
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+
+    async def _listen(self):
+        # serve() must be created with the loop running
+        # None in origins admits clients that send no Origin header
+        return await websockets.serve(self._serve_client, self.host, self.port, max_size=WS_MAX_MESSAGE_BYTES,
+                                      origins=[None, *self.origins])
+
+    def _on_state(self, key: str):
+        # Publisher thread: at most one wake-up in flight however fast keys change
+        with self._lock:
+            self._dirty.add(key)
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        asyncio.run_coroutine_threadsafe(self._fan_out(), self._loop)
+
+    async def _fan_out(self):
+        with self._lock:
+            keys, self._dirty = self._dirty, set()
+            self._wake_pending = False
+        values = self._hub.snapshot()
+        # Window queries can block on a hung window; keep them off the loop
+        changed = await self._loop.run_in_executor(self._deriver, self._derive,
+                                                   {key: values[key] for key in keys})
+        self._state.update(changed)
+        self.fanouts += 1
+        for client in self._clients:
+            client.dirty.update(changed)
+            client.wake.set()
+
+    def _derive(self, values: dict) -> dict:
+        # Published values -> client-facing state; the profile follows the foreground window
+        state = {}
+        if "volume" in values:
+            state["volume"] = values["volume"]
+        if "foreground" in values:
+            hwnd, exe = values["foreground"]
+            state["foreground"] = exe
+            state["profile"] = _profile_name_for(hwnd, exe)
+        return state
+
+    def _dispatch(self, raw):
+        # -> (message, reply); a batch replies with a list, and any reply may be a Future
+        try:
+            message = json.loads(raw)
+        except ValueError as exc:
+            return None, {"ok": False, "error": f"bad json ({exc})"}
+        if not isinstance(message, dict):
+            return None, {"ok": False, "error": "expected an object"}
+        batch = message.get("batch")
+        if batch is None:
+            return message, self._run_command(message)
+        if not isinstance(batch, list) or len(batch) > WS_MAX_BATCH:
+            return message, {"ok": False, "error": f"batch must be a list of at most {WS_MAX_BATCH} commands"}
+        return message, [self._run_command(command) for command in batch]
+
+    async def _reply(self, message, reply) -> dict:
+        # Deferred replies are awaited here on the loop, never on the scheduler
+        if isinstance(reply, list):
+            results = [await self._settle(result) for result in reply]
+            reply = {"ok": all(result.get("ok") for result in results), "results": results}
+        else:
+            reply = await self._settle(reply)
+        reply["type"] = "reply"
+        if message is not None and "id" in message:
+            reply["id"] = message["id"]
+        return reply
+
+    async def _settle(self, reply) -> dict:
+        if not isinstance(reply, Future):
+            return reply
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(reply), IPC_REPLY_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": "timed out"}
+
+    def _run_command(self, command) -> dict:
+        self.commands += 1
+        if not isinstance(command, dict):
+            return {"ok": False, "error": "expected an object"}
+        try:
+            return self._handler(command)
+        except Exception as exc:
+            return {"ok": False, "error": str(exc)}
+
+    async def _push_state(self, client):
+        while True:
+            await client.wake.wait()
+            client.wake.clear()
+            keys, client.dirty = client.dirty, set()
+            state = {key: self._state.get(key) for key in keys}
+            await client.socket.send(json.dumps({"type": "state", "state": state}))
+            client.pushes += 1
+
+    def _on_scheduler(self, fn, *args) -> Future:
+        future = Future()
+
+        def _run():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        (self._scheduler or _get_scheduler()).call_later(0, _run)
+        return future
+
+    async def _authenticate(self, socket) -> bool:
+        try:
+            first = json.loads(await asyncio.wait_for(socket.recv(), WS_AUTH_TIMEOUT_SEC))
+        except (asyncio.TimeoutError, ValueError, websockets.ConnectionClosed):
+            first = None
+        token = first.get("token") if isinstance(first, dict) else None
+        if isinstance(token, str) and hmac.compare_digest(token.encode("utf-8"), self._token.encode("utf-8")):
+            return True
+        self.rejected += 1
+        await socket.close(WS_POLICY_VIOLATION, "token required")
+        return False
+
+    async def _serve_client(self, socket, *_):
+        # *_: older websockets releases also pass the request path
+        if not await self._authenticate(socket):
+            return
+        client = _WsClient(socket)
+        await socket.send(json.dumps({"type": "hello", "actions": sorted(ACTIONS), "state": self._state}))
+        self._clients.add(client)
+        pusher = asyncio.ensure_future(self._push_state(client))
+        try:
+            async for message in socket:
+                message, reply = await asyncio.wrap_future(self._on_scheduler(self._dispatch, message))
+                await socket.send(json.dumps(await self._reply(message, reply)))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(client)
+            pusher.cancel()
 
 
 def _hide_window(auto: bool = False):
+    if _headless:
+        # Runs on the UI thread; leaving mainloop tears the window down
+        if _root:
+            _root.quit()
+        return
     if _root:
         # On auto-hide, don't disappear if tray isn't available
-        if auto and not (pystray and Image):
-            print("Tray icon not available (pystray/Pillow missing); keeping window visible.")
+        if auto and not _tray_available():
+            _log(LOG_WARNING, "Tray", "icon not available (pystray/Pillow missing); keeping window visible")
             return
         _root.withdraw()  # hide from taskbar
-        if pystray and Image:
+        if _tray_available():
             _start_tray()
         else:
-            print("Tray icon not available (pystray/Pillow missing); window hidden.")
+            _log(LOG_WARNING, "Tray", "icon not available (pystray/Pillow missing); window hidden")
+
+
+def _run_settings_window():
+    # Headless mode: the Tk root lives on this thread only while the window is
+    # shown. Closing it frees the widgets, but the Tcl/Tk libraries stay loaded.
+    global _root, _metrics_window
+    try:
+        _build_gui().mainloop()
+    except Exception as exc:
+        _log(LOG_ERROR, "GUI", f"settings window failed ({exc})")
+    finally:
+        if _root is not None:
+            try:
+                _root.destroy()
+            except Exception:
+                pass
+        _root = None
+        _metrics_window = None
 
 
 def _show_window():
-    global _tray_icon
+    global _tray_icon, _ui_thread
+    if _headless:
+        if _ui_thread is None or not _ui_thread.is_alive():
+            _ui_thread = threading.Thread(target=_run_settings_window, name="settings-ui", daemon=True)
+            _ui_thread.start()
+        return
     if _root:
         _root.deiconify()
         _root.lift()
@@ -852,14 +6121,27 @@ def _show_window():
         _tray_icon = None
 
 
+def _quit_app():
+    _quit_event.set()
+    if _root:
+        _root.quit()
+
+
+def _on_console_ctrl(ctrl_type) -> bool:
+    # Ctrl+C/Ctrl+Break/console close in --headless; runs on a thread the OS creates
+    _quit_event.set()
+    return True
+
+
 def _tray_quit(icon, item):
+    _quit_event.set()
     if _root:
         _root.after(0, _root.quit)
 
 
 def _start_tray():
     global _tray_icon
-    if _tray_icon or not pystray or not Image:
+    if _tray_icon or not _tray_available():
         return
 
     def on_show(icon, item):
@@ -868,9 +6150,24 @@ def _start_tray():
     def on_quit(icon, item):
         _tray_quit(icon, item)
 
+    def on_dump_metrics(icon, item):
+        _dump_metrics()
+
+    def log_level_item(name):
+        return pystray.MenuItem(
+            name.capitalize(),
+            lambda icon, item: _set_log_level(name),
+            checked=lambda item: _logger.level == LOG_LEVELS[name],
+            radio=True,
+        )
+
     image = _create_tray_image()
     _tray_icon = pystray.Icon(APP_NAME, image, APP_NAME, menu=pystray.Menu(
         pystray.MenuItem("Show", on_show, default=True),  # double-click default
+        pystray.MenuItem("Dump metrics", on_dump_metrics),
+        pystray.MenuItem("Log level", pystray.Menu(*(log_level_item(name) for name in LOG_LEVELS))),
+        pystray.MenuItem("Animate snaps", lambda icon, item: _set_animate_snaps(not _animate_snaps),
+                         checked=lambda item: _animate_snaps),
         pystray.MenuItem("Quit", on_quit),
     ))
     threading.Thread(target=_tray_icon.run, daemon=True).start()
@@ -878,17 +6175,69 @@ def _start_tray():
 
 def _auto_hide_on_start():
     # Hide to tray right after launch if tray is available
-    if pystray and Image:
+    if _tray_available():
         _hide_window(auto=True)
     else:
-        print("Startup: tray dependencies missing; window will stay visible.")
+        _log(LOG_WARNING, "Startup", "tray dependencies missing; window will stay visible")
+
+
+METRICS_COLUMNS = ("count", "errors", "p50_us", "p95_us", "p99_us", "max_us")
+METRICS_REFRESH_MS = 1000
+
+
+def _show_metrics_window():
+    global _metrics_window
+    if _metrics_window is not None and _metrics_window.winfo_exists():
+        _metrics_window.deiconify()
+        _metrics_window.lift()
+        return
+
+    win = tk.Toplevel(_root)
+    win.title(f"{APP_NAME} Metrics")
+    win.geometry("620x320")
+    _metrics_window = win
+
+    tree = ttk.Treeview(win, columns=METRICS_COLUMNS, show="tree headings")
+    tree.heading("#0", text="action")
+    tree.column("#0", width=170)
+    for col in METRICS_COLUMNS:
+        tree.heading(col, text=col)
+        tree.column(col, width=70, anchor="e")
+    tree.pack(fill="both", expand=True, padx=8, pady=8)
+    queue_var = tk.StringVar()
+    ttk.Label(win, textvariable=queue_var).pack(anchor="w", padx=8)
+    ttk.Button(win, text="Dump JSON", command=_dump_metrics).pack(fill="x", padx=8, pady=(0, 8))
+
+    def _refresh():
+        if not win.winfo_exists():
+            return
+        tree.delete(*tree.get_children())
+        for name, stats in _metrics.snapshot().items():
+            tree.insert("", "end", text=name, values=[stats[col] for col in METRICS_COLUMNS])
+        if _window_worker is not None:
+            q = _window_worker.stats()
+            queue_var.set(
+                f"Window queue: depth {q['depth']} (peak {q['peak_depth']}), "
+                f"{q['applied']} moves, {q['coalesced']} coalesced "
+                f"(action rows time the enqueue; {WINDOW_MOVE_METRIC} times the move)"
+            )
+            if _window_animator is not None:
+                a = _window_animator.stats()
+                queue_var.set(
+                    f"{queue_var.get()}; animations {a['completed']} at {a['hz']}Hz, "
+                    f"{a['frames']} frames, {a['dropped']} dropped"
+                )
+        win.after(METRICS_REFRESH_MS, _refresh)
+
+    _refresh()
 
 
 def _build_gui():
     global _root
+    _ensure_subsystem("tk")
     _root = tk.Tk()
     _root.title(APP_NAME)
-    _root.geometry("360x230")
+    _root.geometry("360x270")
     _root.protocol("WM_DELETE_WINDOW", _hide_window)
 
     frame = ttk.Frame(_root, padding=12)
@@ -899,65 +6248,168 @@ def _build_gui():
     ttk.Button(frame, text="Hide to tray", command=_hide_window).pack(fill="x", pady=4)
     ttk.Button(frame, text="Add to Startup", command=_add_to_startup).pack(fill="x", pady=4)
     ttk.Button(frame, text="Remove from Startup", command=_remove_from_startup).pack(fill="x", pady=4)
-    ttk.Button(frame, text="Quit", command=_root.quit).pack(fill="x", pady=12)
+    ttk.Button(frame, text="Metrics", command=_show_metrics_window).pack(fill="x", pady=4)
+    ttk.Button(frame, text="Quit", command=_quit_app).pack(fill="x", pady=12)
 
     return _root
 
 
-def main():
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog=APP_NAME)
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print per-phase startup timings")
+    parser.add_argument("--record-trace", metavar="PATH",
+                        help="record hotkey/modifier events (other keys anonymized) to PATH for bench.py trace replay")
+    parser.add_argument("--headless", action="store_true",
+                        help="run from the tray only; Tk is loaded when the window is shown")
+    parser.add_argument("--log-level", choices=tuple(LOG_LEVELS), default="info",
+                        help=f"initial verbosity (switchable from the tray); logs go to {LOG_FILE_NAME}")
+    parser.add_argument("--animate", action="store_true",
+                        help="slide windows to their snap target, paced to the display refresh rate")
+    parser.add_argument("--websocket", metavar="PORT", type=int, nargs="?", const=WS_DEFAULT_PORT,
+                        help=f"serve actions and live state over ws://{WS_HOST}:PORT (default {WS_DEFAULT_PORT})")
+    parser.add_argument("command", nargs="*",
+                        help="send to the running instance: run <action> | focus <exe> | workspace ... | show | ping | actions")
+    parser.add_argument("--steps", type=int, default=1, help="repeat count for run")
+    # The startup shortcut passes the script/exe path; ignore stray arguments
+    args, _ = parser.parse_known_args(argv)
+    start = next((i for i, word in enumerate(args.command) if word in IPC_COMMANDS), None)
+    args.command = args.command[start:] if start is not None else []
+    return args
+
+
+def _timed_phase(name: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    _record_phase(name, time.perf_counter() - start)
+    return result
+
+
+def _run_headless(startup_report: bool, prewarm):
+    _timed_phase("tray start", _start_tray)
+    if _tray_icon is None:
+        print("Headless: tray dependencies missing; press Ctrl+C to quit.")
+    if startup_report:
+        prewarm.join()
+        _print_startup_report()
+    # Hooks, timers and COM all run on their own threads; the main thread just
+    # blocks until Quit. Ctrl+C can't interrupt an untimed wait on Windows, so
+    # a console control handler sets the event instead.
+    if win32api is not None:
+        win32api.SetConsoleCtrlHandler(_on_console_ctrl, True)
+    _quit_event.wait()
+
+
+def main(argv=None):
+    global _headless, _state_hub
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command:
+        return _run_cli(args.command, args.steps)
+
+    lock = _InstanceLock()
+    if not lock.acquire():
+        # Second launch (e.g. startup shortcut plus a manual start): no second hook
+        print(f"{APP_NAME} is already running; showing its window.")
+        try:
+            _ipc_request({"cmd": "show"})
+        except Exception as exc:
+            print(f"IPC: could not reach the running instance ({exc})")
+        return 0
+    _headless = args.headless
+    _set_log_level(args.log_level)
+    if args.animate:
+        _set_animate_snaps(True)
+    _logger.start(_app_data_path(LOG_FILE_NAME))
     prev_state = _prevent_sleep()
-
-    keyboard.on_press_key(LEFT_HOTKEY, lambda e: _cycle_bottom_heights() if keyboard.is_pressed("shift") else _cycle_left())
-    keyboard.on_press_key(MAX_HOTKEY, lambda e: _maximize_press(MAX_HOTKEY))
-    keyboard.on_release_key(MAX_HOTKEY, lambda e: _maximize_release(MAX_HOTKEY))
-    keyboard.on_press_key(RIGHT_HOTKEY, lambda e: _cycle_top_heights() if keyboard.is_pressed("shift") else _cycle_right())
-
-    keyboard.on_press_key(REFRESH_HOTKEY, lambda e: _refresh_press(REFRESH_HOTKEY))
-    keyboard.on_release_key(REFRESH_HOTKEY, lambda e: _refresh_release(REFRESH_HOTKEY))
-    keyboard.on_press_key(PREV_TAB_HOTKEY, lambda e: _tab_press(PREV_TAB_HOTKEY, shift=True))
-    keyboard.on_release_key(PREV_TAB_HOTKEY, lambda e: _tab_release(PREV_TAB_HOTKEY))
-    keyboard.on_press_key(NEXT_TAB_HOTKEY, lambda e: _tab_press(NEXT_TAB_HOTKEY, shift=False))
-    keyboard.on_release_key(NEXT_TAB_HOTKEY, lambda e: _tab_release(NEXT_TAB_HOTKEY))
-    keyboard.on_press_key(PRINT_SCREEN_HOTKEY, lambda e: _print_screen())
-    keyboard.on_press_key(OPEN_THIS_PC_HOTKEY, lambda e: _open_this_pc_press(OPEN_THIS_PC_HOTKEY))
-    keyboard.on_release_key(OPEN_THIS_PC_HOTKEY, lambda e: _open_this_pc_release(OPEN_THIS_PC_HOTKEY))
-    keyboard.on_press_key(TOGGLE_DESKTOP_HOTKEY, lambda e: _toggle_desktop_press(TOGGLE_DESKTOP_HOTKEY))
-    keyboard.on_release_key(TOGGLE_DESKTOP_HOTKEY, lambda e: _toggle_desktop_release(TOGGLE_DESKTOP_HOTKEY))
-    keyboard.on_press_key(VOLUME_DOWN_HOTKEY, _handle_f23_press)
-    keyboard.on_release_key(VOLUME_DOWN_HOTKEY, _handle_f23_release)
-    keyboard.on_press_key(VOLUME_UP_HOTKEY, _handle_f24_press)
-    keyboard.on_release_key(VOLUME_UP_HOTKEY, _handle_f24_release)
+    ipc = _IpcServer(_handle_ipc_request)
+    ws = None
+    if args.websocket is not None:
+        # Before the tracker starts so the first foreground window is published
+        _state_hub = _StateHub()
+        ws = _WebSocketServer(_state_hub, _handle_ipc_request, port=args.websocket)
+
+    recorder = _TraceRecorder(args.record_trace) if args.record_trace else None
+    _timed_phase("hook install", lambda: _install_keymap(recorder))
+    prewarm = _prewarm_subsystems()
+    _timed_phase("foreground tracker", _get_foreground_tracker)
+    _timed_phase("scheduler", _get_scheduler)
+    _timed_phase("com apartment", _get_com_apartment)
+    _timed_phase("injector", _get_injector)
+    _timed_phase("monitor topology", _get_monitor_topology)
+    _timed_phase("window worker", _get_window_worker)
+    if _animate_snaps:
+        _timed_phase("window animator", _get_window_animator)
+    _timed_phase("geometry memory", _get_geometry_memory)
+    _timed_phase("window index", _get_window_index)
+    try:
+        _timed_phase("ipc server", ipc.start)
+    except Exception as exc:
+        _log(LOG_ERROR, "IPC", f"server unavailable ({exc})")
+    if ws is not None:
+        try:
+            _timed_phase("websocket server", ws.start)
+            _log(LOG_INFO, "WebSocket", f"listening on ws://{ws.host}:{ws.port}")
+        except Exception as exc:
+            _log(LOG_ERROR, "WebSocket", f"server unavailable ({exc})")
+            ws = None
 
     print("Hotkeys active:")
     print("  F13              LEFT cycle")
     print("  F14              Maximize/Restore (API)")
     print("  F15              RIGHT cycle")
+    print("  Shift+F14        Restore pre-snap geometry")
     print("  Shift+F13        Cycle BOTTOM heights (Y axis)")
     print("  Shift+F15        Cycle TOP heights (Y axis)")
+    print("  Alt+F13/F14/F15  Tile columns / main+stack / grid")
     print("  F16              Tap: Refresh / Hold: Hard Refresh")
     print("  F17              Prev tab (Ctrl+Shift+Tab)")
     print("  F18              Next tab (Ctrl+Tab)")
+    print("  Ctrl+F17         Previous window")
+    print("  Ctrl+F18         Next window of this app")
     print("  F19              Print Screen")
+    print("  F20              Tap: Restore workspace / Hold: Save workspace")
+    print("  Ctrl+F13/F15     Previous/next zone")
+    print("  Ctrl+F14         Snap to nearest zone")
+    print("  Ctrl+Shift+F14   Move to next monitor")
+    print("  Ctrl+F19         Start/stop macro recording")
+    print("  Shift+F19        Play/cancel macro")
     print("  F21              Open This PC")
     print("  Ctrl+F23         Switch desktop left (Win+Ctrl+Left)")
     print("  Ctrl+F24         Switch desktop right (Win+Ctrl+Right)")
     print("  F22              Toggle Desktop (Win+D)")
     print("  F23              Volume Down")
     print("  F24              Volume Up")
+    print("  Alt+F23/F24      Foreground app volume down/up")
     print("Close/hide via the GUI (tray) or Quit button.")
 
-    gui = _build_gui()
-    _auto_hide_on_start()
     try:
-        gui.mainloop()
+        if _headless:
+            _run_headless(args.startup_report, prewarm)
+        else:
+            gui = _timed_phase("gui build", _build_gui)
+            _timed_phase("tray start", _auto_hide_on_start)
+            if args.startup_report:
+                prewarm.join()
+                _print_startup_report()
+            gui.mainloop()
+    except KeyboardInterrupt:
+        pass
     finally:
         if _tray_icon:
             try:
                 _tray_icon.stop()
             except Exception:
                 pass
+        if recorder is not None:
+            recorder.close()
+        _save_geometry_memory()
+        ipc.close()
+        if ws is not None:
+            ws.close()
+        lock.release()
         _allow_sleep(prev_state)
+        _logger.close()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import main
+
+
+class _Sink:
+    def __init__(self):
+        self.frames = []
+
+    def submit_frame(self, hwnd, rect):
+        self.frames.append((hwnd, rect))
+
+
+def test_pacer_deadlines_sit_on_the_grid():
+    pacer = main._FramePacer(50, 10.0)
+    deadlines = []
+    for _ in range(3):
+        deadlines.append(pacer.deadline())
+        assert pacer.advance(pacer.deadline() + 0.001) == 0
+    assert [round(d - 10.0, 6) for d in deadlines] == [0.02, 0.04, 0.06]
+
+
+def test_pacer_counts_skipped_slots_without_drifting():
+    pacer = main._FramePacer(50, 0.0)
+    # Frame 1 (due at 20ms) renders at 75ms: slots 2 and 3 are gone
+    assert pacer.advance(0.075) == 2
+    assert abs(pacer.deadline() - 0.08) < 1e-9
+
+
+def test_pacer_never_repeats_a_slot():
+    pacer = main._FramePacer(50, 0.0)
+    assert pacer.advance(0.0) == 0  # rendered early
+    assert abs(pacer.deadline() - 0.04) < 1e-9
+
+
+def _run(animator, clock):
+    while animator.next_deadline() is not None:
+        clock.now = animator.next_deadline()
+        animator.tick()
+
+
+def test_animation_ends_on_target_after_its_duration():
+    clock = main._VirtualClock(100.0)
+    sink = _Sink()
+    animator = main._WindowAnimator(sink, 60, duration=0.15, clock=clock)
+    assert animator.animate(1, (0, 0, 100, 100), (500, 0, 600, 100))
+    _run(animator, clock)
+    assert sink.frames[-1] == (1, (500, 0, 600, 100))
+    assert abs(clock.now - 100.15) < 1.0 / 60
+    xs = [rect[0] for _, rect in sink.frames]
+    assert xs == sorted(xs)
+    assert animator.stats()["completed"] == 1 and animator.active() == 0
+
+
+def test_tick_uses_the_time_it_is_given():
+    clock = main._VirtualClock(100.0)
+    sink = _Sink()
+    animator = main._WindowAnimator(sink, 50, duration=1.0, clock=clock)
+    animator.animate(1, (0, 0, 100, 100), (1000, 0, 1100, 100))
+    clock.now = 500.0  # the animator's own clock is far ahead; tick must not read it
+    animator.tick(100.07)
+    assert animator.dropped == 2
+    assert abs(animator.next_deadline() - 100.08) < 1e-9
+
+
+def test_small_moves_are_not_animated():
+    clock = main._VirtualClock()
+    animator = main._WindowAnimator(_Sink(), 60, clock=clock)
+    assert not animator.animate(1, (0, 0, 100, 100), (1, 0, 101, 100))
+    assert animator.active() == 0 and animator.next_deadline() is None
+
+
+def test_retarget_starts_from_the_current_position():
+    clock = main._VirtualClock(100.0)
+    sink = _Sink()
+    animator = main._WindowAnimator(sink, 60, duration=0.15, clock=clock)
+    animator.animate(1, (0, 0, 100, 100), (1000, 0, 1100, 100))
+    for _ in range(4):
+        clock.now = animator.next_deadline()
+        animator.tick()
+    midway = sink.frames[-1][1]
+    animator.animate(1, midway, (0, 0, 100, 100))
+    clock.now = animator.next_deadline()
+    animator.tick()
+    # Heads back from where the window was, not from the first snap's start or end
+    assert 0 < sink.frames[-1][1][0] < midway[0]
+    _run(animator, clock)
+    assert sink.frames[-1] == (1, (0, 0, 100, 100)) and animator.cancelled == 1
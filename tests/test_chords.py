@@ -0,0 +1,69 @@
+import types
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def injector(monkeypatch):
+    injector = main._RecordingInjector()
+    monkeypatch.setattr(main, "_injector", injector)
+    monkeypatch.setattr(main, "_keymap", types.SimpleNamespace(held=0))
+    return injector
+
+
+def _hold(monkeypatch, mask):
+    monkeypatch.setattr(main, "_keymap", types.SimpleNamespace(held=mask))
+
+
+def test_chord_is_one_batch(injector):
+    main._browser_refresh()
+    assert injector.syscalls == 1
+    assert injector.batches == [(
+        (main.VK_CONTROL, False), (main.VK_R, False), (main.VK_R, True), (main.VK_CONTROL, True),
+    )]
+
+
+def test_modifiers_release_in_reverse_order(injector):
+    main._browser_prev_tab()
+    assert injector.batches == [(
+        (main.VK_CONTROL, False), (main.VK_SHIFT, False),
+        (main.VK_TAB, False), (main.VK_TAB, True),
+        (main.VK_SHIFT, True), (main.VK_CONTROL, True),
+    )]
+
+
+def test_held_modifier_is_released_and_restored_in_the_same_batch(injector, monkeypatch):
+    _hold(monkeypatch, main.MOD_SHIFT)
+    main._switch_virtual_desktop(back=True)
+    assert injector.syscalls == 1
+    assert injector.batches == [(
+        (main.VK_SHIFT, True),
+        (main.VK_LWIN, False), (main.VK_CONTROL, False),
+        (main.VK_LEFT, False), (main.VK_LEFT, True),
+        (main.VK_CONTROL, True), (main.VK_LWIN, True),
+        (main.VK_SHIFT, False),
+    )]
+
+
+def test_print_screen_releases_the_right_windows_key(injector, monkeypatch):
+    _hold(monkeypatch, main.MOD_RWIN)
+    main._print_screen()
+    assert injector.batches == [(
+        (main.VK_RWIN, True), (main.VK_SNAPSHOT, False), (main.VK_SNAPSHOT, True), (main.VK_RWIN, False),
+    )]
+
+
+def test_unheld_modifiers_are_left_alone(injector):
+    main._undo()
+    assert injector.syscalls == 1
+    assert injector.batches == [(
+        (main.VK_CONTROL, False), (main.VK_Z, False), (main.VK_Z, True), (main.VK_CONTROL, True),
+    )]
+
+
+def test_every_release_combination_is_precompiled():
+    chord = main._CHORDS["print_screen"]
+    assert len(chord.variants) == 1 << 5
+    assert chord.batch(main.MOD_ALT | main.MOD_SHIFT) is chord.variants[main.MOD_ALT | main.MOD_SHIFT]
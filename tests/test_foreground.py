@@ -0,0 +1,69 @@
+import main
+
+
+def _tracker(cache_size=2):
+    source = main._FakeForegroundSource(
+        windows={1: 10, 2: 20, 3: 30},
+        processes={10: "a.exe", 20: "b.exe", 30: "c.exe"},
+    )
+    tracker = main._ForegroundTracker(source, cache_size=cache_size)
+    tracker.start()
+    return tracker, source
+
+
+def test_foreground_changes_update_the_snapshot():
+    tracker, source = _tracker()
+    source.activate(1)
+    assert tracker.snapshot() == (1, 10, "a.exe")
+    source.activate(2)
+    assert tracker.current_process_name() == "b.exe"
+
+
+def test_repeat_lookups_hit_the_cache():
+    tracker, source = _tracker()
+    source.activate(1)
+    source.activate(2)
+    source.activate(1)
+    assert source.name_lookups == 2
+    assert tracker.stats()["hits"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    tracker, source = _tracker(cache_size=2)
+    source.activate(1)
+    source.activate(2)
+    source.activate(1)  # 2 is now the oldest
+    source.activate(3)
+    stats = tracker.stats()
+    assert stats["evictions"] == 1 and stats["size"] == 2
+    lookups = source.name_lookups
+    source.activate(1)
+    assert source.name_lookups == lookups  # still cached
+    source.activate(2)
+    assert source.name_lookups == lookups + 1  # evicted, resolved again
+
+
+def test_reused_pid_is_not_served_from_the_cache():
+    tracker, source = _tracker()
+    source.activate(1)
+    source.restart(10, "other.exe")
+    source.activate(2)
+    source.activate(1)
+    assert tracker.current_process_name() == "other.exe"
+
+
+def test_failed_lookup_is_not_cached():
+    tracker, source = _tracker()
+    source.windows[4] = 40
+    source.activate(4)
+    assert tracker.snapshot() == (4, 40, None)
+    source.processes[40] = "elevated.exe"
+    source.activate(4)
+    assert tracker.current_process_name() == "elevated.exe"
+
+
+def test_no_foreground_window():
+    tracker, source = _tracker()
+    source.activate(1)
+    source.activate(None)
+    assert tracker.snapshot() == (None, None, None)
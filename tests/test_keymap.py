@@ -0,0 +1,185 @@
+import pytest
+
+import main
+
+
+class _ManualScheduler:
+    """Runs scheduled calls only when the test advances time."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._calls = []
+
+    def call_later(self, delay, fn):
+        call = main._ScheduledCall(self.now + delay, None, fn)
+        self._calls.append(call)
+        return call
+
+    def call_repeating(self, initial, interval, fn):
+        call = main._ScheduledCall(self.now + initial, interval, fn)
+        self._calls.append(call)
+        return call
+
+    def advance(self, seconds):
+        end = self.now + seconds
+        while True:
+            due = [c for c in self._calls if not c.cancelled and c.deadline <= end]
+            if not due:
+                break
+            call = min(due, key=lambda c: c.deadline)
+            self.now = call.deadline
+            if call.interval is None:
+                self._calls.remove(call)
+            else:
+                call.deadline += call.interval
+            call.fn()
+        self.now = end
+
+
+class _Event:
+    def __init__(self, name, event_type):
+        self.name = name
+        self.event_type = event_type
+
+
+def _keymap(bindings, repeat_timing=(0.3, 0.1)):
+    fired = []
+    names = {binding[2] for binding in bindings}
+    actions = {
+        name: main._Action(name, lambda name=name: fired.append(name),
+                           repeat_timing=repeat_timing,
+                           repeat=lambda tick, name=name: fired.append((name, tick)))
+        for name in names
+    }
+    sched = _ManualScheduler()
+    return main._Keymap(bindings, actions, scheduler=sched), sched, fired
+
+
+def _press(keymap, *names):
+    for name in names:
+        keymap.on_event(_Event(name, "down"))
+
+
+def _release(keymap, *names):
+    for name in names:
+        keymap.on_event(_Event(name, "up"))
+
+
+def test_tap_fires_on_release():
+    keymap, _, fired = _keymap([("f13", "tap", "a")])
+    _press(keymap, "f13")
+    assert fired == []
+    _release(keymap, "f13")
+    assert fired == ["a"]
+
+
+def test_hold_replaces_the_tap():
+    keymap, sched, fired = _keymap([("f13", "tap", "a"), ("f13", "hold", "b")])
+    _press(keymap, "f13")
+    sched.advance(main.GESTURE_HOLD_SEC)
+    _release(keymap, "f13")
+    assert fired == ["b"]
+
+
+def test_short_press_is_a_tap_and_cancels_the_hold():
+    keymap, sched, fired = _keymap([("f13", "tap", "a"), ("f13", "hold", "b")])
+    _press(keymap, "f13")
+    sched.advance(main.GESTURE_HOLD_SEC / 2)
+    _release(keymap, "f13")
+    sched.advance(main.GESTURE_HOLD_SEC)
+    assert fired == ["a"]
+
+
+def test_double_tap_waits_out_the_window():
+    keymap, sched, fired = _keymap([("f13", "tap", "a"), ("f13", "double_tap", "b")])
+    _press(keymap, "f13")
+    _release(keymap, "f13")
+    assert fired == []
+    sched.advance(main.GESTURE_DOUBLE_TAP_SEC)
+    assert fired == ["a"]
+
+    _press(keymap, "f13")
+    _release(keymap, "f13")
+    _press(keymap, "f13")
+    _release(keymap, "f13")
+    sched.advance(main.GESTURE_DOUBLE_TAP_SEC)
+    assert fired == ["a", "b"]
+
+
+def test_repeat_fires_then_ticks_until_release():
+    keymap, sched, fired = _keymap([("f14", "repeat", "vol")])
+    _press(keymap, "f14")
+    assert fired == ["vol"]
+    sched.advance(0.5)  # initial 0.3, then every 0.1
+    _release(keymap, "f14")
+    sched.advance(1.0)
+    assert fired == ["vol", ("vol", 1), ("vol", 2), ("vol", 3)]
+
+
+def test_auto_repeat_fires_repeat_press_only():
+    keymap, sched, fired = _keymap([("f13", "press", "a", main.REPEAT_PRESS), ("f14", "tap", "b"),
+                                    ("f15", "press", "c")])
+    _press(keymap, "f13", "f13", "f13")
+    _press(keymap, "f14", "f14")
+    _press(keymap, "f15", "f15", "f15")
+    _release(keymap, "f13", "f14", "f15")
+    assert fired == ["a", "a", "a", "c", "b"]
+
+
+@pytest.mark.parametrize("key, action", [("f14", "maximize"), ("f19", "print_screen"),
+                                         ("f21", "open_this_pc"), ("f22", "toggle_desktop")])
+def test_holding_a_one_shot_key_fires_once(key, action):
+    keymap, _, fired = _keymap(main.KEYMAP)
+    _press(keymap, *[key] * 5)
+    _release(keymap, key)
+    assert fired == [action]
+
+
+def test_holding_a_cycle_key_keeps_cycling():
+    keymap, _, fired = _keymap(main.KEYMAP)
+    _press(keymap, "f13", "f13", "f13")
+    _release(keymap, "f13")
+    _press(keymap, "left ctrl", "f23", "f23")
+    assert fired == ["cycle_left"] * 3 + ["desktop_left"] * 2
+
+
+def test_auto_repeat_keeps_the_modifiers_of_the_first_down():
+    keymap, sched, fired = _keymap(main.KEYMAP)
+    _press(keymap, "f23")
+    sched.advance(main.VOLUME_REPEAT_INITIAL_SEC)
+    _press(keymap, "left ctrl")  # Ctrl pressed while F23 is still held
+    _press(keymap, "f23", "f23")
+    _release(keymap, "f23")
+    assert "desktop_left" not in fired
+    assert fired[0] == "volume_down" and fired[1] == ("volume_down", 1)
+
+
+def test_most_specific_hotkey_wins():
+    keymap, _, fired = _keymap([("f13", "press", "plain"), ("ctrl+f13", "press", "ctrl"),
+                                ("ctrl+shift+f13", "press", "both")])
+    _press(keymap, "left ctrl", "f13")
+    _release(keymap, "f13")
+    _press(keymap, "left shift", "f13")
+    _release(keymap, "f13", "left ctrl", "left shift")
+    _press(keymap, "f13")
+    assert fired == ["ctrl", "both", "plain"]
+
+
+def test_equally_specific_hotkeys_break_ties_by_modifier():
+    for order in (1, -1):
+        bindings = [("ctrl+f13", "press", "ctrl"), ("shift+f13", "press", "shift")][::order]
+        keymap, _, fired = _keymap(bindings)
+        _press(keymap, "left shift", "left ctrl", "f13")
+        # Ctrl outranks Shift whichever is listed first
+        assert fired == ["ctrl"]
+
+
+def test_unknown_action_or_gesture_is_rejected():
+    actions = {"a": main._Action("a", lambda: None)}
+    for bindings in ([("f13", "tap", "missing")], [("f13", "swipe", "a")], [("f13", "repeat", "a")],
+                     [("f13", "tap", "a", main.REPEAT_PRESS)], [("f13", "press", "a", {"turbo": True})]):
+        try:
+            main._Keymap(bindings, actions, scheduler=_ManualScheduler())
+        except ValueError:
+            continue
+        raise AssertionError(f"{bindings} compiled")
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import main
+
+
+def _macro(events):
+    # events: (seconds, scan, up) -> _Macro
+    return main._Macro.from_events([(t, scan, up, False) for t, scan, up in events])
+
+
+def test_player_sends_events_in_order():
+    injector = main._RecordingInjector()
+    player = main._MacroPlayer(lambda: injector)
+    macro = _macro([(0.0, 0x1E, False), (0.005, 0x1E, True), (0.010, 0x30, False), (0.015, 0x30, True)])
+    report = player.play_blocking(macro)
+    assert injector.batches == [
+        ((0x1E, False, False),),
+        ((0x1E, True, False),),
+        ((0x30, False, False),),
+        ((0x30, True, False),),
+    ]
+    assert report["sent"] == 4 and not report["cancelled"]
+
+
+def test_player_keeps_relative_timing():
+    injector = main._RecordingInjector()
+    sent = []
+
+    class _TimedInjector:
+        def send(self, batch):
+            sent.append(time.perf_counter())
+            injector.send(batch)
+
+    player = main._MacroPlayer(lambda: _TimedInjector())
+    player.play_blocking(_macro([(0.0, 0x1E, False), (0.030, 0x1E, True)]))
+    # The second event is due 30 ms after playback starts, never before
+    assert sent[1] - sent[0] > 0.025
+
+
+def test_cancel_releases_held_keys():
+    injector = main._RecordingInjector()
+    player = main._MacroPlayer(lambda: injector)
+    cancel = threading.Event()
+    macro = _macro([(0.0, 0x1D, False), (0.0, 0x1E, False), (5.0, 0x1E, True), (5.0, 0x1D, True)])
+    done = threading.Thread(target=player.play_blocking, args=(macro, cancel))
+    done.start()
+    while len(injector.batches) < 2:
+        time.sleep(0.001)
+    cancel.set()
+    done.join(2.0)
+    assert player.last_report["cancelled"]
+    assert player.last_report["sent"] == 2
+    assert sorted(injector.batches[-1]) == [(0x1D, True, False), (0x1E, True, False)]
+
+
+def test_recorder_drops_unpaired_events():
+    recorder = main._MacroRecorder(ignore_keys={"f19"})
+
+    class _Event:
+        def __init__(self, name, scan, event_type):
+            self.name = name
+            self.scan_code = scan
+            self.event_type = event_type
+
+    recorder.start()
+    for event in (
+        _Event("ctrl", 0x1D, "up"),  # released after recording started: no down
+        _Event("f19", 0x70, "down"),  # the record hotkey itself
+        _Event("a", 0x1E, "down"),
+        _Event("a", 0x1E, "up"),
+        _Event("shift", 0x2A, "down"),  # still held when recording stops
+    ):
+        recorder.on_event(event)
+    macro = recorder.stop()
+    assert [(scan, up) for _, scan, up, _ in macro.events()] == [(0x1E, False), (0x1E, True)]
+
+
+def test_macro_file_round_trip(tmp_path):
+    macro = _macro([(0.0, 0x1E, False), (0.25, 0x1E, True)])
+    path = str(tmp_path / "macro.bin")
+    macro.save(path)
+    loaded = main._Macro.load(path)
+    assert loaded.events() == macro.events()
+
+
+def test_macro_recorder_ignores_deck_hotkeys(monkeypatch):
+    monkeypatch.setattr(main, "_macro_recorder", None)
+    recorder = main._get_macro_recorder()
+    assert "f19" in recorder._ignore
@@ -0,0 +1,93 @@
+import pytest
+
+import main
+
+# A portrait monitor left of the primary (negative origin) and a 150% 4K one right of it
+LEFT = (1, (-1080, -420, 0, 1500), (-1080, -420, 0, 1460), 96)
+PRIMARY = (2, (0, 0, 1920, 1080), (0, 0, 1920, 1040), 96)
+HIDPI = (3, (1920, 0, 5760, 2160), (1920, 0, 5760, 2100), 144)
+
+
+def _topology(*monitors):
+    provider = main._FakeMonitorProvider(monitors)
+    topology = main._MonitorTopology(provider)
+    topology.start()
+    return topology, provider
+
+
+def test_monitors_are_ordered_left_to_right():
+    topology, _ = _topology(PRIMARY, HIDPI, LEFT)
+    assert [mon.handle for mon in topology.monitors()] == [1, 2, 3]
+
+
+def test_negative_origin_monitor_is_found_and_targeted():
+    topology, _ = _topology(LEFT, PRIMARY)
+    mon = topology.monitor_for_rect((-900, -300, -100, 300))
+    assert mon.handle == 1
+    assert mon.width_targets["left"][0] == (-1080, -420, -1080 + round(1080 * 0.5040), 1460)
+    assert mon.width_targets["right"][0][2] == 0
+    assert mon.height_spans["top"][0][0] == -420
+
+
+def test_off_screen_rect_goes_to_the_nearest_monitor():
+    topology, _ = _topology(LEFT, PRIMARY)
+    assert topology.monitor_for_rect((-3000, 100, -2000, 500)).handle == 1
+    assert topology.monitor_for_rect((2500, 100, 3500, 500)).handle == 2
+
+
+def test_targets_follow_each_monitors_own_pixels():
+    topology, _ = _topology(PRIMARY, HIDPI)
+    primary, hidpi = topology.monitors()
+    assert hidpi.dpi == 144 and primary.dpi == 96
+    # Physical pixels: the 4K monitor's half is twice as wide, not 1.5x scaled from the primary
+    width = lambda rect: rect[2] - rect[0]
+    assert width(primary.width_targets["left"][0]) == round(1920 * 0.5040)
+    assert width(hidpi.width_targets["left"][0]) == round(3840 * 0.5040)
+    assert hidpi.width_targets["left"][0][0] == 1920
+
+
+def test_topology_is_cached_until_the_display_changes():
+    topology, provider = _topology(PRIMARY)
+    for _ in range(5):
+        topology.monitor_for_rect((100, 100, 500, 500))
+    assert provider.enumerations == 1
+    provider.change([PRIMARY, (3, HIDPI[1], HIDPI[2], 192)])  # DPI change on the second monitor
+    assert provider.enumerations == 2 and topology.rebuilds == 2
+    assert topology.monitor_for_rect((2000, 100, 2500, 500)).dpi == 192
+
+
+def test_empty_enumeration_keeps_the_previous_layout():
+    topology, provider = _topology(PRIMARY)
+    provider.change([])
+    assert [mon.handle for mon in topology.monitors()] == [2]
+
+
+@pytest.fixture
+def desk(monkeypatch):
+    windows = main._FakeWindowBackend([LEFT[2], PRIMARY[2]])
+    source = main._FakeForegroundSource(processes={7: "app.exe"})
+    tracker = main._ForegroundTracker(source)
+    tracker.start()
+    topology, _ = _topology(LEFT, PRIMARY)
+    worker = main._WindowWorker(windows)
+    worker.start()
+    monkeypatch.setattr(main, "_windows", windows)
+    monkeypatch.setattr(main, "_foreground", tracker)
+    monkeypatch.setattr(main, "_topology", topology)
+    monkeypatch.setattr(main, "_window_worker", worker)
+    monkeypatch.setattr(main, "_geometry", main._GeometryMemory())
+    monkeypatch.setattr(main, "_animate_snaps", False)
+    return windows, source, topology, worker
+
+
+def test_snap_on_a_negative_origin_monitor(desk):
+    windows, source, topology, worker = desk
+    windows.add_window(0x10, (-900, 0, -300, 600), pid=7)
+    source.windows[0x10] = 7
+    windows.foreground = 0x10
+    main._cycle_left()
+    worker.wait_idle()
+    assert windows.windows[0x10].rect == topology.monitors()[0].width_targets["left"][0]
+    main._cycle_left()
+    worker.wait_idle()
+    assert windows.windows[0x10].rect == topology.monitors()[0].width_targets["left"][1]
@@ -0,0 +1,115 @@
+import pytest
+
+import main
+
+RULES = [
+    {"name": "editor", "exe": "code.exe", "class": "Chrome_WidgetWin_1", "actions": {"undo": "redo"}},
+    {"name": "mail", "exe": "glob:*mail*.exe", "title": "re:.*Inbox", "actions": {"refresh": "hard_refresh"}},
+] + main.PROFILE_RULES
+
+
+@pytest.fixture
+def desk(monkeypatch):
+    windows = main._FakeWindowBackend()
+    source = main._FakeForegroundSource()
+    tracker = main._ForegroundTracker(source)
+    tracker.start()
+    profiles = main._ProfileSet(RULES)
+    monkeypatch.setattr(main, "_windows", windows)
+    monkeypatch.setattr(main, "_foreground", tracker)
+    monkeypatch.setattr(main, "_profiles", profiles)
+
+    def _open(hwnd, exe, cls="Window", title=""):
+        windows.add_window(hwnd, (0, 0, 800, 600), cls=cls, title=title, pid=hwnd)
+        source.windows[hwnd] = hwnd
+        source.processes[hwnd] = exe
+
+    return windows, source, profiles, _open
+
+
+def _resolved(name):
+    return main._resolve_action(main.ACTIONS[name]).name
+
+
+def test_exact_exe_match(desk):
+    _, source, _, _open = desk
+    _open(1, "Chrome.exe")
+    source.activate(1)
+    assert _resolved("refresh") == "browser_refresh"
+    assert _resolved("undo") == "browser_back"
+
+
+def test_class_must_match_too(desk):
+    _, source, _, _open = desk
+    _open(1, "code.exe", cls="Chrome_WidgetWin_1")
+    _open(2, "code.exe", cls="ConsoleWindowClass")
+    source.activate(1)
+    assert _resolved("undo") == "redo"
+    source.activate(2)
+    assert _resolved("undo") == "undo"
+
+
+def test_unmatched_window_keeps_the_default_action(desk):
+    _, source, _, _open = desk
+    _open(1, "notepad.exe")
+    source.activate(1)
+    assert _resolved("refresh") == "refresh"
+    assert _resolved("undo") == "undo"
+    source.activate(None)
+    assert _resolved("refresh") == "refresh"
+
+
+def test_unmapped_action_falls_through(desk):
+    _, source, _, _open = desk
+    _open(1, "chrome.exe")
+    source.activate(1)
+    assert _resolved("maximize") == "maximize"
+
+
+def test_first_matching_rule_wins():
+    pattern = {"name": "pattern", "exe": "glob:chrome*", "actions": {}}
+    exact = {"name": "exact", "exe": "chrome.exe", "actions": {}}
+    # Exact exes are looked up by dict, but rule order still decides
+    assert main._ProfileSet([pattern, exact]).match("chrome.exe", "Window", "").name == "pattern"
+    assert main._ProfileSet([exact, pattern]).match("chrome.exe", "Window", "").name == "exact"
+
+
+def test_match_is_memoized_per_window(desk):
+    windows, source, profiles, _open = desk
+    _open(1, "chrome.exe")
+    source.activate(1)
+    for _ in range(5):
+        _resolved("refresh")
+    assert profiles.stats()["misses"] == 1 and profiles.stats()["hits"] == 4
+
+
+def test_foreground_change_resolves_the_new_window(desk):
+    windows, source, profiles, _open = desk
+    _open(1, "chrome.exe")
+    _open(2, "notepad.exe")
+    source.activate(1)
+    assert _resolved("refresh") == "browser_refresh"
+    source.activate(2)
+    assert _resolved("refresh") == "refresh"
+    source.activate(1)
+    assert _resolved("refresh") == "browser_refresh"
+    assert profiles.stats()["misses"] == 2
+
+
+def test_title_change_invalidates_the_memo(desk):
+    windows, source, _, _open = desk
+    _open(1, "outlook-mail.exe", title="Calendar")
+    source.activate(1)
+    assert _resolved("refresh") == "refresh"
+    windows.windows[1].title = "Inbox"
+    assert _resolved("refresh") == "hard_refresh"
+
+
+def test_destroyed_window_is_forgotten(desk):
+    windows, source, profiles, _open = desk
+    windows.watch_destroyed(profiles.forget)
+    _open(1, "chrome.exe")
+    source.activate(1)
+    _resolved("refresh")
+    windows.destroy_window(1)
+    assert profiles.hwnds() == []
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import main
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def test_call_later_waits_for_the_clock():
+    clock = main._VirtualClock(100.0)
+    sched = main._Scheduler(clock)
+    fired = threading.Event()
+    sched.call_later(0.02, fired.set)
+    # Real time passes but the clock doesn't: the deadline is never reached
+    assert not fired.wait(0.1)
+    clock.advance(0.02)
+    assert fired.wait(2.0)
+    assert sched.pending() == 0
+
+
+def test_calls_run_in_deadline_order():
+    clock = main._VirtualClock()
+    sched = main._Scheduler(clock)
+    order = []
+    sched.call_later(0.03, lambda: order.append("late"))
+    sched.call_later(0.01, lambda: order.append("early"))
+    sched.call_later(0.02, lambda: order.append("middle"))
+    clock.advance(0.05)
+    assert _wait_for(lambda: len(order) == 3)
+    assert order == ["early", "middle", "late"]
+
+
+def test_cancelled_call_never_runs():
+    clock = main._VirtualClock()
+    sched = main._Scheduler(clock)
+    ran = []
+    call = sched.call_later(0.01, lambda: ran.append("cancelled"))
+    sched.call_later(0.02, lambda: ran.append("kept"))
+    call.cancel()
+    call.cancel()  # idempotent
+    assert sched.pending() == 1
+    clock.advance(0.05)
+    assert _wait_for(lambda: ran)
+    time.sleep(0.02)
+    assert ran == ["kept"]
+
+
+def test_repeating_call_keeps_its_grid():
+    clock = main._VirtualClock()
+    sched = main._Scheduler(clock)
+    ticks = []
+    call = sched.call_repeating(0.01, 0.01, lambda: ticks.append(clock()))
+    for _ in range(3):
+        clock.advance(0.01)
+        count = len(ticks)
+        assert _wait_for(lambda: len(ticks) > count)
+    assert _wait_for(lambda: call.deadline > clock())  # rescheduled after running
+    call.cancel()
+    assert sched.pending() == 0
+    # Rescheduled from the previous deadline, not from when it ran
+    assert abs(call.deadline - 0.04) < 1e-9
+
+
+def test_repeating_call_skips_ahead_after_falling_behind():
+    clock = main._VirtualClock()
+    sched = main._Scheduler(clock)
+    ticks = []
+    call = sched.call_repeating(0.01, 0.01, lambda: ticks.append(clock()))
+    clock.advance(0.1)
+    assert _wait_for(lambda: ticks)
+    assert _wait_for(lambda: call.deadline > clock())
+    call.cancel()
+    # Nine intervals behind: the next deadline is one interval from now, no burst
+    assert abs(call.deadline - 0.11) < 1e-9
+    assert len(ticks) == 1
+
+
+def test_failing_callback_keeps_the_thread_alive():
+    clock = main._VirtualClock()
+    sched = main._Scheduler(clock)
+    fired = threading.Event()
+    sched.call_later(0.01, lambda: 1 / 0)
+    sched.call_later(0.02, fired.set)
+    clock.advance(0.02)
+    assert fired.wait(2.0)
@@ -0,0 +1,91 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def audio():
+    manager = main._FakeSessionManager()
+    manager.add_session(10, level=0.5)
+    manager.add_session(20, level=0.8)
+    cache = main._AudioSessionCache(manager, rescan_sec=0.0)
+    engine = main._AppVolumeEngine(cache, step=0.02)
+    return manager, cache, engine
+
+
+def _step(engine, pid, steps=1):
+    engine.request(pid, steps)
+    engine.flush()
+
+
+def test_repeated_steps_enumerate_once(audio):
+    manager, cache, engine = audio
+    for _ in range(10):
+        _step(engine, 10)
+    _step(engine, 20, -1)
+    assert manager.enumerations == 1
+    assert manager.by_key["session-1"][1].device_level == pytest.approx(0.7)
+    assert manager.by_key["session-2"][1].device_level == pytest.approx(0.78)
+    assert cache.stats()["hits"] == 10
+
+
+def test_steps_in_one_tick_are_one_write(audio):
+    manager, _, engine = audio
+    for _ in range(5):
+        engine.request(10, 1)
+    engine.flush()
+    assert manager.set_calls() == 1
+
+
+def test_created_session_needs_no_enumeration(audio):
+    manager, cache, engine = audio
+    _step(engine, 10)
+    manager.add_session(30, level=0.4)
+    _step(engine, 30)
+    assert manager.enumerations == 1
+    assert cache.stats()["pids"] == 3
+
+
+def test_expired_session_is_dropped_and_rescanned(audio):
+    manager, cache, engine = audio
+    _step(engine, 10)
+    _, session = manager.by_key.pop("session-1")
+    session.expired = True  # died without a notification...
+    manager.by_key["session-9"] = (10, main._FakeAudioSession(0.3))  # ...and came back without one
+    _step(engine, 10)  # the write fails and drops the dead session
+    assert cache.stats()["sessions"] == 1
+    _step(engine, 10)  # nothing indexed for pid 10: the rescan finds the new session
+    assert manager.enumerations == 2
+    assert manager.by_key["session-9"][1].device_level == pytest.approx(0.32)
+
+
+def test_expire_notification_updates_the_index(audio):
+    manager, cache, engine = audio
+    _step(engine, 10)
+    manager.expire_session("session-1")
+    assert cache.stats()["sessions"] == 1
+    _step(engine, 10)  # nothing left for pid 10: rescans and finds nothing
+    assert manager.enumerations == 2
+    assert manager.expired[0].set_calls == 1
+
+
+def test_rescans_are_rate_limited():
+    manager = main._FakeSessionManager(notifications=False)
+    cache = main._AudioSessionCache(manager, rescan_sec=60.0)
+    for _ in range(5):
+        assert cache.sessions_for(99) == []
+    assert manager.enumerations == 1
+
+
+def test_session_expired_during_a_scan_stays_expired():
+    class _RacingManager(main._FakeSessionManager):
+        def sessions(self):
+            found = super().sessions()
+            self.expire_session("session-1")  # notification lands mid-enumeration
+            return found
+
+    manager = _RacingManager()
+    manager.add_session(10)
+    manager.add_session(10)
+    cache = main._AudioSessionCache(manager, rescan_sec=0.0)
+    assert [key for key, _ in cache.sessions_for(10)] == ["session-2"]
@@ -0,0 +1,73 @@
+import pytest
+
+import main
+
+PRIMARY = (1, (0, 0, 1920, 1080), (0, 0, 1920, 1040), 96)
+SECOND = (2, (1920, 0, 3840, 1080), (1920, 0, 3840, 1040), 96)
+
+
+@pytest.fixture
+def desk(monkeypatch):
+    windows = main._FakeWindowBackend([PRIMARY[2], SECOND[2]])
+    source = main._FakeForegroundSource(processes={7: "app.exe"})
+    for hwnd, rect in ((0x10, (100, 100, 900, 700)), (0x11, (200, 150, 1000, 750)),
+                       (0x12, (900, 300, 1700, 900)), (0x20, (2000, 100, 2800, 700))):
+        windows.add_window(hwnd, rect, pid=7)
+        source.windows[hwnd] = 7
+    windows.add_window(0x13, (300, 300, 1100, 900), pid=7, show=main.SW_SHOWMINIMIZED)
+    source.windows[0x13] = 7
+    tracker = main._ForegroundTracker(source)
+    tracker.start()
+    topology = main._MonitorTopology(main._FakeMonitorProvider([PRIMARY, SECOND]))
+    topology.start()
+    worker = main._WindowWorker(windows)
+    worker.start()
+    index = main._WindowIndex(windows, tracker)
+    monkeypatch.setattr(main, "_windows", windows)
+    monkeypatch.setattr(main, "_foreground", tracker)
+    monkeypatch.setattr(main, "_topology", topology)
+    monkeypatch.setattr(main, "_window_worker", worker)
+    monkeypatch.setattr(main, "_window_index", index)
+    monkeypatch.setattr(main, "_geometry", main._GeometryMemory())
+    monkeypatch.setattr(main, "_animate_snaps", False)
+    index.start()
+    windows.activate(0x10)
+    source.activate(0x10)
+    return windows, worker
+
+
+def _tile(desk, action):
+    windows, worker = desk
+    before = len(windows.transactions)
+    action()
+    worker.wait_idle()
+    assert len(windows.transactions) == before + 1
+    return windows.transactions[-1]
+
+
+@pytest.mark.parametrize("layout", sorted(main.TILE_LAYOUTS))
+def test_tile_action_is_one_transaction(desk, layout):
+    windows, _ = desk
+    moved = _tile(desk, lambda: main._tile(layout))
+    # Foreground first; the minimized window and the other monitor are left alone
+    assert moved[0] == 0x10 and sorted(moved) == [0x10, 0x11, 0x12]
+    rects = main.TILE_LAYOUTS[layout](PRIMARY[2], 3, main.WINDOW_WIDTHS[0])
+    assert [windows.windows[hwnd].rect for hwnd in moved] == rects
+    assert windows.windows[0x20].rect == (2000, 100, 2800, 700)
+    assert windows.calls.get("set_window_rect", 0) == 0
+
+
+def test_main_stack_again_cycles_the_main_width(desk):
+    windows, _ = desk
+    _tile(desk, main._tile_main_stack_action)
+    moved = _tile(desk, main._tile_main_stack_action)
+    main_rect = windows.windows[moved[0]].rect
+    assert main_rect == main._tile_main_stack(PRIMARY[2], 3, main.WINDOW_WIDTHS[1])[0]
+
+
+def test_tiled_windows_can_be_restored(desk):
+    windows, worker = desk
+    _tile(desk, main._tile_columns_action)
+    main._restore_geometry()
+    worker.wait_idle()
+    assert windows.windows[0x10].rect == (100, 100, 900, 700)
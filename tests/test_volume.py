@@ -0,0 +1,87 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def volume():
+    backend = main._FakeVolumeBackend(level=0.5, step_count=51)
+    fallback = []
+    engine = main._VolumeEngine(backend, fallback=fallback.append)
+    return engine, backend, fallback
+
+
+def test_burst_of_steps_is_one_write(volume):
+    engine, backend, _ = volume
+    for _ in range(5):
+        engine.request(1)
+    engine.request(-2)
+    engine.flush()
+    assert len(backend.endpoints) == 1
+    assert backend.endpoints[0].set_calls == 1
+    assert backend.device_level == pytest.approx(0.56)
+    assert engine.flushes == 1
+
+
+def test_level_is_cached_between_flushes(volume):
+    engine, backend, _ = volume
+    for _ in range(3):
+        engine.request(1)
+        engine.flush()
+    endpoint = backend.endpoints[0]
+    assert endpoint.get_calls == 1 and endpoint.set_calls == 3
+    assert backend.com_calls() == 4
+
+
+def test_external_change_is_picked_up_without_a_read(volume):
+    engine, backend, _ = volume
+    engine.request(1)
+    engine.flush()
+    backend.external_change(0.2)
+    engine.request(1)
+    engine.flush()
+    assert backend.device_level == pytest.approx(0.22)
+    assert backend.endpoints[0].get_calls == 1
+
+
+def test_default_device_change_reconnects(volume):
+    engine, backend, _ = volume
+    engine.request(1)
+    engine.flush()
+    backend.change_default_device(0.3)
+    engine.request(1)
+    engine.flush()
+    assert len(backend.endpoints) == 2
+    assert backend.endpoints[0].closed
+    assert backend.device_level == pytest.approx(0.32)
+
+
+def test_failed_write_falls_back_and_reconnects(volume):
+    engine, backend, fallback = volume
+    engine.request(1)
+    engine.flush()
+
+    def _gone(level):
+        raise OSError("AUDCLNT_E_DEVICE_INVALIDATED")
+
+    backend.endpoints[0].set_level = _gone
+    engine.request(3)
+    engine.flush()
+    assert fallback == [3]
+    engine.request(1)
+    engine.flush()
+    assert len(backend.endpoints) == 2 and backend.endpoints[0].closed
+    assert backend.endpoints[1].set_calls == 1
+
+
+def test_unavailable_endpoint_is_closed_and_retried(volume):
+    engine, backend, fallback = volume
+    backend.failing = True
+    engine.request(2)
+    engine.flush()
+    assert fallback == [2]
+    assert backend.endpoints[0].closed
+    backend.failing = False
+    engine.request(1)
+    engine.flush()
+    assert backend.endpoints[1].set_calls == 1
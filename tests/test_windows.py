@@ -0,0 +1,91 @@
+import threading
+import time
+
+import main
+
+
+def _visibility_hook(monkeypatch, top_level):
+    # -> (hook callback, shown, hidden) for a Win32 backend whose top-level check is faked
+    hooks = {}
+
+    def _install(event, on_event):
+        hooks[event] = on_event
+        return True
+
+    monkeypatch.setattr(main, "_install_win_event_hook", _install)
+    backend = main._Win32WindowBackend()
+    checked = []
+
+    def _is_unowned_top_level(hwnd):
+        checked.append(hwnd)
+        return hwnd in top_level
+
+    backend._is_unowned_top_level = _is_unowned_top_level
+    shown, hidden = [], []
+    assert backend.watch_visibility(shown.append, hidden.append)
+    assert hooks[main.EVENT_OBJECT_SHOW] is hooks[main.EVENT_OBJECT_HIDE]
+    return hooks[main.EVENT_OBJECT_SHOW], shown, hidden, checked
+
+
+def _fire(hook, event, hwnd, id_object=main.OBJID_WINDOW, id_child=0):
+    hook(None, event, hwnd, id_object, id_child, 0, 0)
+
+
+def test_shown_prefilter_passes_top_level_windows(monkeypatch):
+    hook, shown, hidden, _ = _visibility_hook(monkeypatch, top_level={0x10})
+    _fire(hook, main.EVENT_OBJECT_SHOW, 0x10)
+    assert shown == [0x10] and hidden == []
+
+
+def test_shown_prefilter_drops_children_and_popups(monkeypatch):
+    hook, shown, _, checked = _visibility_hook(monkeypatch, top_level={0x10})
+    _fire(hook, main.EVENT_OBJECT_SHOW, 0x20)  # child control or owned popup
+    assert shown == [] and checked == [0x20]
+
+
+def test_non_window_objects_are_dropped_before_any_query(monkeypatch):
+    hook, shown, hidden, checked = _visibility_hook(monkeypatch, top_level={0x10})
+    _fire(hook, main.EVENT_OBJECT_SHOW, 0x10, id_object=-4)  # a caret, cursor or scrollbar
+    _fire(hook, main.EVENT_OBJECT_SHOW, 0x10, id_child=3)
+    _fire(hook, main.EVENT_OBJECT_SHOW, 0)
+    assert shown == [] and hidden == [] and checked == []
+
+
+def test_hidden_windows_skip_the_prefilter(monkeypatch):
+    # The index only drops hwnds it holds, so hides are passed through unchecked
+    hook, _, hidden, checked = _visibility_hook(monkeypatch, top_level=set())
+    _fire(hook, main.EVENT_OBJECT_HIDE, 0x20)
+    assert hidden == [0x20] and checked == []
+
+
+def test_racing_first_calls_build_one_window_index(monkeypatch):
+    windows = main._FakeWindowBackend()
+    tracker = main._ForegroundTracker(main._FakeForegroundSource())
+    built = []
+
+    class _SlowIndex(main._WindowIndex):
+        def start(self):
+            built.append(self)
+            time.sleep(0.05)  # long enough for every other thread to reach the getter
+            return super().start()
+
+    monkeypatch.setattr(main, "_windows", windows)
+    monkeypatch.setattr(main, "_foreground", tracker)
+    monkeypatch.setattr(main, "_window_index", None)
+    monkeypatch.setattr(main, "_WindowIndex", _SlowIndex)
+    barrier = threading.Barrier(8)
+    got = []
+
+    def _first_call():
+        barrier.wait()
+        got.append(main._get_window_index())
+
+    threads = [threading.Thread(target=_first_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2.0)
+    assert len(built) == 1
+    assert len(got) == 8 and all(index is built[0] for index in got)
+    # One index, so one set of visibility callbacks
+    assert len(windows._visibility_callbacks) == 1
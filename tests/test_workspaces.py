@@ -0,0 +1,153 @@
+import os
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import main
+
+
+def _entry(exe, title, rect=(0, 0, 800, 600), show=1, monitor=0, cls="Window"):
+    return main._WorkspaceEntry(exe, cls, title, rect, show, monitor)
+
+
+def _workspace(name="default"):
+    return main._Workspace(name, [(0, 0, 1920, 1040), (1920, 0, 3840, 1040)], [
+        _entry("code.exe", "main.py - MMO-Deck", (10, 20, 970, 1040)),
+        _entry("chrome.exe", "Inbox (3) - Mail", (1920, 0, 3840, 1040), show=3, monitor=1),
+        _entry("chrome.exe", "Docs - Café", (-8, -8, 1928, 1048), show=2),
+    ])
+
+
+def _same(a, b):
+    return [(e.exe, e.cls, e.title, e.rect, e.show, e.monitor) for e in a.entries] == \
+        [(e.exe, e.cls, e.title, e.rect, e.show, e.monitor) for e in b.entries]
+
+
+def test_store_round_trips_through_bytes():
+    store = main._WorkspaceStore()
+    store.put(_workspace("default"))
+    store.put(_workspace("work"))
+    loaded = main._WorkspaceStore()
+    loaded.loads(store.dumps())
+    assert loaded.names() == ["default", "work"]
+    for name in loaded.names():
+        assert _same(loaded.get(name), store.get(name))
+        assert [tuple(m) for m in loaded.get(name).monitors] == store.get(name).monitors
+
+
+def test_store_round_trips_through_a_file(tmp_path):
+    path = str(tmp_path / main.WORKSPACES_FILE_NAME)
+    store = main._WorkspaceStore()
+    store.put(_workspace())
+    store.save(path)
+    store.save(path)  # replaces the existing file
+    assert os.listdir(tmp_path) == [main.WORKSPACES_FILE_NAME]
+    loaded = main._WorkspaceStore()
+    loaded.load(path)
+    assert _same(loaded.get("default"), store.get("default"))
+
+
+def test_store_rejects_other_files():
+    try:
+        main._WorkspaceStore().loads(b"not a workspace")
+    except ValueError:
+        return
+    raise AssertionError("loaded a foreign file")
+
+
+def test_identical_titles_match_first():
+    entries = [_entry("chrome.exe", "Mail"), _entry("chrome.exe", "Docs")]
+    windows = [(1, "chrome.exe", "Window", "Docs"), (2, "chrome.exe", "Window", "Mail")]
+    matches = {hwnd: entry.title for hwnd, entry in main._match_workspace(entries, windows)}
+    assert matches == {1: "Docs", 2: "Mail"}
+
+
+def test_changed_titles_match_by_similarity():
+    entries = [_entry("chrome.exe", "Inbox (3) - Mail"), _entry("chrome.exe", "Calendar - Week 12")]
+    windows = [(1, "chrome.exe", "Window", "Calendar - Week 13"),
+               (2, "chrome.exe", "Window", "Inbox (12) - Mail")]
+    matches = {hwnd: entry.title for hwnd, entry in main._match_workspace(entries, windows)}
+    assert matches == {1: "Calendar - Week 12", 2: "Inbox (3) - Mail"}
+
+
+def test_windows_only_match_within_exe_and_class():
+    entries = [_entry("chrome.exe", "Mail"), _entry("code.exe", "Mail", cls="Chrome_WidgetWin_1")]
+    windows = [(1, "firefox.exe", "Window", "Mail"), (2, "code.exe", "Window", "Mail")]
+    assert main._match_workspace(entries, windows) == []
+
+
+def test_each_window_matches_once():
+    entries = [_entry("term.exe", "shell"), _entry("term.exe", "shell"), _entry("term.exe", "shell")]
+    windows = [(1, "term.exe", "Window", "shell"), (2, "term.exe", "Window", "shell")]
+    matches = main._match_workspace(entries, windows)
+    assert sorted(hwnd for hwnd, _ in matches) == [1, 2]
+
+
+MONITOR = (1, (0, 0, 1920, 1080), (0, 0, 1920, 1040), 96)
+
+
+@pytest.fixture
+def desk(monkeypatch, tmp_path):
+    windows = main._FakeWindowBackend([MONITOR[2]])
+    source = main._FakeForegroundSource(processes={7: "term.exe"})
+    for i, hwnd in enumerate((0x10, 0x11, 0x12)):
+        windows.add_window(hwnd, (100 * i, 100, 100 * i + 800, 700), cls="Term", title=f"shell {i}", pid=7)
+        source.windows[hwnd] = 7
+    tracker = main._ForegroundTracker(source)
+    tracker.start()
+    topology = main._MonitorTopology(main._FakeMonitorProvider([MONITOR]))
+    topology.start()
+    worker = main._WindowWorker(windows)
+    worker.start()
+    index = main._WindowIndex(windows, tracker)
+    monkeypatch.setattr(main, "_windows", windows)
+    monkeypatch.setattr(main, "_foreground", tracker)
+    monkeypatch.setattr(main, "_topology", topology)
+    monkeypatch.setattr(main, "_window_worker", worker)
+    monkeypatch.setattr(main, "_window_index", index)
+    monkeypatch.setattr(main, "_geometry", main._GeometryMemory())
+    monkeypatch.setattr(main, "_workspaces", main._WorkspaceStore())
+    monkeypatch.setenv("APPDATA", str(tmp_path))
+    index.start()
+    return windows, worker
+
+
+def test_capture_and_restore_query_windows_on_the_worker(desk, monkeypatch):
+    windows, worker = desk
+    threads = []
+    live_windows = main._live_windows
+
+    def _recording():
+        threads.append(threading.current_thread())
+        return live_windows()
+
+    monkeypatch.setattr(main, "_live_windows", _recording)
+    main._capture_workspace("w", save=False).result(5.0)
+    assert len(main._get_workspaces().get("w").entries) == 3
+    for hwnd in (0x10, 0x11, 0x12):
+        windows.set_window_rect(hwnd, (5, 5, 405, 305))
+    before = len(windows.transactions)
+    moves = main._restore_workspace("w").result(5.0)
+    worker.wait_idle()
+    assert len(moves) == 3 and len(windows.transactions) == before + 1
+    assert [windows.windows[hwnd].rect for hwnd in (0x10, 0x11, 0x12)] == \
+        [(0, 100, 800, 700), (100, 100, 900, 700), (200, 100, 1000, 700)]
+    assert threads == [worker._thread, worker._thread]
+
+
+def test_ipc_workspace_replies_once_the_worker_is_done(desk):
+    save = main._handle_ipc_request({"cmd": "workspace", "op": "save", "name": "w"})
+    assert isinstance(save, Future)
+    assert main._settle_reply(save) == {"ok": True, "windows": 3}
+    assert main._settle_reply(main._handle_ipc_request({"cmd": "workspace", "op": "restore", "name": "w"})) == \
+        {"ok": True, "windows": 3}
+    missing = main._handle_ipc_request({"cmd": "workspace", "op": "restore", "name": "nope"})
+    assert missing == {"ok": False, "error": "no workspace 'nope'"}
+
+
+def test_replaced_layout_replies_with_an_error():
+    layout = Future()
+    reply = main._deferred_reply(layout, lambda moves: {"ok": True, "windows": len(moves)})
+    layout.cancel()
+    assert reply.result(1.0)["ok"] is False